@@ -9,44 +9,93 @@ https://github.com/canonical/argo-operators
 
 import logging
 from base64 import b64encode
+from typing import Dict, List, Optional
 from urllib.parse import urlparse
 
 import lightkube
+import yaml
 from charmed_kubeflow_chisme.components import (
     RelationCountGateComponent,
     S3RequirerComponent,
     SdiRelationDataReceiverComponent,
 )
 from charmed_kubeflow_chisme.components.charm_reconciler import CharmReconciler
-from charmed_kubeflow_chisme.components.kubernetes_component import KubernetesComponent
-from charmed_kubeflow_chisme.components.leadership_gate_component import LeadershipGateComponent
 from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
 from charmed_kubeflow_chisme.kubernetes import create_charm_default_labels
 from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
 from charms.loki_k8s.v1.loki_push_api import LogForwarder
 from charms.observability_libs.v1.kubernetes_service_patch import KubernetesServicePatch
 from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
+from lightkube.core.exceptions import ApiError
 from lightkube.models.core_v1 import ServicePort
 from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
-from lightkube.resources.core_v1 import ConfigMap, Secret
+from lightkube.resources.core_v1 import ConfigMap, Namespace, Secret
 from ops import main
-from ops.charm import CharmBase
+from ops.charm import ActionEvent, CharmBase, CollectStatusEvent
+from ops.model import ActiveStatus
 
+from components.artifact_repositories_component import (
+    ArtifactRepositoriesComponent,
+    StorageRelationsCountGateComponent,
+    get_dedicated_applications,
+    parse_artifact_repositories_config,
+)
+from components.config_validation_component import ConfigValidationComponent
+from components.crd_component import CrdComponent
+from components.database_component import DatabaseRequirerComponent
+from components.kubernetes_component import DigestKubernetesComponent
+from components.namespace_parallelism_component import (
+    NamespaceParallelismComponent,
+    parse_parallelism_config,
+)
 from components.pebble_component import (
-    ARGO_CONTROLLER_CONFIGMAP,
-    ARGO_KEYFORMAT,
     METRICS_PORT,
     ArgoControllerPebbleService,
+    get_controller_configmap_name,
+)
+from components.qps_auto_tuner_component import QpsAutoTunerComponent, parse_rate_limit_config
+from controller_config import (
+    get_executor_environment,
+    get_key_format,
+    get_retention_policy,
+    get_ttl_strategy,
+    parse_garbage_collection_config,
+    parse_key_format_config,
+    parse_persistence_config,
+    parse_resource_rate_limit_config,
+)
+from controller_runtime import (
+    parse_go_runtime_config,
+    parse_leader_election_config,
+    parse_namespace_config,
+    parse_worker_config,
+)
+from metrics_config import get_metrics_modifiers, parse_metrics_config
+from otlp_config import get_otlp_endpoint, parse_otlp_config
+from performance_profiles import get_performance_environment
+from profiler import collect_profile, parse_duration, wait_for_pprof
+from sharding import (
+    INSTANCE_ID_CONFIG_NAME,
+    INSTANCE_ID_LABEL,
+    get_artifact_secret_name,
+    get_instance_id,
+    get_shard_assignment,
 )
 
 logger = logging.getLogger(__name__)
 
+CRD_RESOURCE_FILES = ["src/templates/crds.yaml"]
 K8S_RESOURCE_FILES = [
-    "src/templates/crds.yaml",
     "src/templates/minio_configmap.yaml.j2",
     "src/templates/mlpipeline_minio_artifact_secret.yaml.j2",
+    "src/templates/database_secret.yaml.j2",
 ]
+ARTIFACT_REPOSITORIES_RESOURCE_FILES = ["src/templates/artifact_repositories.yaml.j2"]
 METRICS_PATH = "/metrics"
+# Relations to a database for the controller's persistence, the relation name is the database type
+DATABASE_RELATIONS = ["postgresql", "mysql"]
+EXECUTOR_IMAGE_CONFIG_NAME = "executor-image"
+PEER_RELATION_NAME = "replicas"
 
 
 class ArgoControllerOperator(CharmBase):
@@ -81,25 +130,55 @@ class ArgoControllerOperator(CharmBase):
         # by user M4t3o
         self.dashboard_provider = GrafanaDashboardProvider(self)
 
+        # There is no leadership gate: every unit runs the controller, which elects the active
+        # one through its leader election lease while the others wait for it.  Components
+        # managing cluster-wide resources only act on the leader unit.
         self.charm_reconciler = CharmReconciler(self)
 
-        self.leadership_gate = self.charm_reconciler.add(
-            component=LeadershipGateComponent(
+        self.config_validation = self.charm_reconciler.add(
+            component=ConfigValidationComponent(
                 charm=self,
-                name="leadership-gate",
+                name="config-validation",
+                validators=[
+                    lambda: parse_worker_config(self.model.config),
+                    lambda: parse_go_runtime_config(self.model.config),
+                    lambda: parse_leader_election_config(self.model.config),
+                    lambda: parse_namespace_config(self.model.config),
+                    lambda: get_performance_environment(self.model.config),
+                    lambda: parse_rate_limit_config(self.model.config),
+                    lambda: parse_parallelism_config(self.model.config),
+                    lambda: parse_resource_rate_limit_config(self.model.config),
+                    lambda: parse_garbage_collection_config(self.model.config),
+                    lambda: parse_persistence_config(self.model.config),
+                    lambda: parse_key_format_config(self.model.config),
+                    lambda: get_executor_environment(self.model.config),
+                    lambda: parse_artifact_repositories_config(self.model.config),
+                    lambda: parse_metrics_config(self.model.config),
+                    lambda: parse_otlp_config(self.model.config),
+                    lambda: get_instance_id(self.model.config),
+                ],
             ),
             depends_on=[],
         )
 
+        self.qps_auto_tuner = self.charm_reconciler.add(
+            component=QpsAutoTunerComponent(
+                charm=self,
+                name="qps-auto-tuner",
+                metrics_url=f"http://localhost:{METRICS_PORT}{METRICS_PATH}",
+                peer_relation_name=PEER_RELATION_NAME,
+            ),
+            depends_on=[self.config_validation],
+        )
+
         self.s3_relations_conflict_detector = self.charm_reconciler.add(
-            component=RelationCountGateComponent(
+            component=StorageRelationsCountGateComponent(
                 charm=self,
                 name="s3-relations-conflict-detector",
                 relation_names=["object-storage", "s3-credentials"],
                 minimum_related_applications=1,
-                maximum_related_applications=1,
             ),
-            depends_on=[self.leadership_gate],
+            depends_on=[],
         )
 
         self.s3_relation = self.charm_reconciler.add(
@@ -111,7 +190,7 @@ class ArgoControllerOperator(CharmBase):
                 required_relation_fields=frozenset({"access-key", "secret-key", "endpoint"}),
                 bucket=self.model.config["bucket"],
             ),
-            depends_on=[self.leadership_gate, self.s3_relations_conflict_detector],
+            depends_on=[self.s3_relations_conflict_detector],
         )
 
         self.object_storage_relation = self.charm_reconciler.add(
@@ -123,114 +202,397 @@ class ArgoControllerOperator(CharmBase):
                 # also sufficient
                 minimum_related_applications=0,
             ),
-            depends_on=[self.leadership_gate, self.s3_relations_conflict_detector],
+            depends_on=[self.s3_relations_conflict_detector],
+        )
+
+        self.database_relations_conflict_detector = self.charm_reconciler.add(
+            component=RelationCountGateComponent(
+                charm=self,
+                name="database-relations-conflict-detector",
+                relation_names=DATABASE_RELATIONS,
+                minimum_related_applications=0,
+                maximum_related_applications=1,
+            ),
+            depends_on=[],
+        )
+
+        self.database_relation = self.charm_reconciler.add(
+            component=DatabaseRequirerComponent(
+                charm=self,
+                name="relation:database",
+                relation_names=DATABASE_RELATIONS,
+            ),
+            depends_on=[self.database_relations_conflict_detector],
+        )
+
+        self.crds = self.charm_reconciler.add(
+            component=CrdComponent(
+                charm=self,
+                name="kubernetes:crds",
+                resource_templates=CRD_RESOURCE_FILES,
+                krh_resource_types={CustomResourceDefinition},
+                krh_labels=create_charm_default_labels(
+                    self.app.name,
+                    self.model.name,
+                    scope="crds",
+                ),
+                context_callable=self._crds_context,
+                lightkube_client=lightkube.Client(),
+            ),
+            depends_on=[],
         )
 
         self.kubernetes_resources = self.charm_reconciler.add(
-            component=KubernetesComponent(
+            component=DigestKubernetesComponent(
                 charm=self,
-                name="kubernetes:crds-cm-and-secrets",
+                name="kubernetes:cm-and-secrets",
                 resource_templates=K8S_RESOURCE_FILES,
                 krh_resource_types={
                     ConfigMap,
-                    CustomResourceDefinition,
                     Secret,
                 },
                 krh_labels=create_charm_default_labels(
                     self.app.name,
                     self.model.name,
-                    scope="crds-cm-and-secrets",
+                    scope="cm-and-secrets",
                 ),
                 context_callable=self._context_callable,
                 lightkube_client=lightkube.Client(),
+                # Deletes the database Secret once the database relation is removed, and the
+                # ConfigMap and Secret of a previous instance-id
+                delete_stale_resources=True,
             ),
             depends_on=[
-                self.leadership_gate,
+                self.config_validation,
                 self.s3_relations_conflict_detector,
                 self.object_storage_relation,
                 self.s3_relation,
+                self.database_relations_conflict_detector,
+                self.database_relation,
             ],
         )
 
+        self.artifact_repositories = self.charm_reconciler.add(
+            component=ArtifactRepositoriesComponent(
+                charm=self,
+                name="kubernetes:artifact-repositories",
+                resource_templates=ARTIFACT_REPOSITORIES_RESOURCE_FILES,
+                krh_resource_types={ConfigMap, Secret},
+                krh_labels=create_charm_default_labels(
+                    self.app.name,
+                    self.model.name,
+                    scope="artifact-repositories",
+                ),
+                context_callable=self._artifact_repositories_context,
+                lightkube_client=lightkube.Client(),
+                field_manager=f"{self.app.name}-artifact-repositories",
+                repository_key=self.app.name,
+            ),
+            depends_on=[
+                self.config_validation,
+                self.s3_relations_conflict_detector,
+                self.object_storage_relation,
+                self.s3_relation,
+            ],
+        )
+
+        self.namespace_parallelism = self.charm_reconciler.add(
+            component=NamespaceParallelismComponent(
+                charm=self,
+                name="namespace-parallelism",
+                lightkube_client=lightkube.Client(),
+                field_manager=f"{self.app.name}-namespace-parallelism",
+            ),
+            depends_on=[self.config_validation],
+        )
+
         self.argo_controller_container = self.charm_reconciler.add(
             component=ArgoControllerPebbleService(
                 charm=self,
                 name="container:argo-controller",
                 container_name="argo-controller",
                 service_name="argo-controller",
+                rate_limits_getter=self.qps_auto_tuner.component.get_rate_limits,
+                otlp_endpoint_getter=lambda: get_otlp_endpoint(self.model.config),
             ),
             depends_on=[
-                self.leadership_gate,
+                self.config_validation,
+                self.qps_auto_tuner,
+                self.crds,
                 self.kubernetes_resources,
                 self.s3_relations_conflict_detector,
                 self.object_storage_relation,
                 self.s3_relation,
+                self.database_relations_conflict_detector,
+                self.database_relation,
             ],
         )
 
         self.charm_reconciler.install_default_event_handlers()
         self._logging = LogForwarder(charm=self)
+        self.framework.observe(self.on.collect_unit_status, self._on_collect_unit_status)
+
+        self.framework.observe(self.on.collect_profile_action, self._on_collect_profile)
+        self.framework.observe(self.on.disable_pprof_action, self._on_disable_pprof)
+        self.framework.observe(self.on.shard_assignment_action, self._on_shard_assignment)
+
+    def _on_collect_unit_status(self, event: CollectStatusEvent):
+        """Adds the tuned QPS, if any, to the unit status set by the CharmReconciler.
+
+        The QPS is only shown while the unit is Active, along with the message of any Component.
+        """
+        message = self.qps_auto_tuner.component.get_tuned_message()
+        status = self.unit.status
+        if not message or not isinstance(status, ActiveStatus) or message in status.message:
+            return
+        event.add_status(
+            ActiveStatus(f"{message}; {status.message}" if status.message else message)
+        )
+
+    def _on_collect_profile(self, event: ActionEvent):
+        """Saves a pprof profile of the controller and returns its path."""
+        try:
+            seconds = parse_duration(event.params["duration"])
+        except ValueError as e:
+            event.fail(str(e))
+            return
+        if not self.unit.get_container("argo-controller").can_connect():
+            event.fail("Cannot connect to the argo-controller container")
+            return
+
+        if self.argo_controller_container.component.enable_pprof():
+            event.log("Enabled pprof, restarting the controller")
+            try:
+                wait_for_pprof()
+            except TimeoutError as e:
+                event.fail(str(e))
+                return
+        try:
+            path = collect_profile(event.params["kind"], seconds)
+        except OSError as e:
+            event.fail(f"Failed to collect the profile: {e}")
+            return
+        event.set_results({"path": str(path), "fetch": f"juju scp {self.unit.name}:{path} ."})
+
+    def _on_disable_pprof(self, event: ActionEvent):
+        """Disables the controller's pprof endpoint enabled by collect-profile."""
+        if not self.unit.get_container("argo-controller").can_connect():
+            event.fail("Cannot connect to the argo-controller container")
+            return
+        if self.argo_controller_container.component.disable_pprof():
+            event.set_results({"message": "Disabled pprof, restarted the controller"})
+        else:
+            event.set_results({"message": "pprof is not enabled"})
+
+    def _on_shard_assignment(self, event: ActionEvent):
+        """Shows the shard, by controller instance ID, that each namespace is assigned to."""
+        instance_ids = _split(event.params["instance-ids"])
+        if not instance_ids:
+            event.fail("instance-ids must list at least one instance ID")
+            return
+        namespaces = _split(event.params["namespaces"])
+        if not namespaces:
+            try:
+                namespaces = [ns.metadata.name for ns in lightkube.Client().list(Namespace)]
+            except ApiError as e:
+                event.fail(f"Failed to list namespaces: {e}")
+                return
+        assignment = get_shard_assignment(namespaces, instance_ids)
+        event.set_results(
+            {
+                "label": INSTANCE_ID_LABEL,
+                "assignment": yaml.safe_dump(assignment, default_flow_style=False),
+            }
+        )
 
     @property
     def active_storage_component(self):
-        """Returns the active storage component (S3 or object storage).
+        """Returns the component of the default storage (S3 or object storage).
 
-        Returns None if neither relation is active, which should not happen in practice
-        since the conflict_detector component requires exactly one to be present.
+        The default storage is an s3-credentials relation that is not dedicated to namespaces by
+        the namespace-artifact-repositories config, else the object-storage relation.  Returns
+        None if neither relation is active, which should not happen in practice since the
+        conflict_detector component requires exactly one of them to be present.
         """
-        if self.model.get_relation("s3-credentials"):
+        dedicated_applications = get_dedicated_applications(self.model.config)
+        if any(
+            relation.app is None or relation.app.name not in dedicated_applications
+            for relation in self.model.relations["s3-credentials"]
+        ):
             return self.s3_relation.component
         if self.model.get_relation("object-storage"):
             return self.object_storage_relation.component
         return None
 
+    def _get_s3_data(self) -> Dict[str, dict]:
+        """Returns the data of each s3-credentials relation, by related application."""
+        s3_client = self.s3_relation.component.s3_client
+        return {
+            relation.app.name: data
+            for relation in self.model.relations["s3-credentials"]
+            if relation.app is not None
+            and (data := s3_client.get_storage_connection_info(relation))
+        }
+
+    def _get_default_storage_data(self) -> Optional[dict]:
+        """Returns the endpoint, bucket, region and credentials of the default storage."""
+        active_storage_component = self.active_storage_component
+        if active_storage_component is None:
+            return None
+        if isinstance(active_storage_component, S3RequirerComponent):
+            dedicated_applications = get_dedicated_applications(self.model.config)
+            data = [
+                data
+                for application, data in self._get_s3_data().items()
+                if application not in dedicated_applications
+            ]
+            if not data:
+                return None
+            # Only one S3 relation is expected besides the dedicated ones, so take the first
+            return _get_s3_storage_data(data[0], self.model.config["bucket"])
+
+        # SdiRelationDataReceiverComponent
+        try:
+            data = active_storage_component.get_data()
+        except ErrorWithStatus as e:
+            self.unit.status = e.status
+            return None
+        # get_data() returns a list when minimum_related_applications (0) !=
+        # maximum_related_applications (1). Exactly one entry is expected
+        # since object-storage has limit: 1 in metadata.yaml.
+        data = data[0]
+        return {
+            "endpoint": f"{data['service']}.{data['namespace']}:{data['port']}",
+            "bucket": data.get("bucket", self.model.config["bucket"]),
+            "region": None,
+            "access-key": data["access-key"],
+            "secret-key": data["secret-key"],
+        }
+
+    def _artifact_repositories_context(self) -> dict:
+        """Returns the context used to render the artifact repositories of namespaces."""
+        repositories = []
+        s3_data = self._get_s3_data()
+        default_data = self._get_default_storage_data()
+        for namespace, repository in parse_artifact_repositories_config(self.model.config).items():
+            if repository["application"] is None:
+                data = default_data
+            elif repository["application"] in s3_data:
+                data = _get_s3_storage_data(
+                    s3_data[repository["application"]], self.model.config["bucket"]
+                )
+            else:
+                data = None
+            if data is None:
+                logger.info(f"No storage data yet for the artifact repository of {namespace}")
+                continue
+            repositories.append(
+                {
+                    "namespace": namespace,
+                    "endpoint": data["endpoint"],
+                    "bucket": repository["bucket"] or data["bucket"],
+                    "region": data["region"],
+                    "access_key": _b64encode(data["access-key"]),
+                    "secret_key": _b64encode(data["secret-key"]),
+                }
+            )
+        return {
+            "repositories": repositories,
+            "secret_name": f"{self.app.name}-artifact-repository",
+            "kubelet_insecure": self.model.config["kubelet-insecure"],
+            "key_format": get_key_format(self.model.config),
+            "archive_logs": self.model.config["archive-logs"],
+        }
+
+    def _crds_context(self):
+        """Returns the context used to select and trim the CRDs."""
+        return {
+            # The CRDs are shared by every controller in the cluster, so they are only managed by
+            # the application without an instance-id
+            "manage_crds": not self.model.config[INSTANCE_ID_CONFIG_NAME],
+            "minimal_crds": self.model.config["minimal-crds"],
+            "metacontroller_crds": self.model.config["metacontroller-crds"],
+        }
+
     @property
     def _context_callable(self):
         def context():
-            active_storage_component = self.active_storage_component
-            if active_storage_component is None:
+            data = self._get_default_storage_data()
+            if data is None:
                 return
-            if isinstance(active_storage_component, S3RequirerComponent):
-                data = active_storage_component.get_data()
-                # get_data() returns a list, only one S3 relation is expected,
-                # so take the first entry
-                data = data[0]
-                # Strip any URL scheme (e.g. "http://") since argo's S3 client expects
-                # just the host[:port], not a full URL
-                parsed = urlparse(data["endpoint"])
-                # Also allow endpoints without a scheme
-                raw_endpoint = parsed.netloc if parsed.netloc else parsed.path
-                endpoint = raw_endpoint.split("/", 1)[0]
-                s3_region = data.get("region")
-            else:
-                # SdiRelationDataReceiverComponent
-                try:
-                    data = active_storage_component.get_data()
-                except ErrorWithStatus as e:
-                    self.unit.status = e.status
-                    return
-                # get_data() returns a list when minimum_related_applications (0) !=
-                # maximum_related_applications (1). Exactly one entry is expected
-                # since object-storage has limit: 1 in metadata.yaml.
-                data = data[0]
-                endpoint = f"{data['service']}.{data['namespace']}:{data['port']}"
-                s3_region = None
+            database = self.database_relation.component.get_data()
             return {
                 "app_name": self.app.name,
                 "namespace": self.model.name,
-                "access_key": b64encode(data["access-key"].encode("utf-8")).decode("utf-8"),
-                "secret_key": b64encode(data["secret-key"].encode("utf-8")).decode("utf-8"),
-                "mlpipeline_minio_artifact_secret": "mlpipeline-minio-artifact",
-                "argo_controller_configmap": ARGO_CONTROLLER_CONFIGMAP,
-                "s3_bucket": data.get("bucket", self.model.config["bucket"]),
-                "s3_minio_endpoint": endpoint,
-                "s3_region": s3_region,
+                "access_key": _b64encode(data["access-key"]),
+                "secret_key": _b64encode(data["secret-key"]),
+                "mlpipeline_minio_artifact_secret": get_artifact_secret_name(self.model.config),
+                "argo_controller_configmap": get_controller_configmap_name(self.model.config),
+                "instance_id": get_instance_id(self.model.config),
+                "s3_bucket": data["bucket"],
+                "s3_minio_endpoint": data["endpoint"],
+                "s3_region": data["region"],
                 "kubelet_insecure": self.model.config["kubelet-insecure"],
-                "key_format": ARGO_KEYFORMAT,
+                "key_format": get_key_format(self.model.config),
+                "archive_logs": self.model.config["archive-logs"],
+                "executor_image": self.model.config[EXECUTOR_IMAGE_CONFIG_NAME],
+                "executor_environment": get_executor_environment(self.model.config),
+                "parallelism": self.model.config["parallelism"],
+                "namespace_parallelism": self.model.config["namespace-parallelism"],
+                "resource_rate_limit": self.model.config["resource-rate-limit"],
+                "resource_rate_burst": self.model.config["resource-rate-burst"],
+                "retention_policy": get_retention_policy(self.model.config),
+                "ttl_strategy": get_ttl_strategy(self.model.config),
+                "pod_gc_strategy": self.model.config["pod-gc-strategy"],
+                "pod_gc_grace_period": self.model.config["pod-gc-grace-period"],
+                "pod_gc_delete_delay": self.model.config["pod-gc-delete-delay"],
+                "node_events": self.model.config["node-events"],
+                "node_events_send_as_pod": self.model.config["node-events-send-as-pod"],
+                "workflow_events": self.model.config["workflow-events"],
+                "metrics_ttl": self.model.config["metrics-ttl"],
+                "metrics_ignore_errors": self.model.config["metrics-ignore-errors"],
+                "metrics_modifiers": get_metrics_modifiers(self.model.config),
+                "metrics_delta_temporality": self.model.config["otlp-delta-temporality"],
+                "database": database,
+                "database_secret": f"{self.app.name}-database",
+                "database_username": _b64encode(database["username"]) if database else None,
+                "database_password": _b64encode(database["password"]) if database else None,
+                "node_status_offload": self.model.config["node-status-offload"],
+                "workflow_archive": self.model.config["workflow-archive"],
+                "workflow_archive_ttl": self.model.config["workflow-archive-ttl"],
+                "db_max_idle_conns": self.model.config["db-max-idle-conns"],
+                "db_max_open_conns": self.model.config["db-max-open-conns"],
+                "db_conn_max_lifetime": self.model.config["db-conn-max-lifetime"],
             }
 
         return context
 
 
+def _split(value: str) -> List[str]:
+    """Returns the non-empty, stripped items of a comma-separated list."""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _get_s3_storage_data(data: dict, default_bucket: str) -> dict:
+    """Returns the endpoint, bucket, region and credentials shared over an s3 relation."""
+    # Strip any URL scheme (e.g. "http://") since argo's S3 client expects
+    # just the host[:port], not a full URL
+    parsed = urlparse(data["endpoint"])
+    # Also allow endpoints without a scheme
+    raw_endpoint = parsed.netloc if parsed.netloc else parsed.path
+    return {
+        "endpoint": raw_endpoint.split("/", 1)[0],
+        "bucket": data.get("bucket", default_bucket),
+        "region": data.get("region"),
+        "access-key": data["access-key"],
+        "secret-key": data["secret-key"],
+    }
+
+
+def _b64encode(value: str) -> str:
+    """Returns value encoded in base64, as in the data of a Kubernetes Secret."""
+    return b64encode(value.encode("utf-8")).decode("utf-8")
+
+
 if __name__ == "__main__":
     main(ArgoControllerOperator)
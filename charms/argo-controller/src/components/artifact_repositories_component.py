@@ -0,0 +1,262 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Component that manages the artifact repositories of individual namespaces."""
+
+import logging
+from typing import Dict, Set
+
+from charmed_kubeflow_chisme.components import RelationCountGateComponent
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
+from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler
+from charmed_kubeflow_chisme.types import LightkubeResourcesList, LightkubeResourceType
+from lightkube.core.exceptions import ApiError
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.core_v1 import ConfigMap, Namespace
+from ops import ActiveStatus, BlockedStatus, ConfigData, StatusBase
+
+from components.kubernetes_component import (
+    DigestKubernetesComponent,
+    _resource_key,
+    is_application_removed,
+)
+from config_parsing import is_namespace_name, load_yaml_mapping
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_REPOSITORIES_CONFIG_NAME = "namespace-artifact-repositories"
+REPOSITORY_FIELDS = {"application", "bucket"}
+# ConfigMap, and its annotation naming the key of the default repository, that Argo reads in the
+# namespace of a workflow without spec.artifactRepositoryRef
+ARTIFACT_REPOSITORIES_CONFIGMAP_NAME = "artifact-repositories"
+DEFAULT_ARTIFACT_REPOSITORY_ANNOTATION = "workflows.argoproj.io/default-artifact-repository"
+
+
+class ArtifactRepositoriesComponent(DigestKubernetesComponent):
+    """Component that renders the default artifact repository of namespaces with their own repo.
+
+    Namespaces are routed to a dedicated s3-credentials application or bucket by the
+    namespace-artifact-repositories config option.  The context must set `repositories` to the
+    list of repositories to render, each with its `namespace`; those in namespaces that do not
+    exist yet are rendered on a later hook.
+
+    Each repository is written to the artifact-repositories ConfigMap, under repository_key, and
+    made the default of the namespace with the default-artifact-repository annotation.
+    kfp-profile-controller syncs its own key into this ConfigMap in profile namespaces, so it is
+    applied with server-side apply under a dedicated field manager, which leaves the other keys
+    in place.  The charm applies the annotation again on its next hook if another controller
+    changes it.  Removing a namespace from the config releases the fields set by the charm, and
+    deletes the ConfigMap if no other data is left.
+    """
+
+    def __init__(self, *args, field_manager: str, repository_key: str, **kwargs):
+        """Initialise the component.
+
+        Args:
+            field_manager: Field manager the ConfigMaps and Secrets are applied with.
+            repository_key: Key of the repository in the artifact-repositories ConfigMap.
+        """
+        super().__init__(*args, **kwargs)
+        self._field_manager = field_manager
+        self._repository_key = repository_key
+        self._stored.set_default(pending_namespaces=[])
+
+    def _get_context(self) -> dict:
+        """Returns the context of the charm, with the name and key of the ConfigMap."""
+        return {
+            **super()._get_context(),
+            "configmap_name": ARTIFACT_REPOSITORIES_CONFIGMAP_NAME,
+            "repository_key": self._repository_key,
+        }
+
+    def _get_kubernetes_resource_handler(self) -> KubernetesResourceHandler:
+        """Returns a KubernetesResourceHandler for the repositories of existing namespaces."""
+        context = self._get_context()
+        repositories = [
+            repository
+            for repository in context["repositories"]
+            if self._namespace_exists(repository["namespace"])
+        ]
+        self._stored.pending_namespaces = sorted(
+            {repository["namespace"] for repository in context["repositories"]}
+            - {repository["namespace"] for repository in repositories}
+        )
+        return KubernetesResourceHandler(
+            field_manager=self._field_manager,
+            template_files=self._resource_templates,
+            context={**context, "repositories": repositories},
+            lightkube_client=self._lightkube_client,
+            labels=self._krh_labels,
+            resource_types=self._krh_resource_types,
+        )
+
+    def _namespace_exists(self, namespace: str) -> bool:
+        """Returns True if namespace exists."""
+        try:
+            self._lightkube_client.get(Namespace, namespace)
+        except ApiError as e:
+            if e.status.code != 404:
+                raise
+            logger.info(f"Namespace {namespace} not found, not creating its artifact repository")
+            return False
+        return True
+
+    def _is_deployed(self, digest: str) -> bool:
+        """Returns False while a configured namespace was missing, to apply it once created."""
+        return not self._stored.pending_namespaces and super()._is_deployed(digest)
+
+    def _is_up_to_date(self, resource: LightkubeResourceType, digest: str) -> bool:
+        """Returns False if a ConfigMap no longer makes this repository the default."""
+        if isinstance(resource, ConfigMap):
+            annotations = resource.metadata.annotations or {}
+            if annotations.get(DEFAULT_ARTIFACT_REPOSITORY_ANNOTATION) != self._repository_key:
+                return False
+        return super()._is_up_to_date(resource, digest)
+
+    def _on_resources_applied(self, resources: LightkubeResourcesList):
+        """Releases the repositories applied previously that are no longer rendered.
+
+        They are listed from the cluster by their labels, so that a new leader unit also releases
+        those applied under a previous leader.
+        """
+        rendered = {_resource_key(resource) for resource in resources}
+        try:
+            for resource in self._list_applied_resources():
+                if _resource_key(resource) not in rendered:
+                    self._release(resource)
+        except ApiError as e:
+            raise GenericCharmRuntimeError("Failed to remove artifact repositories") from e
+
+    def remove(self, event):
+        """Releases the artifact repositories, only when the whole application is removed."""
+        if not is_application_removed(self._charm):
+            logger.info(f"{self.name}: the application is not removed, keeping its resources")
+            return
+        try:
+            for resource in self._list_applied_resources():
+                self._release(resource)
+        except ApiError as e:
+            raise GenericCharmRuntimeError("Failed to remove artifact repositories") from e
+
+    def _list_applied_resources(self) -> LightkubeResourcesList:
+        """Returns the ConfigMaps and Secrets, in every namespace, with the labels of the charm."""
+        return [
+            resource
+            for resource_type in self._krh_resource_types
+            for resource in self._lightkube_client.list(
+                resource_type, namespace="*", labels=self._krh_labels
+            )
+        ]
+
+    def _release(self, resource: LightkubeResourceType):
+        """Deletes a Secret, or removes the fields set by the charm from a ConfigMap.
+
+        The fields are removed by applying the ConfigMap without them, and the ConfigMap is
+        deleted if no data is left.
+        """
+        name, namespace = resource.metadata.name, resource.metadata.namespace
+        if isinstance(resource, ConfigMap):
+            configmap = self._lightkube_client.apply(
+                obj=ConfigMap(metadata=ObjectMeta(name=name, namespace=namespace)),
+                field_manager=self._field_manager,
+                force=True,
+            )
+            if configmap.data or configmap.binaryData:
+                logger.info(f"Removed the artifact repository of {namespace} from {name}")
+                return
+        self._lightkube_client.delete(type(resource), name, namespace=namespace)
+        logger.info(f"Deleted {type(resource).__name__} {name} of namespace {namespace}")
+
+    def get_status(self) -> StatusBase:
+        """Returns Blocked if a configured s3-credentials application is not related."""
+        related = {
+            relation.app.name
+            for relation in self._charm.model.relations["s3-credentials"]
+            if relation.app is not None
+        }
+        missing = get_dedicated_applications(self._charm.model.config) - related
+        if missing:
+            return BlockedStatus(
+                f"Missing s3-credentials relation to {', '.join(sorted(missing))}, set in "
+                f"{ARTIFACT_REPOSITORIES_CONFIG_NAME}"
+            )
+        return super().get_status()
+
+
+class StorageRelationsCountGateComponent(RelationCountGateComponent):
+    """RelationCountGateComponent for exactly one default storage relation, plus dedicated ones.
+
+    The default storage is the object-storage relation, or an s3-credentials relation to an
+    application that the config does not dedicate to namespaces.  Relations to dedicated
+    applications are not counted, so that they cannot stand in for the default storage.
+    """
+
+    def get_status(self) -> StatusBase:
+        """Checks the number of default storage relations against the current config."""
+        dedicated_applications = get_dedicated_applications(self._charm.model.config)
+        default_relations = [
+            relation
+            for name in self.relation_names
+            for relation in self._charm.model.relations[name]
+            if name != "s3-credentials"
+            or relation.app is None
+            or relation.app.name not in dedicated_applications
+        ]
+        if len(default_relations) < self.minimum_related_applications:
+            return BlockedStatus(
+                "Missing a default storage relation: relate to object-storage, or to an "
+                f"s3-credentials application not set in {ARTIFACT_REPOSITORIES_CONFIG_NAME}"
+            )
+        if len(default_relations) > self.maximum_related_applications:
+            return BlockedStatus(
+                f"Too many default storage relations (got {len(default_relations)}): relate to "
+                "only one of object-storage, or an s3-credentials application not set in "
+                f"{ARTIFACT_REPOSITORIES_CONFIG_NAME}"
+            )
+        return ActiveStatus()
+
+
+def parse_artifact_repositories_config(config: ConfigData) -> Dict[str, dict]:
+    """Returns the namespace-artifact-repositories config option as a dict.
+
+    The option maps namespace names to either the name of an s3-credentials application, or a
+    mapping with an `application` and/or a `bucket`.  In the returned dict, every namespace maps
+    to a dict with both keys, set to None if not configured.
+
+    Raises:
+        ErrorWithStatus: If the option is not a mapping of namespace names to repositories.
+    """
+    error = ErrorWithStatus(
+        f"Invalid config {ARTIFACT_REPOSITORIES_CONFIG_NAME}: must be a mapping of namespace "
+        "names to an s3-credentials application name, or to a mapping with an application "
+        "and/or a bucket",
+        BlockedStatus,
+    )
+    value = load_yaml_mapping(config, ARTIFACT_REPOSITORIES_CONFIG_NAME, error)
+
+    repositories = {}
+    for namespace, repository in value.items():
+        if not is_namespace_name(namespace):
+            raise error
+        if isinstance(repository, str):
+            repository = {"application": repository}
+        if (
+            not isinstance(repository, dict)
+            or not repository
+            or not set(repository) <= REPOSITORY_FIELDS
+            or not all(isinstance(v, str) and v for v in repository.values())
+        ):
+            raise error
+        repositories[namespace] = {field: repository.get(field) for field in REPOSITORY_FIELDS}
+    return repositories
+
+
+def get_dedicated_applications(config: ConfigData) -> Set[str]:
+    """Returns the s3-credentials applications dedicated to namespaces by the config.
+
+    Returns an empty set if the config is invalid, which is reported by the config validation.
+    """
+    try:
+        repositories = parse_artifact_repositories_config(config)
+    except ErrorWithStatus:
+        return set()
+    return {r["application"] for r in repositories.values() if r["application"] is not None}
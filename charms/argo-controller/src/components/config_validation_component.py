@@ -0,0 +1,39 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Component for gating the charm on the validity of its config."""
+
+import logging
+from typing import Callable, List
+
+from charmed_kubeflow_chisme.components.component import Component
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import ActiveStatus, StatusBase
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigValidationComponent(Component):
+    """Component that blocks the charm while any of its validators rejects the charm config.
+
+    Components that render the config should depend on this one, so that they are never executed
+    with an invalid config.
+    """
+
+    def __init__(self, *args, validators: List[Callable[[], None]], **kwargs):
+        """Initialise the component.
+
+        Args:
+            validators: Functions that raise an ErrorWithStatus if the charm config is invalid.
+        """
+        super().__init__(*args, **kwargs)
+        self._validators = validators
+
+    def get_status(self) -> StatusBase:
+        """Returns the status of the first validator that rejects the config, else Active."""
+        for validate in self._validators:
+            try:
+                validate()
+            except ErrorWithStatus as e:
+                logger.warning(f"Invalid config: {e.msg}")
+                return e.status
+        return ActiveStatus()
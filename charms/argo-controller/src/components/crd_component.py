@@ -0,0 +1,365 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Component that installs CustomResourceDefinitions on install and upgrade only."""
+
+import copy
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+from charmed_kubeflow_chisme.exceptions import GenericCharmRuntimeError
+from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler
+from charmed_kubeflow_chisme.types import LightkubeResourcesList
+from lightkube import codecs
+from lightkube.core.exceptions import ApiError
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from ops import (
+    ActiveStatus,
+    BlockedStatus,
+    InstallEvent,
+    StatusBase,
+    UpdateStatusEvent,
+    UpgradeCharmEvent,
+    WaitingStatus,
+)
+
+from components.kubernetes_component import MANIFESTS_DIGEST_ANNOTATION, DigestKubernetesComponent
+
+logger = logging.getLogger(__name__)
+
+# Events on which the live CRDs are checked for drift, instead of trusting the stored digest
+DRIFT_CHECK_EVENTS = (InstallEvent, UpgradeCharmEvent, UpdateStatusEvent)
+ESTABLISHED_CONDITION = "Established"
+# Conditions, and their status, reported by the API server for a CRD that it will not serve
+REJECTED_CONDITIONS = {"NamesAccepted": "False", "NonStructuralSchema": "True"}
+# Longest time, in seconds, that a hook waits for the applied CRDs to be established
+CRDS_ESTABLISHED_TIMEOUT = 60
+CRDS_ESTABLISHED_POLL_INTERVAL = 2
+# Suffix of the artifacts precompiled from the CRD manifests by tools/compile_crds.py
+CRDS_ARTIFACT_SUFFIX = ".json"
+METACONTROLLER_GROUP = "metacontroller.k8s.io"
+# Schema types that are kept as-is by minimize_crd, any other type preserves unknown fields
+SCALAR_SCHEMA_TYPES = {"boolean", "integer", "number", "string"}
+
+
+class CrdComponent(DigestKubernetesComponent):
+    """Component that applies CRDs on install and upgrade-charm, or to repair them.
+
+    CRDs only change with the charm revision, so on any other event the CRDs are applied only if
+    the context changed, or if on update-status the live objects no longer carry the annotation
+    of the CRD manifests shipped with the charm.  Other events trust the stored digest, so that
+    the large CRD objects are not fetched on every hook.
+    After an apply, this waits for a bounded time for every CRD to report the Established
+    condition, and fails early if a CRD is rejected.
+
+    If the charm ships an artifact precompiled from the CRD manifests, it is loaded instead of
+    parsing the YAML manifests.
+
+    The context can set `manage_crds` to False to leave the CRDs to another application, in which
+    case this only waits for them to be established.  It can set `minimal_crds` to install the
+    CRDs with minimal schemas (see minimize_crd), and `metacontroller_crds` to False to skip the
+    metacontroller CRDs.  Skipped CRDs that already exist are left in place, since deleting a CRD
+    deletes all of its objects.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._events_to_observe = [self._charm.on.upgrade_charm]
+        # Digest of the context for which the live CRDs were last seen established
+        self._stored.set_default(established_digest="")
+        self._check_drift = False
+
+    def configure_charm(self, event):
+        """Executes the component, checking the live CRDs for drift on DRIFT_CHECK_EVENTS."""
+        self._check_drift = isinstance(event, DRIFT_CHECK_EVENTS)
+        super().configure_charm(event)
+
+    def _configure_app_leader(self, event):
+        """Apply the CRDs on install or upgrade, or if the live CRDs are missing or outdated."""
+        if not self._manages_crds():
+            logger.info(f"{self.name}: CRDs are managed by another application, skipping apply")
+            return
+        if isinstance(event, (InstallEvent, UpgradeCharmEvent)):
+            # Force a full apply by forgetting what was applied previously
+            self._stored.manifests_digest = ""
+
+        super()._configure_app_leader(event)
+
+    def _is_deployed(self, digest: str) -> bool:
+        """Returns True if the CRDs for this digest were applied, and on DRIFT_CHECK_EVENTS live."""
+        if not self._check_drift:
+            return digest == self._stored.manifests_digest
+        return super()._is_deployed(digest)
+
+    def remove(self, event):
+        """Removes the CRDs with the application, unless another application manages them."""
+        if not self._manages_crds():
+            logger.info(f"{self.name}: CRDs are managed by another application, keeping them")
+            return
+        super().remove(event)
+
+    def _manages_crds(self) -> bool:
+        """Returns False if the context leaves the CRDs to another application."""
+        return self._context_callable().get("manage_crds", True)
+
+    def _get_kubernetes_resource_handler(self) -> KubernetesResourceHandler:
+        """Returns a KubernetesResourceHandler that prefers the precompiled CRD artifacts."""
+        return CrdResourceHandler(
+            field_manager="lightkube",
+            template_files=self._resource_templates,
+            context=self._context_callable(),
+            lightkube_client=self._lightkube_client,
+            labels=self._krh_labels,
+            resource_types=self._krh_resource_types,
+        )
+
+    def _on_resources_applied(self, resources: LightkubeResourcesList):
+        """Waits, up to CRDS_ESTABLISHED_TIMEOUT, for the applied CRDs to be established.
+
+        CRDs that are still not established after the timeout are reported by get_status, instead
+        of blocking the hook until they are.
+
+        Raises:
+            GenericCharmRuntimeError: If a CRD is rejected, eg its names conflict with another CRD.
+        """
+        pending = {crd.metadata.name for crd in resources}
+        logger.info(f"{self.name}: waiting for {len(pending)} CRDs to be established")
+        deadline = time.monotonic() + CRDS_ESTABLISHED_TIMEOUT
+        while True:
+            try:
+                crds = [
+                    crd
+                    for crd in self._lightkube_client.list(
+                        CustomResourceDefinition, labels=self._krh_labels
+                    )
+                    if crd.metadata.name in pending
+                ]
+            except ApiError as e:
+                raise GenericCharmRuntimeError("Failed waiting for CRDs to be established") from e
+            rejected = _get_rejected(crds)
+            if rejected:
+                raise GenericCharmRuntimeError(f"CRDs rejected: {', '.join(rejected)}")
+            pending -= {crd.metadata.name for crd in crds if _is_established(crd)}
+            if not pending:
+                return
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    f"{self.name}: CRDs not established after {CRDS_ESTABLISHED_TIMEOUT}s: "
+                    f"{', '.join(sorted(pending))}"
+                )
+                return
+            time.sleep(CRDS_ESTABLISHED_POLL_INTERVAL)
+
+    def get_status(self) -> StatusBase:
+        """Returns the status of the live CRDs.
+
+        Once the CRDs were seen established, the live CRDs are only checked again on the
+        DRIFT_CHECK_EVENTS, or if the CRD manifests or context changed.
+        """
+        if not self._charm.unit.is_leader():
+            return ActiveStatus()
+        digest = self.get_manifests_digest(self._context_callable())
+        if not self._check_drift and self._stored.established_digest == digest:
+            return ActiveStatus()
+
+        if self._manages_crds():
+            status = self._get_managed_crds_status()
+        else:
+            status = self._get_unmanaged_crds_status()
+        self._stored.established_digest = digest if isinstance(status, ActiveStatus) else ""
+        return status
+
+    def _get_managed_crds_status(self) -> StatusBase:
+        """Returns the status of the CRDs applied by this component, without rendering them."""
+        crds = list(self._lightkube_client.list(CustomResourceDefinition, labels=self._krh_labels))
+        digest = self._stored.manifests_digest
+        live_digests = {
+            crd.metadata.name: (crd.metadata.annotations or {}).get(MANIFESTS_DIGEST_ANNOTATION)
+            for crd in crds
+        }
+        if not digest or any(
+            live_digests.get(key.rsplit("/", 1)[-1]) != digest for key in self._stored.resources
+        ):
+            return BlockedStatus(
+                "CRDs missing or outdated in cluster.  This may be transient if we haven't tried "
+                "to deploy them yet."
+            )
+
+        rejected = _get_rejected(crds)
+        if rejected:
+            return BlockedStatus(f"CRDs rejected: {', '.join(rejected)}")
+
+        not_established = [crd.metadata.name for crd in crds if not _is_established(crd)]
+        if not_established:
+            return WaitingStatus(
+                f"Waiting for CRDs to be established: {', '.join(not_established)}"
+            )
+
+        return ActiveStatus()
+
+    def _get_unmanaged_crds_status(self) -> StatusBase:
+        """Returns Waiting until the CRDs managed by another application are established."""
+        krh = self._get_kubernetes_resource_handler()
+        missing = []
+        for crd in krh.render_manifests():
+            try:
+                live_crd = self._lightkube_client.get(CustomResourceDefinition, crd.metadata.name)
+            except ApiError as e:
+                if e.status.code != 404:
+                    raise GenericCharmRuntimeError("Failed to get the CRDs") from e
+                live_crd = None
+            if live_crd is None or not _is_established(live_crd):
+                missing.append(crd.metadata.name)
+        if missing:
+            return WaitingStatus(
+                f"Waiting for CRDs managed by another application: {', '.join(missing)}"
+            )
+        return ActiveStatus()
+
+
+def _is_established(crd: CustomResourceDefinition) -> bool:
+    """Returns True if the CRD reports the Established condition."""
+    conditions = (crd.status.conditions if crd.status else None) or []
+    return any(c.type == ESTABLISHED_CONDITION and c.status == "True" for c in conditions)
+
+
+def _get_rejected(crds: LightkubeResourcesList) -> List[str]:
+    """Returns the names of the rejected CRDs, each with the message of the rejecting condition."""
+    rejected = []
+    for crd in crds:
+        conditions = (crd.status.conditions if crd.status else None) or []
+        for c in conditions:
+            if REJECTED_CONDITIONS.get(c.type) == c.status:
+                rejected.append(f"{crd.metadata.name} ({c.message or c.reason or c.type})")
+    return rejected
+
+
+class PrecompiledKubernetesResourceHandler(KubernetesResourceHandler):
+    """KubernetesResourceHandler that loads manifests from precompiled artifacts when available.
+
+    Falls back to rendering the template files if any artifact is missing or outdated.  The
+    handler's labels are added to the loaded resources, as they are to the rendered ones.
+    """
+
+    def render_manifests(
+        self,
+        template_files: Optional[Iterable[str]] = None,
+        context: Optional[dict] = None,
+        force_recompute: bool = False,
+        create_resources_for_crds: bool = True,
+    ) -> LightkubeResourcesList:
+        """Returns the manifests, loaded from the precompiled artifacts if possible."""
+        if template_files is not None:
+            self.template_files = template_files
+        if self._manifests is None or force_recompute:
+            resources = load_crds_artifacts(self.template_files)
+            if resources is not None:
+                if self._labels is not None:
+                    _add_labels_to_resources(resources, self._labels)
+                self._manifests = resources
+                force_recompute = False
+        return super().render_manifests(
+            context=context,
+            force_recompute=force_recompute,
+            create_resources_for_crds=create_resources_for_crds,
+        )
+
+
+def _add_labels_to_resources(resources: LightkubeResourcesList, labels: dict):
+    """Adds labels to every Lightkube resource in a list."""
+    for resource in resources:
+        if resource.metadata.labels is None:
+            resource.metadata.labels = {}
+        resource.metadata.labels.update(labels)
+    return resources
+
+
+def load_crds_artifacts(
+    template_files: Iterable[Union[str, Path]],
+) -> Optional[LightkubeResourcesList]:
+    """Returns the resources loaded from the artifacts compiled from template_files.
+
+    Returns None if any artifact is missing, or was compiled from a different version of its
+    template file.
+    """
+    resources = []
+    for template_file in template_files:
+        template_file = Path(template_file)
+        artifact_file = template_file.with_suffix(CRDS_ARTIFACT_SUFFIX)
+        if not artifact_file.exists():
+            logger.debug(f"No precompiled artifact found for {template_file}")
+            return None
+
+        artifact = json.loads(artifact_file.read_bytes())
+        if artifact["source-sha256"] != hashlib.sha256(template_file.read_bytes()).hexdigest():
+            logger.warning(f"Ignoring {artifact_file}: it was not compiled from {template_file}")
+            return None
+        resources.extend(codecs.from_dict(obj) for obj in artifact["objects"])
+    return resources
+
+
+class CrdResourceHandler(PrecompiledKubernetesResourceHandler):
+    """PrecompiledKubernetesResourceHandler that selects and trims CRDs as set in its context."""
+
+    def render_manifests(
+        self,
+        template_files: Optional[Iterable[str]] = None,
+        context: Optional[dict] = None,
+        force_recompute: bool = False,
+        create_resources_for_crds: bool = True,
+    ) -> LightkubeResourcesList:
+        """Returns the CRDs, without metacontroller CRDs or schemas if set in the context."""
+        recompute = self._manifests is None or force_recompute
+        resources = super().render_manifests(
+            template_files=template_files,
+            context=context,
+            force_recompute=force_recompute,
+            create_resources_for_crds=create_resources_for_crds,
+        )
+        if recompute:
+            if not self.context.get("metacontroller_crds", True):
+                resources = [crd for crd in resources if crd.spec.group != METACONTROLLER_GROUP]
+            if self.context.get("minimal_crds", False):
+                resources = [minimize_crd(crd) for crd in resources]
+            self._manifests = resources
+        return resources
+
+
+def minimize_crd(crd: CustomResourceDefinition) -> CustomResourceDefinition:
+    """Returns a copy of crd with minimal OpenAPI schemas, like Argo's upstream minimal CRDs.
+
+    Descriptions are dropped and only the top level properties of each version's schema are kept.
+    Scalar properties keep their type, metadata stays an object, and any other property preserves
+    unknown fields instead of declaring a deep schema.
+    """
+    # to_dict() can share nested dicts with crd, so copy them to leave crd unchanged
+    crd_dict = copy.deepcopy(crd.to_dict())
+    for version in crd_dict["spec"]["versions"]:
+        schema = version.get("schema", {}).get("openAPIV3Schema")
+        if schema is None:
+            continue
+        minimal_schema = {"type": "object"}
+        if "required" in schema:
+            minimal_schema["required"] = schema["required"]
+        if "properties" in schema:
+            minimal_schema["properties"] = {
+                name: _minimize_property(name, prop) for name, prop in schema["properties"].items()
+            }
+        else:
+            minimal_schema["x-kubernetes-preserve-unknown-fields"] = True
+        version["schema"]["openAPIV3Schema"] = minimal_schema
+    return CustomResourceDefinition.from_dict(crd_dict)
+
+
+def _minimize_property(name: str, prop: dict) -> dict:
+    """Returns a minimal schema for a top level property of a CRD schema."""
+    if prop.get("type") in SCALAR_SCHEMA_TYPES:
+        return {"type": prop["type"]}
+    if name == "metadata":
+        return {"type": "object"}
+    if prop.get("type") == "array":
+        return {"type": "array", "items": {"x-kubernetes-preserve-unknown-fields": True}}
+    return {"type": "object", "x-kubernetes-preserve-unknown-fields": True}
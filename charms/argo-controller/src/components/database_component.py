@@ -0,0 +1,129 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Component for the optional database relations backing the controller's persistence."""
+
+import logging
+from typing import List, Optional, Tuple
+
+from charmed_kubeflow_chisme.components.component import Component
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import ActiveStatus, BlockedStatus, SecretNotFoundError, StatusBase, WaitingStatus
+from ops.model import Relation
+
+logger = logging.getLogger(__name__)
+
+DATABASE_FIELDS = ("endpoints", "username", "password")
+# Port used for an endpoint without one, by database type
+DEFAULT_PORTS = {"postgresql": 5432, "mysql": 3306}
+
+
+class DatabaseRequirerComponent(Component):
+    """Component that requests a database over the postgresql_client or mysql_client interfaces.
+
+    The leader requests a database named after the database-name config option, as the requirer
+    side of the data_interfaces protocol.  Credentials are read from the provider's application
+    databag, or from the Juju secret it references if it shares them as a secret.
+    """
+
+    def __init__(self, *args, relation_names: List[str], **kwargs):
+        """Initialise the component.
+
+        Args:
+            relation_names: Names of the database relations, at most one of which is expected to
+                be active.  Each name is also the database type, eg postgresql or mysql.
+        """
+        super().__init__(*args, **kwargs)
+        self.relation_names = relation_names
+        self._events_to_observe = [
+            evt
+            for name in self.relation_names
+            for evt in (
+                self._charm.on[name].relation_joined,
+                self._charm.on[name].relation_changed,
+                self._charm.on[name].relation_broken,
+            )
+        ]
+
+    @property
+    def relation(self) -> Optional[Relation]:
+        """Returns the active database relation, if any."""
+        for name in self.relation_names:
+            relation = self._charm.model.get_relation(name)
+            if relation is not None and relation.app is not None:
+                return relation
+        return None
+
+    def _configure_app_leader(self, event):
+        """Requests the database from the related application."""
+        relation = self.relation
+        if relation is None:
+            return
+        relation.data[self._charm.app]["database"] = self._charm.model.config["database-name"]
+
+    def get_data(self) -> Optional[dict]:
+        """Returns the connection details of the database, or None if not available.
+
+        The returned dict has the database `type` (the relation name), `host`, `port`,
+        `database`, `username` and `password`.
+
+        Raises:
+            ErrorWithStatus: If the endpoint shared by the provider is invalid.
+        """
+        relation = self.relation
+        if relation is None:
+            return None
+        data = dict(relation.data[relation.app])
+        if "secret-user" in data:
+            try:
+                secret = self._charm.model.get_secret(id=data["secret-user"])
+                data.update(secret.get_content(refresh=True))
+            except SecretNotFoundError:
+                logger.warning(f"Secret {data['secret-user']} of relation {relation.name} missing")
+                return None
+        if not all(data.get(field) for field in DATABASE_FIELDS):
+            return None
+
+        # The provider lists the endpoints of all of its units, the primary first
+        host, port = parse_endpoint(data["endpoints"].split(",")[0], DEFAULT_PORTS[relation.name])
+        return {
+            "type": relation.name,
+            "host": host,
+            "port": port,
+            "database": data.get("database", self._charm.model.config["database-name"]),
+            "username": data["username"],
+            "password": data["password"],
+        }
+
+    def get_status(self) -> StatusBase:
+        """Returns Waiting while a related database has not shared its credentials yet."""
+        if self.relation is None:
+            return ActiveStatus()
+        try:
+            data = self.get_data()
+        except ErrorWithStatus as e:
+            return e.status
+        if data is None:
+            return WaitingStatus(f"Waiting for {self.relation.name} relation data")
+        return ActiveStatus()
+
+
+def parse_endpoint(endpoint: str, default_port: int) -> Tuple[str, int]:
+    """Returns the host and port of a database endpoint, eg host:5432 or [fd00::1]:5432.
+
+    Endpoints without a port, including IPv6 addresses without brackets, use default_port.
+
+    Raises:
+        ErrorWithStatus: If the endpoint has no host, or a port that is not a port number.
+    """
+    endpoint = endpoint.strip()
+    if endpoint.startswith("["):
+        host, _, rest = endpoint[1:].partition("]")
+        # Anything after the brackets must be the port
+        port = rest[1:] if rest.startswith(":") else None if rest else ""
+    elif endpoint.count(":") == 1:
+        host, _, port = endpoint.partition(":")
+    else:
+        host, port = endpoint, ""
+    if not host or port is None or (port and not (port.isdigit() and 0 < int(port) < 65536)):
+        raise ErrorWithStatus(f"Invalid database endpoint {endpoint!r}", BlockedStatus)
+    return host, int(port) if port else default_port
@@ -0,0 +1,171 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""KubernetesComponent that skips re-applying manifests that have not changed."""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from charmed_kubeflow_chisme.components.kubernetes_component import KubernetesComponent
+from charmed_kubeflow_chisme.exceptions import GenericCharmRuntimeError
+from charmed_kubeflow_chisme.types import LightkubeResourcesList, LightkubeResourceType
+from lightkube.core.exceptions import ApiError
+from ops import ActiveStatus, BlockedStatus, CharmBase, StatusBase
+from ops.framework import StoredState
+
+logger = logging.getLogger(__name__)
+
+MANIFESTS_DIGEST_ANNOTATION = "charmed-kubeflow.canonical.com/manifests-digest"
+
+
+class DigestKubernetesComponent(KubernetesComponent):
+    """KubernetesComponent that only applies its resources when their inputs change.
+
+    A digest of the template bytes and of the rendering context is stored after each successful
+    apply, and stamped on every applied object as an annotation.  On later hooks the apply is
+    skipped if the digest is unchanged and the applied objects, fetched by name, still carry it.
+    The manifests are only rendered, and the generic resources of the cluster loaded, when they
+    are applied.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, *args, delete_stale_resources: bool = False, **kwargs):
+        """Initialise the component.
+
+        Args:
+            delete_stale_resources: If True, resources that are no longer rendered, eg a
+                template rendered conditionally, are deleted when applying the others.
+        """
+        super().__init__(*args, **kwargs)
+        self._delete_stale_resources = delete_stale_resources
+        self._stored.set_default(manifests_digest="", resources=[])
+        # Digest that the live objects were seen with during this hook, if any
+        self._verified_digest = ""
+
+    def configure_charm(self, event):
+        """Executes the component, checking the live objects again for this hook."""
+        self._verified_digest = ""
+        super().configure_charm(event)
+
+    def _configure_app_leader(self, event):
+        """Apply the Kubernetes resources, unless the live objects are already up to date."""
+        try:
+            digest = self.get_manifests_digest(self._get_context())
+            if self._is_deployed(digest):
+                logger.info(f"{self.name}: manifests unchanged (digest {digest}), skipping apply")
+                self._verified_digest = digest
+                return
+            krh = self._get_kubernetes_resource_handler()
+            resources = _add_digest_annotation(krh.render_manifests(), digest)
+            if self._delete_stale_resources:
+                krh.reconcile()
+            else:
+                krh.apply()
+        except ApiError as e:
+            raise GenericCharmRuntimeError("Failed to create Kubernetes resources") from e
+
+        self._stored.manifests_digest = digest
+        self._stored.resources = [_resource_key(resource) for resource in resources]
+        self._verified_digest = digest
+        self._on_resources_applied(resources)
+
+    def remove(self, event):
+        """Removes the resources, only when the whole application is removed.
+
+        The resources are shared by every unit, so removing a unit on scale down keeps them.
+        """
+        if not is_application_removed(self._charm):
+            logger.info(f"{self.name}: the application is not removed, keeping its resources")
+            return
+        super().remove(event)
+
+    def _on_resources_applied(self, resources: LightkubeResourcesList):
+        """Executed after the resources have been applied.  Override to extend, eg to wait."""
+        pass
+
+    def _get_context(self) -> dict:
+        """Returns the context the manifests are rendered with.  Override to extend."""
+        return self._context_callable()
+
+    def get_manifests_digest(self, context: dict) -> str:
+        """Returns a digest of the resource templates and the context used to render them."""
+        digest = hashlib.sha256()
+        for template in self._resource_templates:
+            digest.update(Path(template).read_bytes())
+        digest.update(json.dumps(context, sort_keys=True, default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _is_deployed(self, digest: str) -> bool:
+        """Returns True if the resources for this digest were applied and are still live."""
+        if not self._stored.manifests_digest or digest != self._stored.manifests_digest:
+            return False
+        return self._live_resources_carry_digest(digest)
+
+    def get_status(self) -> StatusBase:
+        """Returns Active if the current manifests were applied and are still live."""
+        if not self._charm.unit.is_leader():
+            return ActiveStatus()
+        digest = self.get_manifests_digest(self._get_context())
+        if digest != self._verified_digest and not self._is_deployed(digest):
+            return BlockedStatus(
+                "Not all resources found in cluster.  This may be transient if we haven't tried "
+                "to deploy them yet."
+            )
+        return ActiveStatus()
+
+    def _live_resources_carry_digest(self, digest: str) -> bool:
+        """Returns True if every previously applied resource is live and annotated with digest.
+
+        Each resource is fetched by name, instead of listing all the resources of its type.
+        """
+        resource_types = {
+            resource_type.__name__: resource_type for resource_type in self._krh_resource_types
+        }
+        for key in self._stored.resources:
+            kind, namespace, name = key.split("/", 2)
+            if kind not in resource_types:
+                return False
+            try:
+                resource = self._lightkube_client.get(
+                    resource_types[kind],
+                    name,
+                    namespace=None if namespace == "None" else namespace,
+                )
+            except ApiError as e:
+                if e.status.code != 404:
+                    raise
+                return False
+            if not self._is_up_to_date(resource, digest):
+                return False
+        return True
+
+    def _is_up_to_date(self, resource: LightkubeResourceType, digest: str) -> bool:
+        """Returns True if a live resource was applied with digest.  Override to extend."""
+        return (resource.metadata.annotations or {}).get(MANIFESTS_DIGEST_ANNOTATION) == digest
+
+
+def is_application_removed(charm: CharmBase) -> bool:
+    """Returns True if charm is the leader unit, and its whole application is being removed."""
+    return charm.unit.is_leader() and charm.app.planned_units() == 0
+
+
+def _resource_key(resource: LightkubeResourceType) -> str:
+    """Returns a string identifying a Lightkube resource by its type, namespace and name."""
+    return f"{type(resource).__name__}/{resource.metadata.namespace}/{resource.metadata.name}"
+
+
+def _add_digest_annotation(resources: LightkubeResourcesList, digest: str):
+    """Adds the manifests digest annotation to every Lightkube resource in a list."""
+    for i in range(len(resources)):
+        if resources[i].metadata.annotations is None:
+            resources[i].metadata.annotations = {}
+
+        # Sometimes there is a bug where this field is not overwritable
+        if resources[i].metadata.annotations is None:
+            as_dict = resources[i].to_dict()
+            as_dict["metadata"]["annotations"] = {}
+            resources[i] = resources[i].from_dict(as_dict)
+        resources[i].metadata.annotations[MANIFESTS_DIGEST_ANNOTATION] = digest
+    return resources
@@ -0,0 +1,119 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Component that sets per-namespace workflow parallelism limits through namespace labels."""
+
+import logging
+from typing import Dict, Set
+
+import lightkube
+from charmed_kubeflow_chisme.components.component import Component
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus, GenericCharmRuntimeError
+from lightkube import operators
+from lightkube.core.exceptions import ApiError
+from lightkube.models.meta_v1 import ObjectMeta
+from lightkube.resources.core_v1 import Namespace
+from ops import ActiveStatus, BlockedStatus, ConfigData, StatusBase
+
+from config_parsing import is_namespace_name, load_yaml_mapping
+
+logger = logging.getLogger(__name__)
+
+# Namespace label read by the controller to override namespaceParallelism for a namespace
+PARALLELISM_LIMIT_LABEL = "workflows.argoproj.io/parallelism-limit"
+NAMESPACE_PARALLELISM_OVERRIDES_CONFIG_NAME = "namespace-parallelism-overrides"
+
+
+class NamespaceParallelismComponent(Component):
+    """Component labelling namespaces with their workflow parallelism limit.
+
+    The limits are read from the namespace-parallelism-overrides config option.  Labels are set
+    with server-side apply using a dedicated field manager, so that removing a namespace from the
+    config removes only the label set by this Component.  Namespaces that do not exist yet are
+    labelled on a later reconcile.
+
+    The namespaces labelled previously are listed from the cluster, by the label and the field
+    manager, so that a new leader unit also removes the labels set under a previous leader.
+    """
+
+    def __init__(self, *args, lightkube_client: lightkube.Client, field_manager: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lightkube_client = lightkube_client
+        self._field_manager = field_manager
+
+    def _configure_app_leader(self, event):
+        """Sets the parallelism limit label on the namespaces with an override."""
+        overrides = parse_namespace_parallelism_overrides(self._charm.model.config)
+        try:
+            for namespace in sorted(set(overrides) | self._get_labelled_namespaces()):
+                self._apply_label(namespace, overrides.get(namespace))
+        except ApiError as e:
+            raise GenericCharmRuntimeError("Failed to label namespaces with parallelism") from e
+
+    def _get_labelled_namespaces(self) -> Set[str]:
+        """Returns the namespaces with the label set by this Component's field manager."""
+        return {
+            namespace.metadata.name
+            for namespace in self._lightkube_client.list(
+                Namespace, labels={PARALLELISM_LIMIT_LABEL: operators.exists()}
+            )
+            if any(
+                entry.manager == self._field_manager
+                for entry in namespace.metadata.managedFields or []
+            )
+        }
+
+    def _apply_label(self, namespace: str, limit):
+        """Sets, or removes if limit is None, the label on namespace if it exists."""
+        try:
+            self._lightkube_client.get(Namespace, namespace)
+        except ApiError as e:
+            if e.status.code != 404:
+                raise
+            logger.info(f"Namespace {namespace} not found, not setting its parallelism limit")
+            return
+
+        labels = {} if limit is None else {PARALLELISM_LIMIT_LABEL: str(limit)}
+        self._lightkube_client.apply(
+            obj=Namespace(metadata=ObjectMeta(name=namespace, labels=labels)),
+            field_manager=self._field_manager,
+            force=True,
+        )
+        logger.info(f"Set parallelism limit of namespace {namespace} to {limit}")
+
+    def get_status(self) -> StatusBase:
+        """Returns Active, as failures to label namespaces are raised when executing."""
+        return ActiveStatus()
+
+
+def parse_parallelism_config(config: ConfigData):
+    """Validates the parallelism, namespace-parallelism and overrides config options.
+
+    Raises:
+        ErrorWithStatus: If an option is invalid.
+    """
+    if config["parallelism"] < 0 or config["namespace-parallelism"] < 0:
+        raise ErrorWithStatus(
+            "Invalid config: parallelism and namespace-parallelism must be >= 0", BlockedStatus
+        )
+    parse_namespace_parallelism_overrides(config)
+
+
+def parse_namespace_parallelism_overrides(config: ConfigData) -> Dict[str, int]:
+    """Returns the namespace-parallelism-overrides config option as a dict.
+
+    Raises:
+        ErrorWithStatus: If the option is not a YAML or JSON mapping of namespace names to
+            positive integers.
+    """
+    error = ErrorWithStatus(
+        f"Invalid config {NAMESPACE_PARALLELISM_OVERRIDES_CONFIG_NAME}: must be a mapping of "
+        "namespace names to positive integers",
+        BlockedStatus,
+    )
+    overrides = load_yaml_mapping(config, NAMESPACE_PARALLELISM_OVERRIDES_CONFIG_NAME, error)
+    for namespace, limit in overrides.items():
+        if not is_namespace_name(namespace):
+            raise error
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+            raise error
+    return overrides
@@ -1,43 +1,190 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
+import hashlib
+import json
 import logging
+from typing import Callable, Dict, List, Optional, Tuple
 
 from charmed_kubeflow_chisme.components.pebble_component import PebbleServiceComponent
-from ops.pebble import Layer
+from ops import ConfigData, Container
+from ops.framework import StoredState
+from ops.pebble import Layer, PathError, Plan
+
+from config_parsing import format_go_duration, parse_go_duration
+from controller_runtime import (
+    GO_RUNTIME_CONFIG,
+    WORKER_POOLS,
+    get_go_runtime_environment,
+    get_kill_delay,
+    get_leader_election_environment,
+    get_worker_counts,
+    parse_namespace_config,
+    parse_worker_config,
+)
+from performance_profiles import get_performance_environment
+from sharding import get_instance_id
 
 logger = logging.getLogger(__name__)
 
 ARGO_CONTROLLER_CONFIGMAP = "argo-workflow-controller-configmap"
-# TODO: Update the variable below after working on:
-# https://github.com/canonical/kfp-operators/issues/822
-ARGO_KEYFORMAT = (
-    "artifacts/{{workflow.name}}/"
-    "{{workflow.creationTimestamp.Y}}/"
-    "{{workflow.creationTimestamp.m}}/"
-    "{{workflow.creationTimestamp.d}}/"
-    "{{pod.name}}"
-)
-EXECUTOR_IMAGE_CONFIG_NAME = "executor-image"
 LIVENESS_PROBE_PORT = "6060"
 METRICS_PORT = "9090"
 LIVENESS_PROBE_PATH = "/healthz"
 LIVENESS_PROBE_NAME = "argo-controller-up"
+# cgroup v2 and v1 files with the CPU quota and period of the container
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+# cgroup v2 and v1 files with the memory limit of the container, in bytes
+CGROUP_V2_MEMORY_MAX = "/sys/fs/cgroup/memory.max"
+CGROUP_V1_MEMORY_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+# cgroup v1 reports no memory limit as a huge page-aligned number instead of "max"
+CGROUP_V1_NO_MEMORY_LIMIT = 2**62
+# Fields of services and checks that Pebble reports in the plan as normalized Go durations
+PEBBLE_DURATION_FIELDS = {"backoff-delay", "backoff-limit", "kill-delay", "period", "timeout"}
 
 
 class ArgoControllerPebbleService(PebbleServiceComponent):
     """Pebble service container component to configure Pebble layer."""
 
+    _stored = StoredState()
+
     def __init__(
         self,
         *args,
+        rate_limits_getter: Optional[Callable[[], Tuple[float, int]]] = None,
+        otlp_endpoint_getter: Optional[Callable[[], Optional[str]]] = None,
         **kwargs,
     ):
+        """Initialise the component.
+
+        Args:
+            rate_limits_getter: Function returning the QPS and burst of the controller's
+                Kubernetes client, or None to use Argo's defaults.
+            otlp_endpoint_getter: Function returning the OTLP endpoint the controller pushes its
+                metrics to, or None to only expose them to Prometheus.
+        """
         super().__init__(*args, **kwargs)
+        self._rate_limits_getter = rate_limits_getter
+        self._otlp_endpoint_getter = otlp_endpoint_getter
+        self._container_limits: Optional[Tuple[Optional[float], Optional[int]]] = None
+        self._stored.set_default(pprof=False)
+        # Each unit runs a controller, identified by its pod name in the leader election
         self.environment = {
             "ARGO_NAMESPACE": self.model.name,
-            "LEADER_ELECTION_IDENTITY": self.model.app.name,
+            "LEADER_ELECTION_IDENTITY": self.model.unit.name.replace("/", "-"),
         }
 
+    def configure_charm(self, event):
+        """Reads the cgroup limits of the container again for this hook, then configures it."""
+        self._container_limits = None
+        super().configure_charm(event)
+
+    def _get_container_limits(self) -> Tuple[Optional[float], Optional[int]]:
+        """Returns the CPU and memory limits of the container, read once per hook.
+
+        The layer is built both to update the plan and to get the status of the services, and
+        each build would otherwise pull the cgroup files from the container.
+        """
+        if self._container_limits is None:
+            container = self._charm.unit.get_container(self.container_name)
+            self._container_limits = (
+                get_container_cpu_limit(container),
+                get_container_memory_limit(container),
+            )
+        return self._container_limits
+
+    def enable_pprof(self) -> bool:
+        """Enables the controller's pprof endpoint on its diagnostics port.
+
+        Returns True if the controller was restarted to enable it, False if already enabled.
+        """
+        if self._stored.pprof:
+            return False
+        self._stored.pprof = True
+        self._update_layer()
+        return True
+
+    def disable_pprof(self) -> bool:
+        """Disables the controller's pprof endpoint.
+
+        Returns True if the controller was restarted to disable it, False if already disabled.
+        """
+        if not self._stored.pprof:
+            return False
+        self._stored.pprof = False
+        self._update_layer()
+        return True
+
+    def _update_layer(self):
+        """Updates the Pebble layer, re-planning the services only if the layer changed.
+
+        The layer is compared to the live plan through a digest of the fields it sets, with
+        durations in the form Pebble reports them, so that the workflow-controller is not
+        restarted, dropping its informer caches, when nothing it runs with has changed.
+        """
+        container = self._charm.unit.get_container(self.container_name)
+        new_layer = self.get_layer()
+        current_plan = container.get_plan()
+        environment = new_layer.services[self.service_name].environment
+        logger.info(
+            "Go runtime of the controller: "
+            + ", ".join(f"{name}={environment.get(name, 'default')}" for name in GO_RUNTIME_CONFIG)
+        )
+
+        new_fields = _get_layer_fields(new_layer)
+        current_fields = _get_plan_fields(current_plan, new_fields)
+        if _digest(new_fields) == _digest(current_fields):
+            logger.info(f"Pebble layer unchanged (digest {_digest(new_fields)}), skipping replan")
+            return
+
+        changed_fields = sorted(
+            key for key, value in new_fields.items() if current_fields.get(key) != value
+        )
+        logger.info(f"Replanning {self.service_name}, changed: {', '.join(changed_fields)}")
+        container.add_layer(self.container_name, new_layer, combine=True)
+        container.replan()
+
+    def _get_worker_flags(self) -> List[str]:
+        """Returns the controller flags setting the size of its worker pools."""
+        cpu_limit, _ = self._get_container_limits()
+        workers = get_worker_counts(parse_worker_config(self.model.config), cpu_limit)
+        return [
+            f"{WORKER_POOLS[name][0]}={count}"
+            for name, count in workers.items()
+            if count is not None
+        ]
+
+    def _get_go_runtime_environment(self) -> Dict[str, str]:
+        """Returns the environment variables tuning the Go runtime of the controller."""
+        cpu_limit, memory_limit = self._get_container_limits()
+        return get_go_runtime_environment(
+            self.model.config, cpu_limit=cpu_limit, memory_limit=memory_limit
+        )
+
+    def _get_rate_limit_flags(self) -> List[str]:
+        """Returns the controller flags setting the QPS and burst of its Kubernetes client."""
+        if self._rate_limits_getter is None:
+            return []
+        qps, burst = self._rate_limits_getter()
+        return [f"--qps={qps:g}", f"--burst={burst}"]
+
+    def _get_otlp_environment(self) -> Dict[str, str]:
+        """Returns the environment variables enabling the controller's OTLP metrics exporter."""
+        if self._otlp_endpoint_getter is None:
+            return {}
+        endpoint = self._otlp_endpoint_getter()
+        if endpoint is None:
+            return {}
+        return {"OTEL_EXPORTER_OTLP_ENDPOINT": endpoint}
+
+    def _get_namespace_flags(self) -> List[str]:
+        """Returns the controller flags restricting the workflows and pods it watches."""
+        managed_namespace = parse_namespace_config(self.model.config)
+        if not self.model.config["namespaced"]:
+            return []
+        return ["--namespaced", f"--managed-namespace={managed_namespace or self.model.name}"]
+
     def get_layer(self) -> Layer:
         """Defines and returns Pebble layer configuration
 
@@ -52,15 +199,28 @@ class ArgoControllerPebbleService(PebbleServiceComponent):
                     self.service_name: {
                         "override": "replace",
                         "summary": "Entry point for kfp-viewer image",
-                        "command": (
-                            "workflow-controller "
-                            "--configmap "
-                            f"{ARGO_CONTROLLER_CONFIGMAP} "
-                            "--executor-image "
-                            f"{self.model.config[EXECUTOR_IMAGE_CONFIG_NAME]}"
+                        # The executor image is set in the controller ConfigMap, which the
+                        # controller reloads without restarting
+                        "command": " ".join(
+                            [
+                                "workflow-controller",
+                                "--configmap",
+                                get_controller_configmap_name(self.model.config),
+                                *self._get_worker_flags(),
+                                *self._get_rate_limit_flags(),
+                                *self._get_namespace_flags(),
+                            ]
                         ),
                         "startup": "enabled",
-                        "environment": self.environment,
+                        "kill-delay": get_kill_delay(self.model.config),
+                        "environment": {
+                            **self.environment,
+                            **get_performance_environment(self.model.config),
+                            **self._get_go_runtime_environment(),
+                            **get_leader_election_environment(self.model.config),
+                            **self._get_otlp_environment(),
+                            **({"ARGO_PPROF": "true"} if self._stored.pprof else {}),
+                        },
                         "on-check-failure": {LIVENESS_PROBE_NAME: "restart"},
                     }
                 },
@@ -77,3 +237,96 @@ class ArgoControllerPebbleService(PebbleServiceComponent):
                 },
             }
         )
+
+
+def _get_layer_fields(layer: Layer) -> Dict[str, object]:
+    """Returns the fields set by the services and checks of layer, keyed by their path."""
+    fields = {}
+    for section, items in (("services", layer.services), ("checks", layer.checks)):
+        for name, item in items.items():
+            for field, value in item.to_dict().items():
+                if field != "override":
+                    fields[f"{section}.{name}.{field}"] = _normalize_field(field, value)
+    return fields
+
+
+def _get_plan_fields(plan: Plan, keys: List[str]) -> Dict[str, object]:
+    """Returns the values of the live plan for the field paths in keys."""
+    plan_dict = plan.to_dict()
+    fields = {}
+    for key in keys:
+        section, name, field = key.split(".", 2)
+        item = plan_dict.get(section, {}).get(name, {})
+        if field in item:
+            fields[key] = _normalize_field(field, item[field])
+    return fields
+
+
+def _normalize_field(field: str, value):
+    """Returns value in the form Pebble reports it in the plan, eg 1m5s for a 65s duration."""
+    if field in PEBBLE_DURATION_FIELDS and isinstance(value, str):
+        seconds = parse_go_duration(value)
+        if seconds is not None:
+            return format_go_duration(seconds)
+    return value
+
+
+def _digest(fields: Dict[str, object]) -> str:
+    """Returns a stable digest of fields."""
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_controller_configmap_name(config: ConfigData) -> str:
+    """Returns the name of the controller ConfigMap, suffixed with the instance-id if set.
+
+    Each argo-controller application sharding the workflows of a model has its own ConfigMap.
+    """
+    instance_id = get_instance_id(config)
+    return (
+        f"{ARGO_CONTROLLER_CONFIGMAP}-{instance_id}" if instance_id else ARGO_CONTROLLER_CONFIGMAP
+    )
+
+
+def get_container_cpu_limit(container: Container) -> Optional[float]:
+    """Returns the CPU limit of the container, in CPUs, read from its cgroup.
+
+    Returns None if the container has no CPU limit or its cgroup cannot be read.
+    """
+    try:
+        quota, _, period = _read_container_file(container, CGROUP_V2_CPU_MAX).partition(" ")
+    except (PathError, ValueError):
+        try:
+            quota = _read_container_file(container, CGROUP_V1_CPU_QUOTA)
+            period = _read_container_file(container, CGROUP_V1_CPU_PERIOD)
+        except (PathError, ValueError):
+            return None
+    if quota in ("max", "-1"):
+        return None
+    try:
+        return int(quota) / int(period)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def get_container_memory_limit(container: Container) -> Optional[int]:
+    """Returns the memory limit of the container, in bytes, read from its cgroup.
+
+    Returns None if the container has no memory limit or its cgroup cannot be read.
+    """
+    try:
+        limit = _read_container_file(container, CGROUP_V2_MEMORY_MAX)
+    except (PathError, ValueError):
+        try:
+            limit = _read_container_file(container, CGROUP_V1_MEMORY_LIMIT)
+        except (PathError, ValueError):
+            return None
+    if not limit.isdigit() or int(limit) >= CGROUP_V1_NO_MEMORY_LIMIT:
+        return None
+    return int(limit)
+
+
+def _read_container_file(container: Container, path: str) -> str:
+    """Returns the stripped content of the file at path in container."""
+    if not container.can_connect():
+        raise ValueError(f"Cannot connect to container to read {path}")
+    return container.pull(path).read().strip()
@@ -0,0 +1,246 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Component that tunes the controller's Kubernetes client QPS from its own metrics."""
+
+import logging
+import re
+import time
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+from charmed_kubeflow_chisme.components.component import Component
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import ActiveStatus, BlockedStatus, ConfigData, StatusBase, UpdateStatusEvent
+from ops.framework import StoredState
+from ops.model import Relation
+
+logger = logging.getLogger(__name__)
+
+K8S_REQUEST_TOTAL_METRIC = "argo_workflows_k8s_request_total"
+K8S_REQUEST_DURATION_METRIC = "argo_workflows_k8s_request_duration"
+METRICS_REQUEST_TIMEOUT_SECONDS = 5
+# Lower the QPS if more than this ratio of requests are throttled (429) by the API server, or if
+# requests take longer than this on average
+THROTTLED_RATIO_THRESHOLD = 0.01
+LATENCY_THRESHOLD_SECONDS = 1.0
+# Raise the QPS if the controller sends requests at more than this ratio of its QPS
+SATURATION_RATIO = 0.8
+DECREASE_FACTOR = 0.75
+INCREASE_FACTOR = 1.25
+# Changing the QPS restarts the controller, so leave time between adjustments
+ADJUSTMENT_COOLDOWN_SECONDS = 30 * 60
+# Keys of the last adjustment made by a unit, in its databag of the peer relation
+TUNED_QPS_KEY = "tuned-qps"
+ADJUSTMENT_TIME_KEY = "qps-adjustment-time"
+
+_SAMPLE_LINE = re.compile(
+    r"^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?P<labels>.*)\})?\s+(?P<value>\S+)"
+)
+_STATUS_CODE_LABEL = re.compile(r'status_code="(?P<status_code>\d+)"')
+
+
+class QpsAutoTunerComponent(Component):
+    """Component providing the QPS and burst of the controller's Kubernetes client.
+
+    These are the qps and burst config options, unless qps-auto-tune is enabled.  In that case, on
+    every update-status this reads the controller's metrics and lowers the QPS, within
+    qps-auto-tune-min and qps-auto-tune-max, if the API server throttles (429) or slows down its
+    requests, or raises it if the controller uses most of its QPS.  The burst keeps the same ratio
+    to the QPS as configured.  Every adjustment is logged, with its reason, and the tuned QPS and
+    burst are the message of the Active status.
+
+    Each unit tunes the QPS from the metrics of its own controller, which only sends requests
+    while it holds the leader election lease.  A unit shares its last adjustment in its databag
+    of the peer relation, and every unit uses the most recent adjustment of all units, so that a
+    standby controller taking over keeps the tuned QPS.
+    """
+
+    _stored = StoredState()
+
+    def __init__(self, *args, metrics_url: str, peer_relation_name: str, **kwargs):
+        """Initialise the component.
+
+        Args:
+            metrics_url: URL of the controller's Prometheus metrics endpoint.
+            peer_relation_name: Name of the peer relation sharing the adjustments.
+        """
+        super().__init__(*args, **kwargs)
+        self._metrics_url = metrics_url
+        self.peer_relation_name = peer_relation_name
+        self._stored.set_default(sample={}, sample_time=0.0)
+        self._events_to_observe = [self._charm.on[self.peer_relation_name].relation_changed]
+
+    @property
+    def peer_relation(self) -> Optional[Relation]:
+        """Returns the peer relation, if created yet."""
+        return self._charm.model.get_relation(self.peer_relation_name)
+
+    @property
+    def auto_tune(self) -> bool:
+        """Returns True if the QPS is tuned automatically."""
+        return self._charm.model.config["qps-auto-tune"]
+
+    def get_rate_limits(self) -> Tuple[float, int]:
+        """Returns the QPS and burst the controller should use."""
+        config = self._charm.model.config
+        if not self.auto_tune:
+            return config["qps"], config["burst"]
+        tuned_qps, _ = self._get_last_adjustment()
+        qps = self._clamp(tuned_qps or config["qps"])
+        return qps, max(1, round(qps * config["burst"] / config["qps"]))
+
+    def _get_last_adjustment(self) -> Tuple[float, float]:
+        """Returns the QPS and time of the most recent adjustment of all units, or zeros."""
+        relation = self.peer_relation
+        if relation is None:
+            return 0.0, 0.0
+        adjustments = []
+        for unit in {self._charm.unit, *relation.units}:
+            data = relation.data[unit]
+            try:
+                adjustments.append((float(data[ADJUSTMENT_TIME_KEY]), float(data[TUNED_QPS_KEY])))
+            except (KeyError, ValueError):
+                continue
+        if not adjustments:
+            return 0.0, 0.0
+        adjustment_time, tuned_qps = max(adjustments)
+        return tuned_qps, adjustment_time
+
+    def _configure_unit(self, event):
+        """Tunes the QPS from the controller's metrics on update-status."""
+        relation = self.peer_relation
+        if not self.auto_tune:
+            if relation is not None:
+                relation.data[self._charm.unit].pop(TUNED_QPS_KEY, None)
+                relation.data[self._charm.unit].pop(ADJUSTMENT_TIME_KEY, None)
+            self._stored.sample = {}
+            return
+        if not isinstance(event, UpdateStatusEvent):
+            return
+        if relation is None:
+            logger.info("Peer relation not created yet, not tuning the QPS")
+            return
+        try:
+            parse_rate_limit_config(self._charm.model.config)
+        except ErrorWithStatus:
+            # Reported by the config validation, nothing to tune until it is fixed
+            return
+
+        try:
+            sample = self._get_sample()
+        except OSError as e:
+            logger.warning(f"Cannot read controller metrics from {self._metrics_url}: {e}")
+            return
+        now = time.time()
+        previous_sample, previous_time = dict(self._stored.sample), self._stored.sample_time
+        self._stored.sample, self._stored.sample_time = sample, now
+        _, adjustment_time = self._get_last_adjustment()
+        if not previous_sample or now - adjustment_time < ADJUSTMENT_COOLDOWN_SECONDS:
+            return
+
+        qps, _ = self.get_rate_limits()
+        new_qps, reason = get_qps_adjustment(
+            qps, previous_sample, sample, elapsed_seconds=now - previous_time
+        )
+        new_qps = self._clamp(new_qps)
+        if new_qps == qps:
+            return
+
+        relation.data[self._charm.unit].update(
+            {TUNED_QPS_KEY: str(new_qps), ADJUSTMENT_TIME_KEY: str(now)}
+        )
+        logger.info(f"QPS auto-tuned from {qps:g} to {new_qps:g}: {reason}")
+
+    def _clamp(self, qps: float) -> float:
+        """Returns qps rounded and bounded by qps-auto-tune-min and qps-auto-tune-max."""
+        config = self._charm.model.config
+        return round(min(max(qps, config["qps-auto-tune-min"]), config["qps-auto-tune-max"]), 1)
+
+    def _get_sample(self) -> Dict[str, float]:
+        """Returns the totals of the controller's Kubernetes client metrics."""
+        with urllib.request.urlopen(
+            self._metrics_url, timeout=METRICS_REQUEST_TIMEOUT_SECONDS
+        ) as response:
+            return parse_k8s_request_metrics(response.read().decode("utf-8"))
+
+    def get_tuned_message(self) -> str:
+        """Returns the tuned QPS and burst as a status message, or "" if they are the config's."""
+        config = self._charm.model.config
+        if not self.auto_tune:
+            return ""
+        try:
+            parse_rate_limit_config(config)
+        except ErrorWithStatus:
+            # Reported by the config validation
+            return ""
+        qps, burst = self.get_rate_limits()
+        if (qps, burst) == (config["qps"], config["burst"]):
+            return ""
+        return f"QPS auto-tuned to {qps:g}, burst {burst}"
+
+    def get_status(self) -> StatusBase:
+        """Returns Active.  The tuned QPS is added to the unit status by the charm."""
+        return ActiveStatus()
+
+
+def parse_rate_limit_config(config: ConfigData):
+    """Validates the qps, burst and qps-auto-tune-* config options.
+
+    Raises:
+        ErrorWithStatus: If an option is out of range.
+    """
+    if config["qps"] <= 0 or config["burst"] < 1:
+        raise ErrorWithStatus("Invalid config: qps must be > 0 and burst >= 1", BlockedStatus)
+    if not 0 < config["qps-auto-tune-min"] <= config["qps-auto-tune-max"]:
+        raise ErrorWithStatus(
+            "Invalid config: must have 0 < qps-auto-tune-min <= qps-auto-tune-max", BlockedStatus
+        )
+
+
+def parse_k8s_request_metrics(metrics: str) -> Dict[str, float]:
+    """Returns the totals of the Kubernetes client metrics in a Prometheus text exposition.
+
+    The totals are the number of requests (`requests`), of throttled requests (`throttled`), and
+    the sum and count of request durations (`duration_sum`, `duration_count`).
+    """
+    sample = {"requests": 0.0, "throttled": 0.0, "duration_sum": 0.0, "duration_count": 0.0}
+    for line in metrics.splitlines():
+        match = _SAMPLE_LINE.match(line)
+        if match is None:
+            continue
+        name, value = match.group("name"), float(match.group("value"))
+        if name == K8S_REQUEST_TOTAL_METRIC:
+            sample["requests"] += value
+            status_code = _STATUS_CODE_LABEL.search(match.group("labels") or "")
+            if status_code and status_code.group("status_code") == "429":
+                sample["throttled"] += value
+        elif name == f"{K8S_REQUEST_DURATION_METRIC}_sum":
+            sample["duration_sum"] += value
+        elif name == f"{K8S_REQUEST_DURATION_METRIC}_count":
+            sample["duration_count"] += value
+    return sample
+
+
+def get_qps_adjustment(
+    qps: float, previous: Dict[str, float], current: Dict[str, float], elapsed_seconds: float
+) -> Tuple[float, Optional[str]]:
+    """Returns the QPS to use given two samples of the Kubernetes client metrics, and why."""
+    requests = current["requests"] - previous["requests"]
+    if requests <= 0 or elapsed_seconds <= 0:
+        # No requests, or the controller restarted and its counters were reset
+        return qps, None
+
+    throttled_ratio = (current["throttled"] - previous["throttled"]) / requests
+    if throttled_ratio > THROTTLED_RATIO_THRESHOLD:
+        return qps * DECREASE_FACTOR, f"{throttled_ratio:.1%} of requests throttled (429)"
+
+    durations = current["duration_count"] - previous["duration_count"]
+    if durations > 0:
+        latency = (current["duration_sum"] - previous["duration_sum"]) / durations
+        if latency > LATENCY_THRESHOLD_SECONDS:
+            return qps * DECREASE_FACTOR, f"mean request latency {latency:.2f}s"
+
+    rate = requests / elapsed_seconds
+    if rate > SATURATION_RATIO * qps:
+        return qps * INCREASE_FACTOR, f"request rate {rate:.1f}/s close to QPS"
+    return qps, None
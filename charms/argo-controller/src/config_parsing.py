@@ -0,0 +1,79 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Validation helpers shared by the parsers of the config options."""
+
+import re
+from typing import Optional
+
+import yaml
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import ConfigData
+
+_GO_DURATION_PART = re.compile(r"([0-9]+(?:\.[0-9]+)?)(ns|us|µs|ms|s|m|h)")
+_GO_DURATION_UNITS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "µs": 1e-6,
+    "ms": 1e-3,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+}
+_NAMESPACE_NAME = re.compile(r"^[a-z0-9]([-a-z0-9]*[a-z0-9])?$")
+
+
+def parse_go_duration(value: str) -> Optional[float]:
+    """Returns the number of seconds of a Go duration such as 1m30s, or None if invalid."""
+    parts = _GO_DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * _GO_DURATION_UNITS[unit] for number, unit in parts)
+
+
+def format_go_duration(seconds: float) -> str:
+    """Returns seconds, rounded to the millisecond, as a Go duration formatted like Go does.
+
+    Go formats durations of a second or more in hours, minutes and seconds, eg 1m5s or 1h0m0s,
+    and shorter ones in milliseconds, eg 500ms.
+    """
+    milliseconds = round(seconds * 1000)
+    if milliseconds == 0:
+        return "0s"
+    if milliseconds < 1000:
+        return f"{milliseconds}ms"
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    duration = f"{milliseconds // 1000}"
+    if milliseconds % 1000:
+        duration += f".{milliseconds % 1000:03d}".rstrip("0")
+    duration += "s"
+    if hours:
+        return f"{hours}h{minutes}m{duration}"
+    if minutes:
+        return f"{minutes}m{duration}"
+    return duration
+
+
+def is_go_duration(value) -> bool:
+    """Returns True if value is a Go duration string such as 1m30s."""
+    return isinstance(value, str) and parse_go_duration(value) is not None
+
+
+def is_namespace_name(value) -> bool:
+    """Returns True if value is a valid Kubernetes namespace name."""
+    return isinstance(value, str) and _NAMESPACE_NAME.match(value) is not None
+
+
+def load_yaml_mapping(config: ConfigData, name: str, error: ErrorWithStatus) -> dict:
+    """Returns the config option name parsed as a YAML or JSON mapping, empty if unset.
+
+    Raises:
+        ErrorWithStatus: error, if the option is not a mapping.
+    """
+    try:
+        value = yaml.safe_load(config.get(name, "")) or {}
+    except yaml.YAMLError:
+        raise error
+    if not isinstance(value, dict):
+        raise error
+    return value
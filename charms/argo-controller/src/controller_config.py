@@ -0,0 +1,201 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Validation of the config options rendered into the controller ConfigMap."""
+
+import re
+from typing import Dict
+
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import BlockedStatus, ConfigData
+
+from config_parsing import is_go_duration
+
+# Built-in artifact key layouts that can be set as the key-format config option
+KEY_FORMAT_LAYOUTS = {
+    # Groups the artifacts by workflow creation date, which concentrates the writes of all
+    # running workflows on the same prefix
+    "date": (
+        "artifacts/{{workflow.name}}/"
+        "{{workflow.creationTimestamp.Y}}/"
+        "{{workflow.creationTimestamp.m}}/"
+        "{{workflow.creationTimestamp.d}}/"
+        "{{pod.name}}"
+    ),
+    # Argo's simple templates cannot hash, so the random workflow UID right after the first
+    # prefix spreads the artifacts of concurrent workflows across S3 and MinIO partitions
+    "hashed": "artifacts/{{workflow.uid}}/{{workflow.name}}/{{pod.name}}",
+    "hashed-date": (
+        "artifacts/{{workflow.uid}}/"
+        "{{workflow.creationTimestamp.Y}}/"
+        "{{workflow.creationTimestamp.m}}/"
+        "{{workflow.creationTimestamp.d}}/"
+        "{{workflow.name}}/"
+        "{{pod.name}}"
+    ),
+}
+# Variables that Argo substitutes in an artifact repository's keyFormat
+_KEY_FORMAT_VARIABLE = re.compile(
+    r"^(pod\.name"
+    r"|workflow\.(name|namespace|uid|serviceAccountName)"
+    r"|workflow\.creationTimestamp\.(Y|m|d|H|M|S|RFC3339)"
+    r"|workflow\.(labels|annotations|parameters)\.[A-Za-z0-9_./-]+)$"
+)
+_TEMPLATE_TAG = re.compile(r"{{(.*?)}}")
+# Config options mapped to the fields of retentionPolicy
+RETENTION_POLICY_CONFIG = {
+    "retention-completed": "completed",
+    "retention-failed": "failed",
+    "retention-errored": "errored",
+}
+# Config options mapped to the fields of the default workflow spec's ttlStrategy
+TTL_STRATEGY_CONFIG = {
+    "workflow-ttl-after-completion": "secondsAfterCompletion",
+    "workflow-ttl-after-success": "secondsAfterSuccess",
+    "workflow-ttl-after-failure": "secondsAfterFailure",
+}
+POD_GC_STRATEGIES = {
+    "OnPodCompletion",
+    "OnPodSuccess",
+    "OnWorkflowCompletion",
+    "OnWorkflowSuccess",
+}
+# Config options mapped to the environment variables of the executor tuning its writes to the
+# API server
+EXECUTOR_ENVIRONMENT_CONFIG = {
+    "executor-progress-patch-tick": "ARGO_PROGRESS_PATCH_TICK_DURATION",
+    "executor-progress-file-tick": "ARGO_PROGRESS_FILE_TICK_DURATION",
+    "executor-wait-status-check-interval": "WAIT_CONTAINER_STATUS_CHECK_INTERVAL",
+    "executor-resource-state-check-interval": "RESOURCE_STATE_CHECK_INTERVAL",
+}
+# Progress tick durations that disable progress reporting
+_PROGRESS_ENVIRONMENT = ["ARGO_PROGRESS_PATCH_TICK_DURATION", "ARGO_PROGRESS_FILE_TICK_DURATION"]
+# Argo's TTLs also accept days
+_TTL = re.compile(r"^([0-9]+(\.[0-9]+)?(ns|us|µs|ms|s|m|h|d))+$")
+
+
+def parse_resource_rate_limit_config(config: ConfigData):
+    """Validates the resource-rate-limit and resource-rate-burst config options.
+
+    Raises:
+        ErrorWithStatus: If an option is out of range.
+    """
+    if config["resource-rate-limit"] <= 0 or config["resource-rate-burst"] < 1:
+        raise ErrorWithStatus(
+            "Invalid config: resource-rate-limit must be > 0 and resource-rate-burst >= 1",
+            BlockedStatus,
+        )
+
+
+def parse_garbage_collection_config(config: ConfigData):
+    """Validates the retention-*, workflow-ttl-* and pod-gc-* config options.
+
+    Raises:
+        ErrorWithStatus: If an option is invalid.
+    """
+    for option in [*RETENTION_POLICY_CONFIG, *TTL_STRATEGY_CONFIG, "pod-gc-grace-period"]:
+        if config[option] < 0:
+            raise ErrorWithStatus(f"Invalid config: {option} must be >= 0", BlockedStatus)
+    if config["pod-gc-strategy"] and config["pod-gc-strategy"] not in POD_GC_STRATEGIES:
+        raise ErrorWithStatus(
+            f"Invalid config: pod-gc-strategy must be empty or one of "
+            f"{', '.join(sorted(POD_GC_STRATEGIES))}",
+            BlockedStatus,
+        )
+    if not is_go_duration(config["pod-gc-delete-delay"]):
+        raise ErrorWithStatus(
+            "Invalid config: pod-gc-delete-delay must be a duration such as 5s or 1m30s",
+            BlockedStatus,
+        )
+
+
+def parse_persistence_config(config: ConfigData):
+    """Validates the workflow-archive-ttl and db-* config options.
+
+    Raises:
+        ErrorWithStatus: If an option is invalid.
+    """
+    if config["workflow-archive-ttl"] and not _TTL.match(config["workflow-archive-ttl"]):
+        raise ErrorWithStatus(
+            "Invalid config: workflow-archive-ttl must be a duration such as 30d or 12h",
+            BlockedStatus,
+        )
+    if config["db-max-idle-conns"] < 0 or config["db-max-open-conns"] < 0:
+        raise ErrorWithStatus(
+            "Invalid config: db-max-idle-conns and db-max-open-conns must be >= 0", BlockedStatus
+        )
+    if not is_go_duration(config["db-conn-max-lifetime"]):
+        raise ErrorWithStatus(
+            "Invalid config: db-conn-max-lifetime must be a duration such as 0s or 5m",
+            BlockedStatus,
+        )
+    if not config["database-name"]:
+        raise ErrorWithStatus("Invalid config: database-name must not be empty", BlockedStatus)
+
+
+def get_key_format(config: ConfigData) -> str:
+    """Returns the artifact keyFormat set by the key-format config option.
+
+    The option is either the name of a built-in layout of KEY_FORMAT_LAYOUTS or a keyFormat.
+    """
+    return KEY_FORMAT_LAYOUTS.get(config["key-format"], config["key-format"])
+
+
+def parse_key_format_config(config: ConfigData):
+    """Validates the Argo template variables used by the key-format config option.
+
+    Raises:
+        ErrorWithStatus: If the key format uses an unknown variable or an expression, or lacks
+            {{pod.name}}, without which the artifacts of different pods overwrite each other.
+    """
+    key_format = get_key_format(config)
+    variables = [variable.strip() for variable in _TEMPLATE_TAG.findall(key_format)]
+    invalid = [variable for variable in variables if not _KEY_FORMAT_VARIABLE.match(variable)]
+    if invalid or "{{" in _TEMPLATE_TAG.sub("", key_format):
+        raise ErrorWithStatus(
+            f"Invalid config: key-format uses unsupported Argo variables {invalid}",
+            BlockedStatus,
+        )
+    if "pod.name" not in variables:
+        raise ErrorWithStatus(
+            "Invalid config: key-format must contain {{pod.name}}", BlockedStatus
+        )
+
+
+def get_retention_policy(config: ConfigData) -> Dict[str, int]:
+    """Returns the retentionPolicy fields set by the config, leaving out unlimited ones."""
+    return {
+        field: config[option]
+        for option, field in RETENTION_POLICY_CONFIG.items()
+        if config[option]
+    }
+
+
+def get_ttl_strategy(config: ConfigData) -> Dict[str, int]:
+    """Returns the default ttlStrategy fields set by the config, leaving out unset ones."""
+    return {
+        field: config[option] for option, field in TTL_STRATEGY_CONFIG.items() if config[option]
+    }
+
+
+def get_executor_environment(config: ConfigData) -> Dict[str, str]:
+    """Returns the environment variables of the executor set by the executor-* config options.
+
+    If executor-progress is false, both progress ticks are set to 0, which disables progress
+    reporting whatever their config options.
+
+    Raises:
+        ErrorWithStatus: If an option is not empty or a duration.
+    """
+    environment = {}
+    for option, name in EXECUTOR_ENVIRONMENT_CONFIG.items():
+        value = config[option]
+        if value and not is_go_duration(value):
+            raise ErrorWithStatus(
+                f"Invalid config: {option} must be empty or a duration such as 1m or 5s",
+                BlockedStatus,
+            )
+        if value:
+            environment[name] = value
+    if not config["executor-progress"]:
+        environment.update({name: "0" for name in _PROGRESS_ENVIRONMENT})
+    return environment
@@ -0,0 +1,219 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Parsing of the config options setting the runtime of the workflow-controller.
+
+These options set the worker pools, Go runtime, leader election and watched namespace of the
+controller, through its flags and environment in the Pebble layer.
+"""
+
+import logging
+import math
+import re
+from typing import Dict, Optional, Union
+
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import BlockedStatus, ConfigData
+
+from config_parsing import format_go_duration, is_namespace_name, parse_go_duration
+
+logger = logging.getLogger(__name__)
+
+AUTO = "auto"
+# Worker pool config options mapped to the controller flag they set, the number of workers per
+# CPU used in "auto" mode, and Argo's default number of workers, which is also the minimum used in
+# "auto" mode
+WORKER_POOLS = {
+    "workflow-workers": ("--workflow-workers", 16, 32),
+    "pod-cleanup-workers": ("--pod-cleanup-workers", 4, 4),
+    "cron-workflow-workers": ("--cron-workflow-workers", 4, 8),
+    "workflow-ttl-workers": ("--workflow-ttl-workers", 2, 4),
+}
+# Share of the container memory limit set as GOMEMLIMIT in "auto" mode, leaving headroom for
+# memory that the Go runtime does not manage
+GOMEMLIMIT_RATIO = 0.9
+MIB = 1024 * 1024
+# Go runtime config options, named after the environment variable they set
+GO_RUNTIME_CONFIG = ["GOMAXPROCS", "GOMEMLIMIT", "GOGC"]
+# Leader election config options, named after the environment variable they set, and Argo's
+# defaults
+LEADER_ELECTION_CONFIG = {
+    "LEADER_ELECTION_LEASE_DURATION": "15s",
+    "LEADER_ELECTION_RENEW_DEADLINE": "10s",
+    "LEADER_ELECTION_RETRY_PERIOD": "5s",
+}
+# client-go's leader election requires the renew deadline to be longer than the retry period
+# times this factor
+LEADER_ELECTION_JITTER_FACTOR = 1.2
+_GOMEMLIMIT = re.compile(r"^[0-9]+(B|KiB|MiB|GiB|TiB)?$")
+
+
+def parse_namespace_config(config: ConfigData) -> str:
+    """Returns the managed-namespace config option.
+
+    If the namespaced config option is set, the controller only watches this namespace, or the
+    model's namespace if empty.
+
+    Raises:
+        ErrorWithStatus: If managed-namespace is set without namespaced, or is not a namespace
+            name.
+    """
+    managed_namespace = config.get("managed-namespace", "").strip()
+    if managed_namespace and not config["namespaced"]:
+        raise ErrorWithStatus(
+            "Invalid config: managed-namespace requires namespaced to be true", BlockedStatus
+        )
+    if managed_namespace and not is_namespace_name(managed_namespace):
+        raise ErrorWithStatus(
+            "Invalid config managed-namespace: must be empty or a namespace name", BlockedStatus
+        )
+    return managed_namespace
+
+
+def parse_worker_config(config: ConfigData) -> Dict[str, Union[int, str, None]]:
+    """Returns the worker pool config options, as an int, "auto" or None if unset.
+
+    Raises:
+        ErrorWithStatus: If an option is not empty, "auto" or a positive integer.
+    """
+    workers = {}
+    for name in WORKER_POOLS:
+        value = str(config.get(name, "")).strip()
+        if value == "":
+            workers[name] = None
+        elif value == AUTO:
+            workers[name] = AUTO
+        elif value.isdigit() and int(value) > 0:
+            workers[name] = int(value)
+        else:
+            raise ErrorWithStatus(
+                f"Invalid config {name}={value}: must be empty, '{AUTO}' or a positive integer",
+                BlockedStatus,
+            )
+    return workers
+
+
+def get_worker_counts(
+    workers: Dict[str, Union[int, str, None]], cpu_limit: Optional[float]
+) -> Dict[str, Optional[int]]:
+    """Returns the size of each worker pool, resolving "auto" from the container's CPU limit.
+
+    A worker pool is None if it should be left to Argo's default, ie if it is unset, or if it is
+    "auto" and the container has no CPU limit.
+    """
+    counts = {}
+    for name, value in workers.items():
+        if value != AUTO:
+            counts[name] = value
+            continue
+        if cpu_limit is None:
+            logger.info(f"{name}={AUTO} but the container has no CPU limit, using Argo's default")
+            counts[name] = None
+            continue
+        _, per_cpu, default = WORKER_POOLS[name]
+        counts[name] = max(default, round(per_cpu * cpu_limit))
+        logger.info(f"{name}={AUTO} set to {counts[name]} for a CPU limit of {cpu_limit}")
+    return counts
+
+
+def parse_go_runtime_config(config: ConfigData) -> Dict[str, str]:
+    """Returns the gomaxprocs, gomemlimit and gogc config options, keyed by environment variable.
+
+    Raises:
+        ErrorWithStatus: If an option is invalid.
+    """
+    values = {name: str(config.get(name.lower(), "")).strip() for name in GO_RUNTIME_CONFIG}
+    if values["GOMAXPROCS"] not in ("", AUTO) and not (
+        values["GOMAXPROCS"].isdigit() and int(values["GOMAXPROCS"]) > 0
+    ):
+        raise ErrorWithStatus(
+            f"Invalid config gomaxprocs: must be empty, '{AUTO}' or a positive integer",
+            BlockedStatus,
+        )
+    if values["GOMEMLIMIT"] not in ("", AUTO) and not _GOMEMLIMIT.match(values["GOMEMLIMIT"]):
+        raise ErrorWithStatus(
+            f"Invalid config gomemlimit: must be empty, '{AUTO}' or a size such as 1800MiB",
+            BlockedStatus,
+        )
+    if values["GOGC"] not in ("", "off") and not values["GOGC"].isdigit():
+        raise ErrorWithStatus(
+            "Invalid config gogc: must be empty, 'off' or a percentage", BlockedStatus
+        )
+    return values
+
+
+def get_go_runtime_environment(
+    config: ConfigData, cpu_limit: Optional[float], memory_limit: Optional[int]
+) -> Dict[str, str]:
+    """Returns the Go runtime environment variables set by the config.
+
+    In "auto" mode, GOMAXPROCS is the CPU limit of the container rounded down (at least 1), and
+    GOMEMLIMIT is GOMEMLIMIT_RATIO of its memory limit.  Variables that are unset, or in "auto"
+    mode without a container limit, are left out so that Go uses its defaults.
+    """
+    environment = {}
+    for name, value in parse_go_runtime_config(config).items():
+        if value == AUTO and name == "GOMAXPROCS":
+            value = str(max(1, math.floor(cpu_limit))) if cpu_limit is not None else ""
+        elif value == AUTO and name == "GOMEMLIMIT":
+            value = (
+                f"{int(memory_limit * GOMEMLIMIT_RATIO) // MIB}MiB"
+                if memory_limit is not None
+                else ""
+            )
+        if value:
+            environment[name] = value
+    return environment
+
+
+def parse_leader_election_config(config: ConfigData) -> Dict[str, str]:
+    """Returns the leader-election-* config options, keyed by environment variable.
+
+    Raises:
+        ErrorWithStatus: If an option is not empty or a duration, or if the lease duration,
+            renew deadline and retry period, or Argo's defaults for those unset, are not
+            decreasing as required by client-go.
+    """
+    values = {}
+    for name in LEADER_ELECTION_CONFIG:
+        option = name.lower().replace("_", "-")
+        value = str(config.get(option, "")).strip()
+        if value and parse_go_duration(value) is None:
+            raise ErrorWithStatus(
+                f"Invalid config {option}: must be empty or a duration, eg 15s", BlockedStatus
+            )
+        values[name] = value
+
+    lease, renew, retry = (
+        parse_go_duration(values[name] or default)
+        for name, default in LEADER_ELECTION_CONFIG.items()
+    )
+    if not lease > renew > LEADER_ELECTION_JITTER_FACTOR * retry > 0:
+        raise ErrorWithStatus(
+            "Invalid config: must have leader-election-lease-duration > "
+            f"leader-election-renew-deadline > {LEADER_ELECTION_JITTER_FACTOR} * "
+            "leader-election-retry-period",
+            BlockedStatus,
+        )
+    return values
+
+
+def get_leader_election_environment(config: ConfigData) -> Dict[str, str]:
+    """Returns the leader election environment variables set by the config."""
+    return {name: value for name, value in parse_leader_election_config(config).items() if value}
+
+
+def get_kill_delay(config: ConfigData) -> str:
+    """Returns the time given to the controller to stop before it is killed, as a duration.
+
+    Argo does not release the lease when the controller stops, so a standby controller only
+    acquires it once it expires: at the earliest the lease duration after its last renewal,
+    which happened at most a retry period before the controller was stopped.  The kill delay is
+    the lease duration minus the retry period, so that the stopping controller has as much time
+    as possible to finish its operations but is never running alongside the new leader.
+    """
+    values = parse_leader_election_config(config)
+    lease, _, retry = (
+        parse_go_duration(values[name] or default)
+        for name, default in LEADER_ELECTION_CONFIG.items()
+    )
+    return format_go_duration(lease - retry)
@@ -0,0 +1,182 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Validation of the metricsConfig of the controller ConfigMap against the dashboard and alerts."""
+
+import functools
+import json
+import re
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+import yaml
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import BlockedStatus, ConfigData
+
+from config_parsing import is_go_duration, load_yaml_mapping
+
+METRICS_MODIFIERS_CONFIG_NAME = "metrics-modifiers"
+METRIC_PREFIX = "argo_workflows_"
+# Fields of a metric modifier in metricsConfig
+MODIFIER_FIELDS = {"disabled", "disabledAttributes", "histogramBuckets"}
+# Suffixes of the Prometheus series of a metric, for counters and histograms
+SERIES_SUFFIXES = ("", "_total", "_bucket", "_sum", "_count")
+DASHBOARDS_DIR = Path("src/grafana_dashboards")
+ALERT_RULES_DIR = Path("src/prometheus_alert_rules")
+
+_METRIC_NAME = re.compile(r"^[a-z][a-z0-9_]*$")
+_SERIES = re.compile(rf"\b{METRIC_PREFIX}[a-z0-9_]+\b")
+_STRING = re.compile(r'"(\\.|[^"\\])*"')
+
+
+def get_metrics_modifiers(config: ConfigData) -> Dict[str, dict]:
+    """Returns the metrics-modifiers config option as a dict.
+
+    The option maps metric names, without the argo_workflows_ prefix, to a modifier that may
+    set `disabled`, `disabledAttributes` and `histogramBuckets`.
+
+    Raises:
+        ErrorWithStatus: If the option is not a valid mapping of metric names to modifiers.
+    """
+    error = ErrorWithStatus(
+        f"Invalid config {METRICS_MODIFIERS_CONFIG_NAME}: must be a mapping of metric names, "
+        f"without the {METRIC_PREFIX} prefix, to disabled, disabledAttributes and/or "
+        "increasing histogramBuckets",
+        BlockedStatus,
+    )
+    modifiers = load_yaml_mapping(config, METRICS_MODIFIERS_CONFIG_NAME, error)
+
+    for name, modifier in modifiers.items():
+        if (
+            not isinstance(name, str)
+            or not _METRIC_NAME.match(name)
+            or name.startswith(METRIC_PREFIX)
+            or not isinstance(modifier, dict)
+            or not modifier
+            or not set(modifier) <= MODIFIER_FIELDS
+        ):
+            raise error
+        if not isinstance(modifier.get("disabled", False), bool):
+            raise error
+        attributes = modifier.get("disabledAttributes", [])
+        if not isinstance(attributes, list) or not all(
+            isinstance(a, str) and _METRIC_NAME.match(a) for a in attributes
+        ):
+            raise error
+        buckets = modifier.get("histogramBuckets", [])
+        if (
+            not isinstance(buckets, list)
+            or not all(isinstance(b, (int, float)) and not isinstance(b, bool) for b in buckets)
+            or any(b >= c for b, c in zip(buckets, buckets[1:]))
+        ):
+            raise error
+    return modifiers
+
+
+def parse_metrics_config(config: ConfigData):
+    """Validates the metrics-* config options.
+
+    The metrics that are disabled, or whose attributes are dropped, must not be used by the
+    charm's Grafana dashboards and Prometheus alert rules.
+
+    Raises:
+        ErrorWithStatus: If an option is invalid.
+    """
+    if config["metrics-ttl"] and not is_go_duration(config["metrics-ttl"]):
+        raise ErrorWithStatus(
+            "Invalid config metrics-ttl: must be empty or a duration, eg 10m", BlockedStatus
+        )
+    used = get_disabled_series_references(get_metrics_modifiers(config))
+    if used:
+        series = sorted({s for references in used.values() for s in references})
+        raise ErrorWithStatus(
+            f"Invalid config {METRICS_MODIFIERS_CONFIG_NAME}: disables {', '.join(series)} used "
+            f"by {', '.join(sorted(used))}",
+            BlockedStatus,
+        )
+
+
+def get_disabled_series_references(
+    modifiers: Dict[str, dict],
+    dashboards_dir: Path = DASHBOARDS_DIR,
+    alert_rules_dir: Path = ALERT_RULES_DIR,
+) -> Dict[str, Set[str]]:
+    """Returns the dashboards and alerts using series disabled or trimmed by modifiers.
+
+    A series is used if an expression of a dashboard or an alert rule selects it, or, for the
+    series of a metric with disabledAttributes, if it also uses one of these attributes.  The
+    returned dict maps each dashboard or alert to the series it uses, with the dropped attributes
+    in braces.
+    """
+    references = {}
+    for source, expression in get_expressions(dashboards_dir, alert_rules_dir):
+        for series in _get_series(expression):
+            metric = _get_metric(series, modifiers)
+            if metric is None:
+                continue
+            modifier = modifiers[metric]
+            if modifier.get("disabled"):
+                references.setdefault(source, set()).add(series)
+                continue
+            attributes = sorted(
+                _get_label_names(expression) & set(modifier.get("disabledAttributes", []))
+            )
+            if attributes:
+                references.setdefault(source, set()).add(f"{series}{{{','.join(attributes)}}}")
+    return references
+
+
+def _get_metric(series: str, modifiers: Dict[str, dict]):
+    """Returns the metric of modifiers that series is exposed for, if any."""
+    name = series.split(METRIC_PREFIX, 1)[1]
+    for suffix in SERIES_SUFFIXES:
+        if name.endswith(suffix) and name[: len(name) - len(suffix)] in modifiers:
+            return name[: len(name) - len(suffix)]
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_expressions(
+    dashboards_dir: Path = DASHBOARDS_DIR, alert_rules_dir: Path = ALERT_RULES_DIR
+) -> Tuple[Tuple[str, str], ...]:
+    """Returns the PromQL expressions of the Grafana dashboards and Prometheus alert rules.
+
+    Every expression is returned with its source, `dashboard <name>` or `alert <name>`.  The
+    dashboards and alert rules are static charm content, so they are only loaded once.
+    """
+    expressions = []
+    for path in sorted(dashboards_dir.glob("*.json.tmpl")):
+        dashboard = json.loads(path.read_text())
+        source = f"dashboard {path.name.split('.')[0]}"
+        expressions.extend((source, expression) for expression in _find_expressions(dashboard))
+    for path in sorted(alert_rules_dir.glob("*.rule*")):
+        rules = yaml.safe_load(path.read_text())
+        for group in rules.get("groups", [{"rules": [rules]}]):
+            for rule in group["rules"]:
+                expressions.append((f"alert {rule['alert']}", rule["expr"]))
+    return tuple(expressions)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_series(expression: str) -> Tuple[str, ...]:
+    """Returns the names of the Argo Workflows series selected by a PromQL expression."""
+    return tuple(_SERIES.findall(expression))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_label_names(expression: str) -> FrozenSet[str]:
+    """Returns the words of a PromQL expression that may be label names."""
+    # Only label names are left, once metric names and label values are removed
+    return frozenset(re.findall(r"\b\w+\b", _SERIES.sub("", _STRING.sub("", expression))))
+
+
+def _find_expressions(value) -> List[str]:
+    """Returns the values of the `expr` keys nested in value."""
+    if isinstance(value, dict):
+        return [
+            expression
+            for key, nested in value.items()
+            for expression in ([nested] if key == "expr" else _find_expressions(nested))
+        ]
+    if isinstance(value, list):
+        return [expression for nested in value for expression in _find_expressions(nested)]
+    return []
@@ -0,0 +1,35 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""The OTLP endpoint the controller pushes its metrics to."""
+
+from typing import Optional
+from urllib.parse import urlparse
+
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import BlockedStatus, ConfigData
+
+OTLP_ENDPOINT_CONFIG_NAME = "otlp-endpoint"
+OTLP_ENDPOINT_SCHEMES = ("http", "https")
+
+
+def get_otlp_endpoint(config: ConfigData) -> Optional[str]:
+    """Returns the otlp-endpoint config option, or None if metrics are not pushed over OTLP."""
+    return config[OTLP_ENDPOINT_CONFIG_NAME] or None
+
+
+def parse_otlp_config(config: ConfigData):
+    """Validates the otlp-endpoint config option.
+
+    Raises:
+        ErrorWithStatus: If the option is not empty or an http(s) URL with a host.
+    """
+    endpoint = config[OTLP_ENDPOINT_CONFIG_NAME]
+    if not endpoint:
+        return
+    url = urlparse(endpoint)
+    if url.scheme not in OTLP_ENDPOINT_SCHEMES or not url.hostname:
+        raise ErrorWithStatus(
+            f"Invalid config {OTLP_ENDPOINT_CONFIG_NAME}: must be empty or an http(s) URL, eg "
+            "http://otel-collector:4317",
+            BlockedStatus,
+        )
@@ -0,0 +1,86 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Collection of pprof profiles from the workflow controller."""
+
+import logging
+import re
+import shutil
+import time
+import urllib.request
+from pathlib import Path
+from typing import Optional
+
+from components.pebble_component import LIVENESS_PROBE_PORT
+
+logger = logging.getLogger(__name__)
+
+# The controller serves pprof on its diagnostics port when ARGO_PPROF is set
+PPROF_URL = f"http://localhost:{LIVENESS_PROBE_PORT}/debug/pprof"
+# Profile kinds mapped to their pprof endpoint
+PROFILE_ENDPOINTS = {"cpu": "profile", "heap": "heap", "goroutine": "goroutine"}
+PROFILES_DIR = Path("/tmp/argo-controller-profiles")
+MAX_DURATION_SECONDS = 10 * 60
+# Time allowed for the profile download besides the sampling duration
+DOWNLOAD_TIMEOUT_SECONDS = 30
+PPROF_READY_TIMEOUT_SECONDS = 60
+_DURATION = re.compile(r"^(?P<value>[1-9][0-9]*)(?P<unit>s|m)$")
+
+
+def parse_duration(duration: str) -> int:
+    """Returns a duration such as 30s or 2m in seconds.
+
+    Raises:
+        ValueError: If the duration is invalid or longer than MAX_DURATION_SECONDS.
+    """
+    match = _DURATION.match(duration)
+    if match is None:
+        raise ValueError(f"Invalid duration {duration}: must be in seconds (30s) or minutes (2m)")
+    seconds = int(match.group("value")) * (60 if match.group("unit") == "m" else 1)
+    if seconds > MAX_DURATION_SECONDS:
+        raise ValueError(f"Invalid duration {duration}: must be at most 10m")
+    return seconds
+
+
+def wait_for_pprof(timeout: float = PPROF_READY_TIMEOUT_SECONDS):
+    """Waits until the controller serves pprof, eg after it restarted to enable it.
+
+    Raises:
+        TimeoutError: If pprof is not served within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(f"{PPROF_URL}/", timeout=5):
+                return
+        except OSError as e:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"pprof not served at {PPROF_URL} after {timeout}s") from e
+        time.sleep(2)
+
+
+def collect_profile(kind: str, seconds: int, directory: Optional[Path] = None) -> Path:
+    """Saves a profile of the controller in directory (PROFILES_DIR) and returns its path.
+
+    The profile is streamed to the file as it is received, without holding it in memory.  CPU
+    profiles sample the controller for the given number of seconds.
+
+    Raises:
+        OSError: If the profile cannot be downloaded or saved, in which case no file is left.
+    """
+    url = f"{PPROF_URL}/{PROFILE_ENDPOINTS[kind]}"
+    timeout = DOWNLOAD_TIMEOUT_SECONDS
+    if kind == "cpu":
+        url += f"?seconds={seconds}"
+        timeout += seconds
+
+    directory = directory or PROFILES_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{kind}-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}.pb.gz"
+    logger.info(f"Collecting {kind} profile from {url} into {path}")
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response, path.open("wb") as file:
+            shutil.copyfileobj(response, file)
+    except OSError:
+        path.unlink(missing_ok=True)
+        raise
+    return path
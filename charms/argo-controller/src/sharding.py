@@ -0,0 +1,65 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Sharding of workflows across argo-controller applications by their controller instance ID."""
+
+import hashlib
+import re
+from typing import Dict, Iterable, List
+
+from charmed_kubeflow_chisme.exceptions import ErrorWithStatus
+from ops import BlockedStatus, ConfigData
+
+INSTANCE_ID_CONFIG_NAME = "instance-id"
+# Label of the workflows, and of the workflow templates, cron workflows and workflow pods, which
+# selects the controller with that instanceID
+INSTANCE_ID_LABEL = "workflows.argoproj.io/controller-instanceid"
+# Secret with the credentials of the default artifact repository, suffixed with the instance ID
+ARTIFACT_SECRET = "mlpipeline-minio-artifact"
+# The instance ID is a label value, and a suffix of the ConfigMap name
+_INSTANCE_ID = re.compile(r"^[a-z0-9]([-a-z0-9]{0,61}[a-z0-9])?$")
+
+
+def get_instance_id(config: ConfigData) -> str:
+    """Returns the instance-id config option, empty if the controller is not sharded.
+
+    Raises:
+        ErrorWithStatus: If the option is not empty or a lowercase DNS label.
+    """
+    instance_id = config.get(INSTANCE_ID_CONFIG_NAME, "").strip()
+    if instance_id and not _INSTANCE_ID.match(instance_id):
+        raise ErrorWithStatus(
+            f"Invalid config {INSTANCE_ID_CONFIG_NAME}: must be empty or lowercase alphanumeric "
+            "characters or '-', at most 63",
+            BlockedStatus,
+        )
+    return instance_id
+
+
+def get_artifact_secret_name(config: ConfigData) -> str:
+    """Returns the name of the artifact repository Secret, suffixed with the instance ID if set.
+
+    Applications with different instance IDs in a model each render their own Secret, instead of
+    overwriting each other's.
+    """
+    instance_id = get_instance_id(config)
+    return f"{ARTIFACT_SECRET}-{instance_id}" if instance_id else ARTIFACT_SECRET
+
+
+def get_shard(name: str, instance_ids: List[str]) -> str:
+    """Returns the instance ID of the shard that the namespace or workflow name is assigned to.
+
+    The assignment uses rendezvous hashing: adding or removing a shard only moves the names
+    assigned to that shard.
+    """
+    return max(
+        instance_ids,
+        key=lambda instance_id: hashlib.sha256(f"{instance_id}/{name}".encode("utf-8")).digest(),
+    )
+
+
+def get_shard_assignment(names: Iterable[str], instance_ids: List[str]) -> Dict[str, List[str]]:
+    """Returns the names, sorted, assigned to each of instance_ids."""
+    assignment = {instance_id: [] for instance_id in instance_ids}
+    for name in sorted(names):
+        assignment[get_shard(name, instance_ids)].append(name)
+    return assignment
@@ -13,6 +13,9 @@ output "requires" {
   value = {
     s3_credentials = "s3-credentials",
     object_storage = "object-storage",
+    postgresql     = "postgresql",
+    mysql          = "mysql",
+    otlp           = "otlp",
     logging        = "logging"
   }
 }
@@ -17,3 +17,9 @@ S3_INTEGRATOR = CharmSpec(
     channel="2/stable",
     trust=False,
 )
+
+POSTGRESQL_K8S = CharmSpec(
+    charm="postgresql-k8s",
+    channel="14/stable",
+    trust=True,
+)
@@ -0,0 +1,81 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import logging
+from pathlib import Path
+
+import pytest
+import yaml
+from charms_dependencies import MINIO
+from pytest_operator.plugin import OpsTest
+from tenacity import Retrying, stop_after_delay, wait_fixed
+
+METADATA = yaml.safe_load(Path("./metadata.yaml").read_text())
+CHARM_ROOT = "."
+ARGO_CONTROLLER = METADATA["name"]
+ARGO_CONTROLLER_TRUST = True
+OTEL_COLLECTOR = "otel-collector"
+OTEL_COLLECTOR_MANIFESTS = "tests/data/otel_collector.yaml"
+# Metric of the controller, without the argo_workflows_ prefix added for Prometheus only
+EXPECTED_METRIC = "queue_depth_gauge"
+
+
+log = logging.getLogger(__name__)
+
+
+@pytest.mark.abort_on_fail
+async def test_build_and_deploy_with_otel_collector(ops_test: OpsTest, request):
+    entity_url = (
+        await ops_test.build_charm(CHARM_ROOT)
+        if not (entity_url := request.config.getoption("--charm-path"))
+        else entity_url
+    )
+    log.info(f"Built charm {entity_url}")
+
+    ret_code, stdout, stderr = await ops_test.run(
+        "kubectl", f"--namespace={ops_test.model_name}", "apply", "-f", OTEL_COLLECTOR_MANIFESTS
+    )
+    assert ret_code == 0, f"Failed to deploy the OTel collector:\n{stdout}\n{stderr}"
+
+    image_path = METADATA["resources"]["oci-image"]["upstream-source"]
+    await ops_test.model.deploy(
+        entity_url=entity_url,
+        application_name=ARGO_CONTROLLER,
+        resources={"oci-image": image_path},
+        trust=ARGO_CONTROLLER_TRUST,
+        config={"otlp-endpoint": f"http://{OTEL_COLLECTOR}:4317"},
+    )
+    await ops_test.model.deploy(
+        entity_url=MINIO.charm, config=MINIO.config, channel=MINIO.channel, trust=MINIO.trust
+    )
+    await ops_test.model.integrate(
+        f"{ARGO_CONTROLLER}:object-storage", f"{MINIO.charm}:object-storage"
+    )
+    await ops_test.model.wait_for_idle(apps=[ARGO_CONTROLLER], status="active", timeout=60 * 10)
+
+
+async def test_metrics_pushed_to_otel_collector(ops_test: OpsTest):
+    """Test that the controller pushes its metrics to the collector over OTLP."""
+    for attempt in Retrying(stop=stop_after_delay(60 * 5), wait=wait_fixed(15), reraise=True):
+        with attempt:
+            ret_code, stdout, stderr = await ops_test.run(
+                "kubectl", f"--namespace={ops_test.model_name}", "logs", OTEL_COLLECTOR
+            )
+            assert ret_code == 0, f"Failed to read the OTel collector logs:\n{stderr}"
+            assert EXPECTED_METRIC in stdout
+
+
+async def test_delta_temporality(ops_test: OpsTest):
+    """Test that the controller pushes delta metrics with otlp-delta-temporality."""
+    await ops_test.model.applications[ARGO_CONTROLLER].set_config(
+        {"otlp-delta-temporality": "true"}
+    )
+    await ops_test.model.wait_for_idle(apps=[ARGO_CONTROLLER], status="active", timeout=60 * 5)
+
+    for attempt in Retrying(stop=stop_after_delay(60 * 5), wait=wait_fixed(15), reraise=True):
+        with attempt:
+            ret_code, stdout, stderr = await ops_test.run(
+                "kubectl", f"--namespace={ops_test.model_name}", "logs", OTEL_COLLECTOR
+            )
+            assert ret_code == 0, f"Failed to read the OTel collector logs:\n{stderr}"
+            assert "AggregationTemporality Delta" in stdout
@@ -1,14 +1,31 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-from unittest.mock import MagicMock, PropertyMock, patch
+import io
+from base64 import b64encode
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytest
+import yaml
+from charmed_kubeflow_chisme.exceptions import GenericCharmRuntimeError
+from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler
 from charmed_kubeflow_chisme.testing import add_sdi_relation_to_harness
-from ops.model import ActiveStatus, BlockedStatus
-from ops.testing import Harness
+from lightkube.core.exceptions import ApiError
+from lightkube.models.meta_v1 import ManagedFieldsEntry, ObjectMeta
+from lightkube.resources.apiextensions_v1 import CustomResourceDefinition
+from lightkube.resources.core_v1 import ConfigMap, Namespace, Secret
+from ops.model import ActiveStatus, BlockedStatus, Container, WaitingStatus
+from ops.testing import ActionFailed, Harness
 
-from charm import ArgoControllerOperator
+from charm import K8S_RESOURCE_FILES, ArgoControllerOperator
+from components.artifact_repositories_component import DEFAULT_ARTIFACT_REPOSITORY_ANNOTATION
+from components.kubernetes_component import MANIFESTS_DIGEST_ANNOTATION
+from components.namespace_parallelism_component import PARALLELISM_LIMIT_LABEL
+from components.pebble_component import ARGO_CONTROLLER_CONFIGMAP
+from components.qps_auto_tuner_component import parse_k8s_request_metrics
+from controller_runtime import get_kill_delay
+from metrics_config import get_disabled_series_references, get_expressions
 
 MOCK_OBJECT_STORAGE_DATA = {
     "access-key": "access-key",
@@ -28,10 +45,16 @@ MOCK_S3_DATA_BASE = {
 
 EXPECTED_ENVIRONMENT = {
     "ARGO_NAMESPACE": "namespace",
-    "LEADER_ELECTION_IDENTITY": "argo-controller",
+    "LEADER_ELECTION_IDENTITY": "argo-controller-0",
 }
 
 
+@pytest.fixture(autouse=True)
+def mocked_crds_established_timeout(mocker):
+    """Does not wait for the CRDs applied to the mocked lightkube client to be established."""
+    mocker.patch("components.crd_component.CRDS_ESTABLISHED_TIMEOUT", 0)
+
+
 @pytest.fixture
 def harness() -> Harness:
     harness = Harness(ArgoControllerOperator)
@@ -64,11 +87,62 @@ def test_log_forwarding(
 
 
 def test_not_leader(harness, mocked_lightkube_client, mocked_kubernetes_service_patch):
-    """Test when we are not the leader."""
-    harness.begin_with_initial_hooks()
-    # Assert that we are not Active, and that the leadership-gate is the cause.
-    assert not isinstance(harness.charm.model.unit.status, ActiveStatus)
-    assert harness.charm.model.unit.status.message.startswith("[leadership-gate]")
+    """Test that a unit that is not the leader runs a standby controller only."""
+    # Arrange
+    harness.set_leader(False)
+    harness.set_model_name(EXPECTED_ENVIRONMENT["ARGO_NAMESPACE"])
+    harness.begin()
+    harness.set_can_connect("argo-controller", True)
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+
+    # Act
+    harness.charm.on.install.emit()
+
+    # Assert
+    assert isinstance(harness.charm.model.unit.status, ActiveStatus)
+    container = harness.charm.unit.get_container("argo-controller")
+    service = container.get_plan().services["argo-controller"]
+    assert service.environment == EXPECTED_ENVIRONMENT
+    mocked_lightkube_client.apply.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "leader, planned_units, expected_deleted",
+    [
+        pytest.param(False, 1, False, id="non-leader-scale-down"),
+        pytest.param(True, 1, False, id="leader-scale-down"),
+        pytest.param(True, 0, True, id="application-removed"),
+    ],
+)
+def test_remove_deletes_resources_with_application_only(
+    harness,
+    mocked_lightkube_client,
+    mocked_kubernetes_service_patch,
+    mocker,
+    leader,
+    planned_units,
+    expected_deleted,
+):
+    """Test that removing a unit only deletes the shared resources with the application."""
+    # Arrange
+    harness.set_leader(leader)
+    harness.set_planned_units(planned_units)
+    harness.begin()
+    mocked_delete = mocker.patch.object(KubernetesResourceHandler, "delete")
+    artifact_repositories = ConfigMap(
+        metadata=ObjectMeta(name="artifact-repositories", namespace="team-a")
+    )
+    mocked_lightkube_client.list.side_effect = lambda resource_type, **kwargs: (
+        [artifact_repositories] if resource_type is ConfigMap else []
+    )
+
+    # Act
+    harness.charm.on.remove.emit()
+
+    # Assert - the CRDs, and the ConfigMap and Secrets
+    assert mocked_delete.call_count == (2 if expected_deleted else 0)
+    # Assert - the fields of the artifact repositories are released
+    assert mocked_lightkube_client.apply.called == expected_deleted
 
 
 def test_object_storage_relation_with_data(
@@ -82,10 +156,6 @@ def test_object_storage_relation_with_data(
     # Arrange
     harness.begin()
 
-    # Mock:
-    # * leadership_gate to be active and executed
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
-
     # Add relation with data.  This should trigger a charm reconciliation due to relation-changed.
     add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
 
@@ -104,10 +174,6 @@ def test_object_storage_relation_without_data(
     # Arrange
     harness.begin()
 
-    # Mock:
-    # * leadership_gate to be active and executed
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
-
     # Add relation with data.  This should trigger a charm reconciliation due to relation-changed.
     add_sdi_relation_to_harness(harness, "object-storage", data={})
 
@@ -127,9 +193,7 @@ def test_object_storage_relation_without_relation(
     harness.begin()
 
     # Mock:
-    # * leadership_gate to be active and executed
     # * s3_relations_conflict_detector to be active (tested separately)
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
     harness.charm.s3_relations_conflict_detector.get_status = MagicMock(
         return_value=ActiveStatus()
     )
@@ -166,7 +230,6 @@ def test_s3_relations_conflict_detector_status(
     - both active  → Blocked (too many)
     """
     harness.begin()
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
 
     if add_s3_credentials:
         harness.add_relation("s3-credentials", "s3-provider")
@@ -187,10 +250,8 @@ def test_kubernetes_created_method(
     harness.set_leader(True)
     harness.begin()
 
-    # Need to mock the leadership-gate to be active, and the kubernetes auth component so that it
-    # sees the expected resources when calling _get_missing_kubernetes_resources
-
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
+    # Need to mock the kubernetes auth component so that it sees the expected resources when
+    # calling _get_missing_kubernetes_resources
 
     # Add relation with data.  This should trigger a charm reconciliation due to relation-changed.
     add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
@@ -203,15 +264,318 @@ def test_kubernetes_created_method(
     harness.charm.on.install.emit()
 
     # FIXME: This is a hardcoded count of the Kubernetes objects that should be created.
-    # `reconcile` is called 3 times (13 resources × 3 = 39):
+    # `reconcile` is called 3 times:
     #   - `object_storage_relation_changed` fires once but triggers 2 reconcile cycles because
     #     both RelationCountGateComponent and SdiRelationDataReceiverComponent observe it
-    #     (CharmReconciler registers them independently without deduplication).
-    #   - `install` triggers a third reconcile cycle.
-    assert mocked_lightkube_client.apply.call_count == 39
+    #     (CharmReconciler registers them independently without deduplication).  The first
+    #     applies the CRDs (11) and the ConfigMap and Secret (2), the second trusts the stored
+    #     digest of the CRDs but gets the live ConfigMap and Secret.  The mocked client returns
+    #     objects without the digest annotation, so these are re-applied (2).
+    #   - `install` re-applies the CRDs (11), and the ConfigMap and Secret (2) for the same
+    #     reason.
+    assert mocked_lightkube_client.apply.call_count == 28
     assert isinstance(harness.charm.kubernetes_resources.status, ActiveStatus)
 
 
+def _applied_resources(mocked_lightkube_client, resource_type=None):
+    """Returns the resources passed to the mocked lightkube client's apply."""
+    return [
+        call.kwargs["obj"]
+        for call in mocked_lightkube_client.apply.call_args_list
+        if resource_type is None or isinstance(call.kwargs["obj"], resource_type)
+    ]
+
+
+def _mock_live_resources(mocked_lightkube_client, resources):
+    """Mocks the lightkube client's get to return resources by type and name, or a 404."""
+    live = {(type(resource), resource.metadata.name): resource for resource in resources}
+
+    def get(resource_type, name, namespace=None):
+        if (resource_type, name) not in live:
+            raise ApiError(response=MagicMock(json=MagicMock(return_value={"code": 404})))
+        return live[(resource_type, name)]
+
+    mocked_lightkube_client.get.side_effect = get
+
+
+def test_kubernetes_apply_skipped_when_manifests_unchanged(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch
+):
+    """Test that resources are only re-applied when the rendered manifests change."""
+    # Arrange
+    harness.set_leader(True)
+    harness.begin()
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    component = harness.charm.kubernetes_resources.component
+    # Mock the live objects as the ones last applied, carrying the digest of the manifests
+    deployed_resources = _applied_resources(mocked_lightkube_client, (ConfigMap, Secret))[-2:]
+    _mock_live_resources(mocked_lightkube_client, deployed_resources)
+    digest = component.get_manifests_digest(harness.charm._context_callable())
+    assert all(
+        resource.metadata.annotations[MANIFESTS_DIGEST_ANNOTATION] == digest
+        for resource in deployed_resources
+    )
+    mocked_lightkube_client.apply.reset_mock()
+
+    # Act
+    component.configure_charm(None)
+
+    # Assert
+    mocked_lightkube_client.apply.assert_not_called()
+
+    # Act - a live object lost the annotation, eg it was replaced
+    deployed_resources[0].metadata.annotations = {}
+    component.configure_charm(None)
+
+    # Assert
+    assert mocked_lightkube_client.apply.call_count == 2
+
+    # Act - changing an input of the templates changes the digest
+    mocked_lightkube_client.apply.reset_mock()
+    with harness.hooks_disabled():
+        harness.update_config({"kubelet-insecure": False})
+    component.configure_charm(None)
+
+    # Assert
+    assert mocked_lightkube_client.apply.call_count == 2
+
+
+def test_kubernetes_unchanged_manifests_only_get_applied_objects(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch, mocker
+):
+    """Test that a hook with unchanged manifests only gets the applied objects by name."""
+    # Arrange
+    harness.set_leader(True)
+    harness.begin()
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    component = harness.charm.kubernetes_resources.component
+    deployed_resources = _applied_resources(mocked_lightkube_client, (ConfigMap, Secret))[-2:]
+    _mock_live_resources(mocked_lightkube_client, deployed_resources)
+    mocked_load_generic_resources = mocker.patch(
+        "charmed_kubeflow_chisme.components.kubernetes_component."
+        "load_in_cluster_generic_resources"
+    )
+    mocked_lightkube_client.reset_mock()
+
+    # Act
+    component.configure_charm(None)
+    status = component.get_status()
+
+    # Assert - no list, apply or load of the generic resources, and the status reuses the check
+    assert isinstance(status, ActiveStatus)
+    mocked_load_generic_resources.assert_not_called()
+    assert [call[0] for call in mocked_lightkube_client.method_calls] == ["get", "get"]
+    assert {
+        (call.args[0], call.args[1]) for call in mocked_lightkube_client.get.call_args_list
+    } == {(type(resource), resource.metadata.name) for resource in deployed_resources}
+
+
+def test_crds_applied_on_install_upgrade_or_repair(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch
+):
+    """Test that CRDs are applied on install and upgrade-charm, or when they drifted."""
+    # Arrange
+    harness.set_leader(True)
+    harness.begin()
+
+    # Act
+    harness.charm.on.install.emit()
+
+    # Assert - CRDs are applied, then waited on until Established
+    deployed_crds = _applied_resources(mocked_lightkube_client, CustomResourceDefinition)
+    assert len(deployed_crds) == 11
+    mocked_lightkube_client.list.assert_any_call(
+        CustomResourceDefinition, labels=harness.charm.crds.component._krh_labels
+    )
+
+    # Arrange - mock the live CRDs as the ones applied
+    _mock_live_resources(mocked_lightkube_client, deployed_crds)
+    mocked_lightkube_client.apply.reset_mock()
+
+    # Act
+    harness.charm.on.config_changed.emit()
+
+    # Assert
+    assert len(_applied_resources(mocked_lightkube_client, CustomResourceDefinition)) == 0
+
+    # Act
+    harness.charm.on.upgrade_charm.emit()
+
+    # Assert
+    assert len(_applied_resources(mocked_lightkube_client, CustomResourceDefinition)) == 11
+
+    # Arrange - mock a live CRD as missing
+    _mock_live_resources(mocked_lightkube_client, deployed_crds[1:])
+    mocked_lightkube_client.apply.reset_mock()
+    mocked_lightkube_client.get.reset_mock()
+
+    # Act
+    harness.charm.on.config_changed.emit()
+
+    # Assert - the stored digest is trusted, without getting the live CRDs
+    assert len(_applied_resources(mocked_lightkube_client, CustomResourceDefinition)) == 0
+    assert not any(
+        call.args[0] is CustomResourceDefinition
+        for call in mocked_lightkube_client.get.call_args_list
+    )
+
+    # Act
+    harness.charm.on.update_status.emit()
+
+    # Assert - the drift is detected and repaired
+    assert len(_applied_resources(mocked_lightkube_client, CustomResourceDefinition)) == 11
+
+
+def _crd(name, **conditions):
+    """Returns a mock of a live CRD reporting conditions, given as type=status."""
+    crd = MagicMock()
+    crd.metadata.name = name
+    crd.status.conditions = [
+        MagicMock(type=type_, status=status, message=f"{type_} is {status}")
+        for type_, status in conditions.items()
+    ]
+    return crd
+
+
+def test_crds_wait_for_established(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch, mocker
+):
+    """Test that applied CRDs are waited on until established, for a bounded time."""
+    # Arrange
+    mocker.patch("components.crd_component.CRDS_ESTABLISHED_TIMEOUT", 60)
+    mocked_sleep = mocker.patch("components.crd_component.time.sleep")
+    harness.set_leader(True)
+    harness.begin()
+    component = harness.charm.crds.component
+    resources = [_crd("workflows.argoproj.io"), _crd("workflowtemplates.argoproj.io")]
+    mocked_lightkube_client.list.side_effect = [
+        [_crd("workflows.argoproj.io", Established="True")],
+        [
+            _crd("workflows.argoproj.io", Established="True"),
+            _crd("workflowtemplates.argoproj.io", Established="True"),
+        ],
+    ]
+
+    # Act
+    component._on_resources_applied(resources)
+
+    # Assert
+    assert mocked_lightkube_client.list.call_count == 2
+    mocked_sleep.assert_called_once()
+
+    # Arrange - a CRD never established
+    mocker.patch("components.crd_component.time.monotonic", side_effect=[0, 30, 61])
+    mocked_lightkube_client.list.side_effect = None
+    mocked_lightkube_client.list.return_value = [_crd("workflows.argoproj.io")]
+    mocked_lightkube_client.list.reset_mock()
+
+    # Act - the wait gives up after the timeout, leaving the status to report the CRD
+    component._on_resources_applied(resources[:1])
+
+    # Assert
+    assert mocked_lightkube_client.list.call_count == 2
+
+
+def test_crds_rejected(harness, mocked_lightkube_client, mocked_kubernetes_service_patch):
+    """Test that the wait fails, and the status is Blocked, when a CRD is rejected."""
+    # Arrange
+    harness.set_leader(True)
+    harness.begin()
+    component = harness.charm.crds.component
+    crd = _crd("workflows.argoproj.io", NamesAccepted="False", Established="False")
+    mocked_lightkube_client.list.return_value = [crd]
+    # The CRD was applied, so the status checks its conditions
+    component._stored.manifests_digest = "digest"
+    component._stored.resources = []
+
+    # Act and Assert
+    with pytest.raises(GenericCharmRuntimeError, match="NamesAccepted is False"):
+        component._on_resources_applied([crd])
+    status = component.get_status()
+    assert isinstance(status, BlockedStatus)
+    assert status.message.startswith("CRDs rejected: workflows.argoproj.io")
+
+
+@pytest.mark.parametrize(
+    "config, expected_crds_count, expected_minimal",
+    [
+        pytest.param({}, 11, False, id="default"),
+        pytest.param({"minimal-crds": True}, 11, True, id="minimal"),
+        pytest.param({"metacontroller-crds": False}, 8, False, id="no-metacontroller"),
+    ],
+)
+def test_crds_config(
+    harness,
+    mocked_lightkube_client,
+    mocked_kubernetes_service_patch,
+    config,
+    expected_crds_count,
+    expected_minimal,
+):
+    """Test that the CRDs are selected and trimmed as set in the config."""
+    # Arrange
+    harness.set_leader(True)
+    harness.update_config(config)
+    harness.begin()
+
+    # Act
+    harness.charm.on.install.emit()
+
+    # Assert
+    crds = _applied_resources(mocked_lightkube_client, CustomResourceDefinition)
+    assert len(crds) == expected_crds_count
+    assert all(
+        crd.metadata.annotations[MANIFESTS_DIGEST_ANNOTATION]
+        == harness.charm.crds.component._stored.manifests_digest
+        for crd in crds
+    )
+    workflow_task_results = next(
+        crd for crd in crds if crd.metadata.name == "workflowtaskresults.argoproj.io"
+    )
+    outputs_schema = workflow_task_results.spec.versions[0].schema.openAPIV3Schema.properties[
+        "outputs"
+    ]
+    assert ("properties" not in outputs_schema) == expected_minimal
+
+
+def test_crds_managed_by_application_without_instance_id(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch
+):
+    """Test that an application with an instance-id only waits for the CRDs to exist."""
+    # Arrange
+    harness.set_leader(True)
+    harness.update_config({"instance-id": "shard-a"})
+    harness.begin()
+    mocked_lightkube_client.get.side_effect = ApiError(
+        response=MagicMock(json=MagicMock(return_value={"code": 404}))
+    )
+
+    # Act
+    harness.charm.on.install.emit()
+
+    # Assert
+    assert len(_applied_resources(mocked_lightkube_client, CustomResourceDefinition)) == 0
+    status = harness.charm.crds.component.get_status()
+    assert isinstance(status, WaitingStatus)
+    assert "workflows.argoproj.io" in status.message
+
+    # Arrange - the CRDs are established by the application without an instance-id
+    established = MagicMock(type="Established", status="True")
+    mocked_lightkube_client.get.side_effect = None
+    mocked_lightkube_client.get.return_value.status.conditions = [established]
+
+    # Assert
+    assert isinstance(harness.charm.crds.component.get_status(), ActiveStatus)
+
+    # Act - once established, the CRDs are only checked again on the drift check events
+    mocked_lightkube_client.get.reset_mock()
+    harness.charm.on.config_changed.emit()
+
+    # Assert
+    mocked_lightkube_client.get.assert_not_called()
+    assert isinstance(harness.charm.crds.component.get_status(), ActiveStatus)
+
+
 def test_pebble_services_running(
     harness, mocked_lightkube_client, mocked_kubernetes_service_patch
 ):
@@ -222,11 +586,9 @@ def test_pebble_services_running(
     harness.set_can_connect("argo-controller", True)
 
     # Mock:
-    # * leadership_gate to have get_status=>Active
     # * s3_relations_conflict_detector to be active (tested separately)
     # * object_storage_relation to return mock data, making the item go active
     # * kubernetes_resources to have get_status=>Active
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
     harness.charm.s3_relations_conflict_detector.get_status = MagicMock(
         return_value=ActiveStatus()
     )
@@ -247,51 +609,1740 @@ def test_pebble_services_running(
     assert environment == EXPECTED_ENVIRONMENT
 
 
-@pytest.mark.parametrize(
-    "raw_endpoint, expected_endpoint",
-    [
-        ("http://10.0.0.1", "10.0.0.1"),
-        ("https://s3.example.com", "s3.example.com"),
-        ("http://10.0.0.1:9000", "10.0.0.1:9000"),
-        ("https://s3.example.com:443", "s3.example.com:443"),
-        ("10.0.0.1", "10.0.0.1"),
-        ("10.0.0.1:9000", "10.0.0.1:9000"),
-    ],
-)
-def test_s3_endpoint_scheme_is_stripped(
-    harness,
-    mocked_lightkube_client,
-    mocked_kubernetes_service_patch,
-    mocker,
-    raw_endpoint,
-    expected_endpoint,
+def test_pebble_replan_only_when_layer_changes(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch, mocker
 ):
-    """Test that URL schemes are stripped from S3 endpoints before passing to Argo.
-
-    Argo's S3 client requires a bare host[:port] endpoint and rejects full URLs
-    such as 'http://10.0.0.1' with "Endpoint url cannot have fully qualified paths".
-    """
+    """Test that the service is only replanned when the Pebble layer changes."""
+    # Arrange
     harness.begin()
-    harness.charm.leadership_gate.get_status = MagicMock(return_value=ActiveStatus())
+    harness.set_can_connect("argo-controller", True)
+    harness.charm.s3_relations_conflict_detector.get_status = MagicMock(
+        return_value=ActiveStatus()
+    )
+    harness.charm.object_storage_relation.component.get_data = MagicMock(
+        return_value=MOCK_OBJECT_STORAGE_DATA
+    )
+    harness.charm.kubernetes_resources.get_status = MagicMock(return_value=ActiveStatus())
+    harness.charm.crds.get_status = MagicMock(return_value=ActiveStatus())
+    harness.charm.on.install.emit()
+    container = harness.charm.unit.get_container("argo-controller")
+    replan = mocker.spy(type(container), "replan")
 
-    s3_component = harness.charm.s3_relation.component
-    s3_component.get_data = MagicMock(
-        return_value=[
-            {
-                **MOCK_S3_DATA_BASE,
-                "endpoint": raw_endpoint,
-            }
-        ]
+    # Act - reconcile with an unchanged layer
+    harness.charm.on.config_changed.emit()
+
+    # Assert
+    replan.assert_not_called()
+
+    # Act - reconcile with a changed layer
+    harness.charm.argo_controller_container.component.environment["ARGO_NAMESPACE"] = "other"
+    harness.charm.on.config_changed.emit()
+
+    # Assert
+    replan.assert_called_once()
+    environment = container.get_plan().services["argo-controller"].environment
+    assert environment["ARGO_NAMESPACE"] == "other"
+
+
+def test_pebble_replan_ignores_duration_format(pebble_ready_harness, mocker):
+    """Test that a duration of the layer in another form than in the plan is not a change."""
+    # Arrange - the plan holds the kill-delay normalized by Pebble
+    harness = pebble_ready_harness
+    harness.update_config({"leader-election-lease-duration": "70s"})
+    container = harness.charm.unit.get_container("argo-controller")
+    assert container.get_plan().services["argo-controller"].kill_delay == "1m5s"
+    mocker.patch("components.pebble_component.get_kill_delay", return_value="65s")
+    replan = mocker.spy(type(container), "replan")
+
+    # Act
+    harness.charm.on.config_changed.emit()
+
+    # Assert
+    replan.assert_not_called()
+
+
+def _render_controller_configmap(harness):
+    """Returns the data of the controller ConfigMap rendered for the current charm state."""
+    krh = KubernetesResourceHandler(
+        field_manager="test",
+        template_files=K8S_RESOURCE_FILES,
+        context=harness.charm._context_callable(),
     )
+    configmap = next(r for r in krh.render_manifests() if isinstance(r, ConfigMap))
+    return {key: yaml.safe_load(value) for key, value in configmap.data.items()}
 
-    mocker.patch.object(
-        type(harness.charm),
-        "active_storage_component",
-        new_callable=PropertyMock,
-        return_value=s3_component,
+
+def test_executor_image_change_keeps_pebble_plan(
+    harness, mocked_lightkube_client, mocked_kubernetes_service_patch, mocker
+):
+    """Test that changing executor-image updates the ConfigMap without replanning."""
+    # Arrange
+    harness.begin()
+    harness.set_can_connect("argo-controller", True)
+    harness.charm.s3_relations_conflict_detector.get_status = MagicMock(
+        return_value=ActiveStatus()
+    )
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.kubernetes_resources.get_status = MagicMock(return_value=ActiveStatus())
+    harness.charm.crds.get_status = MagicMock(return_value=ActiveStatus())
+    harness.charm.on.install.emit()
+    container = harness.charm.unit.get_container("argo-controller")
+    plan = container.get_plan().to_dict()
+    replan = mocker.spy(type(container), "replan")
+
+    # Act
+    harness.update_config({"executor-image": "executor:new"})
+
+    # Assert
+    replan.assert_not_called()
+    assert container.get_plan().to_dict() == plan
+    assert _render_controller_configmap(harness)["executor"]["image"] == "executor:new"
+
+
+@pytest.fixture()
+def pebble_ready_harness(harness, mocked_lightkube_client, mocked_kubernetes_service_patch):
+    """Returns a started harness with every Component the Pebble service depends on Active."""
+    harness.set_model_name(EXPECTED_ENVIRONMENT["ARGO_NAMESPACE"])
+    harness.begin()
+    harness.set_can_connect("argo-controller", True)
+    harness.charm.s3_relations_conflict_detector.get_status = MagicMock(
+        return_value=ActiveStatus()
+    )
+    harness.charm.object_storage_relation.component.get_data = MagicMock(
+        return_value=MOCK_OBJECT_STORAGE_DATA
     )
+    harness.charm.kubernetes_resources.get_status = MagicMock(return_value=ActiveStatus())
+    harness.charm.crds.get_status = MagicMock(return_value=ActiveStatus())
+    return harness
 
-    context = harness.charm._context_callable()
 
-    assert context["s3_minio_endpoint"] == expected_endpoint
-    assert context["s3_region"] == MOCK_S3_DATA_BASE["region"]
+def _get_controller_command(harness):
+    container = harness.charm.unit.get_container("argo-controller")
+    return container.get_plan().services["argo-controller"].command
+
+
+@pytest.mark.parametrize(
+    "config, cpu_max, expected_flags",
+    [
+        pytest.param({}, None, [], id="default"),
+        pytest.param(
+            {"workflow-workers": "64", "pod-cleanup-workers": "8"},
+            None,
+            ["--workflow-workers=64", "--pod-cleanup-workers=8"],
+            id="explicit",
+        ),
+        pytest.param({"workflow-workers": "auto"}, None, [], id="auto-without-cpu-limit"),
+        pytest.param(
+            {"workflow-workers": "auto", "cron-workflow-workers": "auto"},
+            "400000 100000",
+            ["--workflow-workers=64", "--cron-workflow-workers=16"],
+            id="auto-with-cpu-limit",
+        ),
+        pytest.param(
+            {"workflow-ttl-workers": "auto"},
+            "50000 100000",
+            ["--workflow-ttl-workers=4"],
+            id="auto-with-small-cpu-limit",
+        ),
+    ],
+)
+def test_worker_flags(pebble_ready_harness, config, cpu_max, expected_flags):
+    """Test that the worker pool config options are passed as flags to the controller."""
+    # Arrange
+    harness = pebble_ready_harness
+    if cpu_max is not None:
+        cgroup = harness.get_filesystem_root("argo-controller") / "sys/fs/cgroup"
+        cgroup.mkdir(parents=True)
+        (cgroup / "cpu.max").write_text(cpu_max)
+
+    # Act
+    harness.update_config(config)
+
+    # Assert
+    command = _get_controller_command(harness).split()
+    assert command[:3] == ["workflow-controller", "--configmap", ARGO_CONTROLLER_CONFIGMAP]
+    assert [flag for flag in command if "-workers=" in flag] == expected_flags
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        pytest.param({"workflow-workers": "0"}, id="workers-zero"),
+        pytest.param({"workflow-workers": "-1"}, id="workers-negative"),
+        pytest.param({"pod-cleanup-workers": "many"}, id="workers-not-a-number"),
+        pytest.param({"cron-workflow-workers": "1.5"}, id="workers-not-an-integer"),
+        pytest.param({"gomaxprocs": "0"}, id="gomaxprocs-zero"),
+        pytest.param({"gomemlimit": "2G"}, id="gomemlimit-unit"),
+        pytest.param({"gogc": "-1"}, id="gogc-negative"),
+        pytest.param({"gogc": "on"}, id="gogc-not-off"),
+        pytest.param({"leader-election-lease-duration": "15"}, id="lease-duration-no-unit"),
+        pytest.param({"leader-election-retry-period": "5 s"}, id="retry-period-space"),
+        # Lease duration not longer than Argo's default renew deadline of 10s
+        pytest.param({"leader-election-lease-duration": "10s"}, id="lease-not-over-renew"),
+        pytest.param({"leader-election-renew-deadline": "1m"}, id="renew-over-lease"),
+        # Renew deadline not longer than 1.2 times the retry period
+        pytest.param({"leader-election-renew-deadline": "6s"}, id="renew-within-retry-jitter"),
+        pytest.param({"managed-namespace": "kubeflow-user"}, id="managed-namespace-unscoped"),
+        pytest.param(
+            {"namespaced": True, "managed-namespace": "Kubeflow_User"},
+            id="managed-namespace-name",
+        ),
+        pytest.param({"performance-profile": "huge"}, id="performance-profile-unknown"),
+        pytest.param(
+            {"performance-overrides": "[DEFAULT_REQUEUE_TIME]"}, id="performance-overrides-list"
+        ),
+        pytest.param(
+            {"performance-overrides": "{ARGO_TRACE: '1'}"}, id="performance-overrides-unknown"
+        ),
+        pytest.param(
+            {"performance-overrides": "{DEFAULT_REQUEUE_TIME: 15}"},
+            id="performance-overrides-duration",
+        ),
+        pytest.param(
+            {"performance-overrides": "{INFORMER_WRITE_BACK: 10s}"},
+            id="performance-overrides-boolean",
+        ),
+        pytest.param({"qps": 0.0}, id="qps-zero"),
+        pytest.param({"burst": 0}, id="burst-zero"),
+        pytest.param(
+            {"qps-auto-tune-min": 50.0, "qps-auto-tune-max": 40.0}, id="qps-auto-tune-range"
+        ),
+        pytest.param({"parallelism": -1}, id="parallelism-negative"),
+        pytest.param(
+            {"namespace-parallelism-overrides": "team-a"}, id="parallelism-overrides-string"
+        ),
+        pytest.param(
+            {"namespace-parallelism-overrides": "team-a: 0"}, id="parallelism-overrides-zero"
+        ),
+        pytest.param(
+            {"namespace-parallelism-overrides": "team-a: many"},
+            id="parallelism-overrides-not-a-number",
+        ),
+        pytest.param(
+            {"namespace-parallelism-overrides": "Team_A: 1"},
+            id="parallelism-overrides-namespace-name",
+        ),
+        pytest.param(
+            {"namespace-parallelism-overrides": "{team-a: 1"}, id="parallelism-overrides-yaml"
+        ),
+        pytest.param({"resource-rate-limit": 0.0}, id="resource-rate-limit-zero"),
+        pytest.param({"resource-rate-burst": 0}, id="resource-rate-burst-zero"),
+        pytest.param({"retention-errored": -1}, id="retention-negative"),
+        pytest.param({"workflow-ttl-after-success": -1}, id="workflow-ttl-negative"),
+        pytest.param({"pod-gc-grace-period": -1}, id="pod-gc-grace-period-negative"),
+        pytest.param({"pod-gc-strategy": "Never"}, id="pod-gc-strategy-unknown"),
+        pytest.param({"pod-gc-delete-delay": "5"}, id="pod-gc-delete-delay-no-unit"),
+        pytest.param({"key-format": "artifacts/{{workflow.name}}"}, id="key-format-not-unique"),
+        pytest.param(
+            {"key-format": "artifacts/{{workflow.nme}}/{{pod.name}}"},
+            id="key-format-unknown-variable",
+        ),
+        pytest.param(
+            {"key-format": "artifacts/{{=sprig.substr(0, 2, workflow.uid)}}/{{pod.name}}"},
+            id="key-format-expression",
+        ),
+        pytest.param(
+            {"key-format": "artifacts/{{workflow.name/{{pod.name}}"}, id="key-format-unclosed"
+        ),
+        pytest.param({"metrics-ttl": "10"}, id="metrics-ttl-no-unit"),
+        pytest.param({"metrics-modifiers": "[pod_missing]"}, id="metrics-modifiers-list"),
+        pytest.param(
+            {"metrics-modifiers": "{argo_workflows_pod_missing: {disabled: true}}"},
+            id="metrics-modifiers-prefix",
+        ),
+        pytest.param(
+            {"metrics-modifiers": "{pod_missing: {enabled: false}}"},
+            id="metrics-modifiers-unknown-field",
+        ),
+        pytest.param(
+            {"metrics-modifiers": "{pod_missing: {disabled: 'yes'}}"},
+            id="metrics-modifiers-disabled-string",
+        ),
+        pytest.param(
+            {"metrics-modifiers": "{operation_duration_seconds: {histogramBuckets: [10, 1]}}"},
+            id="metrics-modifiers-buckets-decreasing",
+        ),
+        # Used by the dashboard or alert rules
+        pytest.param(
+            {"metrics-modifiers": "{gauge: {disabled: true}}"}, id="metrics-modifiers-dashboard"
+        ),
+        pytest.param(
+            {"metrics-modifiers": "{pod_missing: {disabled: true}}"},
+            id="metrics-modifiers-alert",
+        ),
+        pytest.param(
+            {"metrics-modifiers": "{k8s_request: {disabledAttributes: [status_code]}}"},
+            id="metrics-modifiers-attribute",
+        ),
+        pytest.param({"otlp-endpoint": "otel-collector:4317"}, id="otlp-endpoint-no-scheme"),
+        pytest.param(
+            {"otlp-endpoint": "grpc://otel-collector:4317"}, id="otlp-endpoint-grpc-scheme"
+        ),
+        pytest.param({"otlp-endpoint": "http://"}, id="otlp-endpoint-no-host"),
+        pytest.param(
+            {"namespace-artifact-repositories": "team-a"}, id="artifact-repositories-string"
+        ),
+        pytest.param(
+            {"namespace-artifact-repositories": "team-a: {}"}, id="artifact-repositories-empty"
+        ),
+        pytest.param(
+            {"namespace-artifact-repositories": "team-a: {app: s3}"},
+            id="artifact-repositories-unknown-field",
+        ),
+        pytest.param(
+            {"namespace-artifact-repositories": "team-a: {bucket: 1}"},
+            id="artifact-repositories-bucket-number",
+        ),
+        pytest.param(
+            {"namespace-artifact-repositories": "Team_A: s3"},
+            id="artifact-repositories-namespace-name",
+        ),
+        pytest.param({"workflow-archive-ttl": "forever"}, id="workflow-archive-ttl"),
+        pytest.param({"db-max-idle-conns": -1}, id="db-max-idle-conns-negative"),
+        pytest.param({"db-conn-max-lifetime": "5"}, id="db-conn-max-lifetime-no-unit"),
+        pytest.param({"database-name": ""}, id="database-name-empty"),
+        pytest.param({"instance-id": "Shard-A"}, id="instance-id-uppercase"),
+        pytest.param({"instance-id": "shard_a"}, id="instance-id-underscore"),
+        pytest.param({"instance-id": "-shard"}, id="instance-id-leading-dash"),
+        pytest.param({"instance-id": "s" * 64}, id="instance-id-too-long"),
+        pytest.param(
+            {"executor-progress-patch-tick": "60"}, id="executor-progress-patch-tick-no-unit"
+        ),
+        pytest.param(
+            {"executor-progress-file-tick": "3 s"}, id="executor-progress-file-tick-space"
+        ),
+    ],
+)
+def test_invalid_config(pebble_ready_harness, config):
+    """Test that the charm is blocked by an invalid config option, before starting Pebble."""
+    # Arrange
+    harness = pebble_ready_harness
+
+    # Act
+    harness.update_config(config)
+
+    # Assert
+    assert isinstance(harness.charm.model.unit.status, BlockedStatus)
+    assert harness.charm.model.unit.status.message.startswith("[config-validation]")
+    assert not harness.charm.unit.get_container("argo-controller").get_plan().services
+
+
+@pytest.mark.parametrize(
+    "config, cgroup_files, expected_environment",
+    [
+        pytest.param({}, {}, {}, id="auto-without-limits"),
+        pytest.param(
+            {},
+            {"cpu.max": "250000 100000", "memory.max": "2147483648"},
+            {"GOMAXPROCS": "2", "GOMEMLIMIT": "1843MiB"},
+            id="auto-with-limits",
+        ),
+        pytest.param(
+            {},
+            {"cpu.max": "50000 100000", "memory.max": "max"},
+            {"GOMAXPROCS": "1"},
+            id="auto-with-small-cpu-limit",
+        ),
+        pytest.param(
+            {"gomaxprocs": "8", "gomemlimit": "4GiB", "gogc": "200"},
+            {"cpu.max": "250000 100000", "memory.max": "2147483648"},
+            {"GOMAXPROCS": "8", "GOMEMLIMIT": "4GiB", "GOGC": "200"},
+            id="overrides",
+        ),
+        pytest.param(
+            {"gomaxprocs": "", "gomemlimit": ""},
+            {"cpu.max": "250000 100000", "memory.max": "2147483648"},
+            {},
+            id="go-defaults",
+        ),
+    ],
+)
+def test_go_runtime_environment(pebble_ready_harness, config, cgroup_files, expected_environment):
+    """Test that the Go runtime environment is derived from the container limits or config."""
+    # Arrange
+    harness = pebble_ready_harness
+    cgroup = harness.get_filesystem_root("argo-controller") / "sys/fs/cgroup"
+    cgroup.mkdir(parents=True)
+    for name, content in cgroup_files.items():
+        (cgroup / name).write_text(content)
+
+    # Act
+    harness.update_config(config)
+
+    # Assert
+    container = harness.charm.unit.get_container("argo-controller")
+    environment = container.get_plan().services["argo-controller"].environment
+    assert environment == {**EXPECTED_ENVIRONMENT, **expected_environment}
+
+
+def test_container_limits_read_once_per_hook(pebble_ready_harness, mocker, caplog):
+    """Test that the cgroup limits are pulled from the container once per hook."""
+    # Arrange
+    harness = pebble_ready_harness
+    cgroup = harness.get_filesystem_root("argo-controller") / "sys/fs/cgroup"
+    cgroup.mkdir(parents=True)
+    (cgroup / "cpu.max").write_text("250000 100000")
+    (cgroup / "memory.max").write_text("2147483648")
+    pull = mocker.spy(Container, "pull")
+
+    # Act
+    harness.update_config({"workflow-workers": "auto"})
+
+    # Assert
+    assert [call.args[1] for call in pull.call_args_list] == [
+        "/sys/fs/cgroup/cpu.max",
+        "/sys/fs/cgroup/memory.max",
+    ]
+    assert caplog.text.count("Go runtime of the controller") == 1
+
+
+def test_leader_election_environment(pebble_ready_harness):
+    """Test that the leader-election-* config options are set in the controller environment."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.charm.on.install.emit()
+    container = harness.charm.unit.get_container("argo-controller")
+    # Argo's default lease duration minus its default retry period
+    assert container.get_plan().services["argo-controller"].kill_delay == "10s"
+
+    # Act
+    harness.update_config(
+        {
+            "leader-election-lease-duration": "30s",
+            "leader-election-renew-deadline": "20s",
+            "leader-election-retry-period": "2s",
+        }
+    )
+
+    # Assert
+    service = container.get_plan().services["argo-controller"]
+    assert service.environment == {
+        **EXPECTED_ENVIRONMENT,
+        "LEADER_ELECTION_LEASE_DURATION": "30s",
+        "LEADER_ELECTION_RENEW_DEADLINE": "20s",
+        "LEADER_ELECTION_RETRY_PERIOD": "2s",
+    }
+    # The controller is killed before a standby can acquire the lease it no longer renews
+    assert service.kill_delay == "28s"
+
+
+@pytest.mark.parametrize(
+    "config, expected_kill_delay",
+    [
+        pytest.param({}, "10s", id="default"),
+        pytest.param({"leader-election-lease-duration": "70s"}, "1m5s", id="minutes"),
+        pytest.param(
+            {"leader-election-lease-duration": "300h"}, "299h59m55s", id="hours-over-1e6s"
+        ),
+        pytest.param(
+            {"leader-election-lease-duration": "15.5s", "leader-election-retry-period": "2.25s"},
+            "13.25s",
+            id="fractional",
+        ),
+        pytest.param(
+            {
+                "leader-election-lease-duration": "1s",
+                "leader-election-renew-deadline": "600ms",
+                "leader-election-retry-period": "400ms",
+            },
+            "600ms",
+            id="milliseconds",
+        ),
+    ],
+)
+def test_kill_delay_is_go_duration(config, expected_kill_delay):
+    """Test that the kill delay is a Go duration, formatted like Pebble reports it."""
+    assert get_kill_delay(config) == expected_kill_delay
+
+
+@pytest.mark.parametrize(
+    "config, expected_flags",
+    [
+        ({}, []),
+        ({"namespaced": True}, ["--namespaced", "--managed-namespace=namespace"]),
+        (
+            {"namespaced": True, "managed-namespace": "kubeflow-user"},
+            ["--namespaced", "--managed-namespace=kubeflow-user"],
+        ),
+    ],
+)
+def test_namespace_flags(pebble_ready_harness, config, expected_flags):
+    """Test that the namespaced and managed-namespace config options are passed as flags."""
+    # Arrange
+    harness = pebble_ready_harness
+
+    # Act
+    harness.update_config(config)
+
+    # Assert
+    command = _get_controller_command(harness).split()
+    assert [flag for flag in command if "namespace" in flag] == expected_flags
+
+
+@pytest.mark.parametrize(
+    "config, expected_environment",
+    [
+        pytest.param({}, {}, id="custom"),
+        pytest.param(
+            {"performance-profile": "large"},
+            {
+                "DEFAULT_REQUEUE_TIME": "30s",
+                "INFORMER_WRITE_BACK": "false",
+                "MAX_OPERATION_TIME": "60s",
+                "RECENTLY_STARTED_POD_DURATION": "30s",
+                "WORKFLOW_GC_PERIOD": "15m",
+                "CRON_SYNC_PERIOD": "30s",
+                "SEMAPHORE_NOTIFY_DELAY": "5s",
+            },
+            id="large",
+        ),
+        pytest.param(
+            {
+                "performance-profile": "medium",
+                "performance-overrides": "{DEFAULT_REQUEUE_TIME: 15s, INFORMER_WRITE_BACK: false}",
+            },
+            {
+                "DEFAULT_REQUEUE_TIME": "15s",
+                "INFORMER_WRITE_BACK": "false",
+                "MAX_OPERATION_TIME": "45s",
+                "RECENTLY_STARTED_POD_DURATION": "20s",
+                "WORKFLOW_GC_PERIOD": "10m",
+                "CRON_SYNC_PERIOD": "20s",
+                "SEMAPHORE_NOTIFY_DELAY": "2s",
+            },
+            id="medium-with-overrides",
+        ),
+        pytest.param(
+            {"performance-overrides": '{"OFFLOAD_NODE_STATUS_TTL": "10m"}'},
+            {"OFFLOAD_NODE_STATUS_TTL": "10m"},
+            id="custom-with-overrides",
+        ),
+    ],
+)
+def test_performance_profile_environment(pebble_ready_harness, config, expected_environment):
+    """Test that the performance profile and overrides are set in the controller environment."""
+    # Arrange
+    harness = pebble_ready_harness
+
+    # Act
+    harness.update_config(config)
+
+    # Assert
+    container = harness.charm.unit.get_container("argo-controller")
+    environment = container.get_plan().services["argo-controller"].environment
+    assert environment == {**EXPECTED_ENVIRONMENT, **expected_environment}
+
+
+def test_rate_limit_flags(pebble_ready_harness):
+    """Test that the qps and burst config options are passed as flags to the controller."""
+    # Arrange
+    harness = pebble_ready_harness
+
+    # Act
+    harness.update_config({"qps": 50.0, "burst": 75})
+
+    # Assert
+    command = _get_controller_command(harness).split()
+    assert "--qps=50" in command
+    assert "--burst=75" in command
+
+
+@pytest.mark.parametrize(
+    "kind, duration, expected_url",
+    [
+        ("cpu", "2m", "http://localhost:6060/debug/pprof/profile?seconds=120"),
+        ("heap", "30s", "http://localhost:6060/debug/pprof/heap"),
+        ("goroutine", "30s", "http://localhost:6060/debug/pprof/goroutine"),
+    ],
+)
+def test_collect_profile_action(
+    pebble_ready_harness, mocker, tmp_path, kind, duration, expected_url
+):
+    """Test that the action enables pprof once and saves the controller's profile."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.update_config({})
+    container = harness.charm.unit.get_container("argo-controller")
+    assert "ARGO_PPROF" not in container.get_plan().services["argo-controller"].environment
+    mocker.patch("profiler.PROFILES_DIR", tmp_path)
+    wait_for_pprof = mocker.patch("charm.wait_for_pprof")
+    urlopen = mocker.patch(
+        "profiler.urllib.request.urlopen", side_effect=lambda *_, **__: io.BytesIO(b"profile")
+    )
+
+    # Act
+    output = harness.run_action("collect-profile", {"kind": kind, "duration": duration})
+
+    # Assert
+    environment = container.get_plan().services["argo-controller"].environment
+    assert environment["ARGO_PPROF"] == "true"
+    wait_for_pprof.assert_called_once()
+    assert urlopen.call_args.args[0] == expected_url
+    path = Path(output.results["path"])
+    assert path.parent == tmp_path
+    assert path.read_bytes() == b"profile"
+
+    # Act - pprof is already enabled for later profiles
+    harness.run_action("collect-profile", {"kind": kind, "duration": duration})
+
+    # Assert
+    wait_for_pprof.assert_called_once()
+
+
+def test_collect_profile_action_download_error(pebble_ready_harness, mocker, tmp_path):
+    """Test that the action fails without leaving a partial profile if the download fails."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.update_config({})
+    mocker.patch("profiler.PROFILES_DIR", tmp_path)
+    mocker.patch("charm.wait_for_pprof")
+    response = MagicMock()
+    response.__enter__.return_value.read.side_effect = ConnectionResetError("reset")
+    mocker.patch("profiler.urllib.request.urlopen", return_value=response)
+
+    # Act, Assert
+    with pytest.raises(ActionFailed):
+        harness.run_action("collect-profile", {"kind": "heap", "duration": "30s"})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disable_pprof_action(pebble_ready_harness, mocker, tmp_path):
+    """Test that the action disables the pprof endpoint enabled by collect-profile."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.update_config({})
+    container = harness.charm.unit.get_container("argo-controller")
+    mocker.patch("profiler.PROFILES_DIR", tmp_path)
+    wait_for_pprof = mocker.patch("charm.wait_for_pprof")
+    mocker.patch(
+        "profiler.urllib.request.urlopen", side_effect=lambda *_, **__: io.BytesIO(b"profile")
+    )
+    harness.run_action("collect-profile", {"kind": "heap", "duration": "30s"})
+
+    # Act
+    output = harness.run_action("disable-pprof")
+
+    # Assert
+    assert output.results["message"] == "Disabled pprof, restarted the controller"
+    assert "ARGO_PPROF" not in container.get_plan().services["argo-controller"].environment
+
+    # Act - pprof is enabled again by the next profile
+    harness.run_action("collect-profile", {"kind": "heap", "duration": "30s"})
+
+    # Assert
+    assert wait_for_pprof.call_count == 2
+    assert container.get_plan().services["argo-controller"].environment["ARGO_PPROF"] == "true"
+
+
+@pytest.mark.parametrize("duration", ["30", "0s", "1h", "11m"])
+def test_collect_profile_action_invalid_duration(pebble_ready_harness, duration):
+    """Test that the action fails with an invalid duration."""
+    # Arrange
+    harness = pebble_ready_harness
+
+    # Act, Assert
+    with pytest.raises(ActionFailed):
+        harness.run_action("collect-profile", {"kind": "cpu", "duration": duration})
+
+
+def _k8s_request_metrics(requests, throttled, duration_sum=0.0):
+    return (
+        "# TYPE argo_workflows_k8s_request_total counter\n"
+        f'argo_workflows_k8s_request_total{{kind="Pod",status_code="200",verb="Get"}} '
+        f"{requests - throttled}\n"
+        f'argo_workflows_k8s_request_total{{kind="Pod",status_code="429",verb="Get"}} '
+        f"{throttled}\n"
+        f"argo_workflows_k8s_request_duration_sum {duration_sum}\n"
+        f"argo_workflows_k8s_request_duration_count {requests}\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "metrics, expected_qps, expected_burst, expected_reason",
+    [
+        pytest.param(_k8s_request_metrics(3000, 300), 15, 22, "throttled (429)", id="throttled"),
+        pytest.param(
+            _k8s_request_metrics(3000, 0, duration_sum=6000), 15, 22, "latency", id="slow"
+        ),
+        pytest.param(_k8s_request_metrics(6000, 0), 25, 38, "close to QPS", id="saturated"),
+        pytest.param(_k8s_request_metrics(600, 0), 20, 30, None, id="steady"),
+    ],
+)
+def test_qps_auto_tune(
+    pebble_ready_harness, mocker, caplog, metrics, expected_qps, expected_burst, expected_reason
+):
+    """Test that the QPS is tuned from the controller's metrics on update-status."""
+    # Arrange
+    harness = pebble_ready_harness
+    relation_id = harness.add_relation("replicas", "argo-controller")
+    harness.update_config({"qps-auto-tune": True})
+    tuner = harness.charm.qps_auto_tuner.component
+    mocker.patch.object(tuner, "_get_sample", return_value=parse_k8s_request_metrics(""))
+    mocker.patch("components.qps_auto_tuner_component.time.time", return_value=10000.0)
+    harness.charm.on.update_status.emit()
+
+    # Act - sample the metrics again 5 minutes later
+    mocker.patch.object(tuner, "_get_sample", return_value=parse_k8s_request_metrics(metrics))
+    mocker.patch("components.qps_auto_tuner_component.time.time", return_value=10300.0)
+    harness.charm.on.update_status.emit()
+
+    # Assert
+    command = _get_controller_command(harness).split()
+    assert f"--qps={expected_qps}" in command
+    assert f"--burst={expected_burst}" in command
+    harness.evaluate_status()
+    status = harness.charm.model.unit.status
+    assert isinstance(status, ActiveStatus)
+    unit_data = harness.get_relation_data(relation_id, harness.charm.unit)
+    if expected_reason:
+        assert status.message == f"QPS auto-tuned to {expected_qps}, burst {expected_burst}"
+        assert f"QPS auto-tuned from 20 to {expected_qps}" in caplog.text
+        assert expected_reason in caplog.text
+        assert unit_data == {
+            "tuned-qps": str(float(expected_qps)),
+            "qps-adjustment-time": "10300.0",
+        }
+    else:
+        assert status.message == ""
+        assert unit_data == {}
+
+
+def test_qps_auto_tune_shared_with_peers(pebble_ready_harness):
+    """Test that a unit uses the most recent QPS adjustment of any unit, eg after a failover."""
+    # Arrange
+    harness = pebble_ready_harness
+    relation_id = harness.add_relation(
+        "replicas",
+        "argo-controller",
+        unit_data={"tuned-qps": "25.0", "qps-adjustment-time": "9000.0"},
+    )
+    harness.update_config({"qps-auto-tune": True})
+
+    # Act - another unit, whose controller held the lease, tuned the QPS more recently
+    harness.add_relation_unit(relation_id, "argo-controller/1")
+    harness.update_relation_data(
+        relation_id, "argo-controller/1", {"tuned-qps": "15.0", "qps-adjustment-time": "10000.0"}
+    )
+
+    # Assert
+    command = _get_controller_command(harness).split()
+    assert "--qps=15" in command
+    assert "--burst=22" in command
+    harness.evaluate_status()
+    assert harness.charm.model.unit.status == ActiveStatus("QPS auto-tuned to 15, burst 22")
+
+    # Act - disabling the auto-tuning clears the adjustment of this unit
+    harness.update_config({"qps-auto-tune": False})
+
+    # Assert
+    assert "--qps=20" in _get_controller_command(harness).split()
+    assert harness.get_relation_data(relation_id, harness.charm.unit) == {}
+
+
+def test_qps_auto_tune_status_with_component_message(pebble_ready_harness, mocker):
+    """Test that the tuned QPS is shown along with the message of another Component."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.add_relation(
+        "replicas",
+        "argo-controller",
+        unit_data={"tuned-qps": "15.0", "qps-adjustment-time": "10000.0"},
+    )
+    mocker.patch.object(
+        harness.charm.config_validation.component,
+        "get_status",
+        return_value=ActiveStatus("Some message"),
+    )
+
+    # Act
+    harness.update_config({"qps-auto-tune": True})
+    harness.evaluate_status()
+
+    # Assert
+    assert harness.charm.model.unit.status == ActiveStatus(
+        "QPS auto-tuned to 15, burst 22; [config-validation] Some message"
+    )
+
+    # Act - the tuned QPS is not added again on a hook that does not reconcile
+    harness.evaluate_status()
+
+    # Assert
+    assert harness.charm.model.unit.status == ActiveStatus(
+        "QPS auto-tuned to 15, burst 22; [config-validation] Some message"
+    )
+
+
+def test_parallelism_config(pebble_ready_harness):
+    """Test that the parallelism config options are rendered in the controller ConfigMap."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    assert "parallelism" not in _render_controller_configmap(harness)
+    assert "namespaceParallelism" not in _render_controller_configmap(harness)
+
+    # Act
+    harness.update_config({"parallelism": 100, "namespace-parallelism": 10})
+
+    # Assert
+    data = _render_controller_configmap(harness)
+    assert data["parallelism"] == 100
+    assert data["namespaceParallelism"] == 10
+
+
+def _get_namespace(resource_type, name):
+    """Mocks getting a namespace, which exists unless it is named "missing"."""
+    if name == "missing":
+        raise ApiError(response=MagicMock(json=MagicMock(return_value={"code": 404})))
+    return MagicMock()
+
+
+def _mock_namespace_labels(mocked_lightkube_client):
+    """Mocks the namespace labels applied to the lightkube client, as listed by label."""
+    # Labels of each namespace, and the field manager that applied them
+    applied = {}
+
+    def apply(obj, field_manager=None, force=False):
+        if isinstance(obj, Namespace):
+            applied[obj.metadata.name] = (obj.metadata.labels, field_manager)
+
+    def list_(resource_type, **kwargs):
+        if resource_type is not Namespace:
+            return []
+        return [
+            Namespace(
+                metadata=ObjectMeta(
+                    name=name,
+                    labels=labels,
+                    managedFields=[ManagedFieldsEntry(manager=field_manager)],
+                )
+            )
+            for name, (labels, field_manager) in applied.items()
+            if PARALLELISM_LIMIT_LABEL in labels
+        ]
+
+    mocked_lightkube_client.get.side_effect = _get_namespace
+    mocked_lightkube_client.apply.side_effect = apply
+    mocked_lightkube_client.list.side_effect = list_
+
+
+def test_namespace_parallelism_overrides(pebble_ready_harness, mocked_lightkube_client):
+    """Test that the overrides are set as labels on existing namespaces, and then removed."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+    _mock_namespace_labels(mocked_lightkube_client)
+    mocked_lightkube_client.apply.reset_mock()
+
+    # Act
+    harness.update_config(
+        {"namespace-parallelism-overrides": '{"team-a": 10, "team-b": 2, "missing": 1}'}
+    )
+
+    # Assert
+    labels = {
+        ns.metadata.name: ns.metadata.labels
+        for ns in _applied_resources(mocked_lightkube_client, Namespace)
+    }
+    assert labels == {
+        "team-a": {PARALLELISM_LIMIT_LABEL: "10"},
+        "team-b": {PARALLELISM_LIMIT_LABEL: "2"},
+    }
+
+    # Act - remove team-b from the overrides
+    mocked_lightkube_client.apply.reset_mock()
+    harness.update_config({"namespace-parallelism-overrides": "team-a: 10"})
+
+    # Assert - only the labels set by the charm are removed, by applying them without labels
+    labels = {
+        ns.metadata.name: ns.metadata.labels
+        for ns in _applied_resources(mocked_lightkube_client, Namespace)
+    }
+    assert labels == {"team-a": {PARALLELISM_LIMIT_LABEL: "10"}, "team-b": {}}
+    assert isinstance(harness.charm.model.unit.status, ActiveStatus)
+
+
+def test_namespace_parallelism_overrides_removed_by_new_leader(
+    pebble_ready_harness, mocked_lightkube_client
+):
+    """Test that a new leader unit removes the labels set under the previous leader."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+    _mock_namespace_labels(mocked_lightkube_client)
+    harness.update_config({"namespace-parallelism-overrides": "{team-a: 10, team-b: 2}"})
+    harness.set_leader(False)
+    new_leader = Harness(ArgoControllerOperator)
+    new_leader.set_model_name(EXPECTED_ENVIRONMENT["ARGO_NAMESPACE"])
+    new_leader.set_leader(True)
+    new_leader.begin()
+    mocked_lightkube_client.apply.reset_mock()
+
+    # Act - the new leader removes team-b from the overrides
+    new_leader.update_config({"namespace-parallelism-overrides": "team-a: 10"})
+
+    # Assert
+    labels = {
+        ns.metadata.name: ns.metadata.labels
+        for ns in _applied_resources(mocked_lightkube_client, Namespace)
+    }
+    assert labels == {"team-a": {PARALLELISM_LIMIT_LABEL: "10"}, "team-b": {}}
+
+
+def test_resource_rate_limit_config(pebble_ready_harness):
+    """Test that the resource rate limit config options are rendered in the ConfigMap."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+
+    # Act
+    harness.update_config({"resource-rate-limit": 2.5, "resource-rate-burst": 5})
+
+    # Assert
+    assert _render_controller_configmap(harness)["resourceRateLimit"] == {
+        "limit": 2.5,
+        "burst": 5,
+    }
+
+
+def test_garbage_collection_config(pebble_ready_harness):
+    """Test the default and configured garbage collection options of the ConfigMap."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    data = _render_controller_configmap(harness)
+    assert "retentionPolicy" not in data
+    assert data["workflowDefaults"] == {
+        "spec": {
+            "ttlStrategy": {"secondsAfterCompletion": 604800},
+            "podGC": {"strategy": "OnPodSuccess"},
+        }
+    }
+    assert data["podGCGracePeriodSeconds"] == 30
+    assert data["podGCDeleteDelayDuration"] == "5s"
+
+    # Act
+    harness.update_config(
+        {
+            "retention-completed": 100,
+            "retention-failed": 20,
+            "workflow-ttl-after-completion": 0,
+            "workflow-ttl-after-failure": 3600,
+            "pod-gc-strategy": "OnWorkflowCompletion",
+            "pod-gc-grace-period": 0,
+            "pod-gc-delete-delay": "1m30s",
+        }
+    )
+
+    # Assert
+    data = _render_controller_configmap(harness)
+    assert data["retentionPolicy"] == {"completed": 100, "failed": 20}
+    assert data["workflowDefaults"] == {
+        "spec": {
+            "ttlStrategy": {"secondsAfterFailure": 3600},
+            "podGC": {"strategy": "OnWorkflowCompletion"},
+        }
+    }
+    assert data["podGCGracePeriodSeconds"] == 0
+    assert data["podGCDeleteDelayDuration"] == "1m30s"
+
+    # Act
+    harness.update_config({"workflow-ttl-after-failure": 0, "pod-gc-strategy": ""})
+
+    # Assert
+    assert "workflowDefaults" not in _render_controller_configmap(harness)
+
+
+def test_events_config(pebble_ready_harness):
+    """Test that the node and workflow events config options are rendered in the ConfigMap."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    data = _render_controller_configmap(harness)
+    assert data["nodeEvents"] == {"enabled": True, "sendAsPod": False}
+    assert data["workflowEvents"] == {"enabled": True}
+
+    # Act
+    harness.update_config(
+        {"node-events": False, "node-events-send-as-pod": True, "workflow-events": False}
+    )
+
+    # Assert
+    data = _render_controller_configmap(harness)
+    assert data["nodeEvents"] == {"enabled": False, "sendAsPod": True}
+    assert data["workflowEvents"] == {"enabled": False}
+
+
+@pytest.mark.parametrize(
+    "key_format, expected_key_format",
+    [
+        pytest.param(
+            "date",
+            "artifacts/{{workflow.name}}/{{workflow.creationTimestamp.Y}}/"
+            "{{workflow.creationTimestamp.m}}/{{workflow.creationTimestamp.d}}/{{pod.name}}",
+            id="date",
+        ),
+        pytest.param(
+            "hashed", "artifacts/{{workflow.uid}}/{{workflow.name}}/{{pod.name}}", id="hashed"
+        ),
+        pytest.param(
+            "{{workflow.namespace}}/{{ workflow.labels.team }}/{{pod.name}}",
+            "{{workflow.namespace}}/{{ workflow.labels.team }}/{{pod.name}}",
+            id="custom",
+        ),
+    ],
+)
+def test_key_format_config(pebble_ready_harness, key_format, expected_key_format):
+    """Test that the key-format config option is rendered in the artifact repository."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+
+    # Act
+    harness.update_config({"key-format": key_format})
+
+    # Assert
+    data = _render_controller_configmap(harness)
+    assert data["artifactRepository"]["s3"]["keyFormat"] == expected_key_format
+
+
+@pytest.mark.parametrize("archive_logs", [True, False])
+def test_archive_logs_config(pebble_ready_harness, archive_logs):
+    """Test that the archive-logs config option is rendered in the artifact repository."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+
+    # Act
+    harness.update_config({"archive-logs": archive_logs})
+
+    # Assert
+    assert (
+        _render_controller_configmap(harness)["artifactRepository"]["archiveLogs"] is archive_logs
+    )
+
+
+def test_metrics_config(pebble_ready_harness):
+    """Test that the metrics-* config options are rendered in the metricsConfig."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    modifiers = {
+        "cronworkflows_triggered_total": {"disabled": True},
+        "k8s_request_total": {"disabledAttributes": ["request_kind"]},
+        "operation_duration_seconds": {"histogramBuckets": [0.1, 1, 10]},
+    }
+
+    # Act
+    harness.update_config(
+        {
+            "metrics-ttl": "10m",
+            "metrics-ignore-errors": True,
+            "metrics-modifiers": yaml.safe_dump(modifiers),
+        }
+    )
+
+    # Assert
+    assert _render_controller_configmap(harness)["metricsConfig"] == {
+        "secure": False,
+        "ignoreErrors": True,
+        "metricsTTL": "10m",
+        "modifiers": modifiers,
+    }
+
+
+def test_metrics_config_default(pebble_ready_harness):
+    """Test that the metricsConfig keeps Argo's defaults when metrics-* are not set."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+
+    # Act
+    harness.update_config({})
+
+    # Assert
+    assert _render_controller_configmap(harness)["metricsConfig"] == {
+        "secure": False,
+        "ignoreErrors": False,
+    }
+
+
+def test_disabled_series_references():
+    """Test that the series used by the dashboard and alert rules are found."""
+    # Arrange
+    modifiers = {
+        "gauge": {"disabled": True},
+        "k8s_request": {"disabledAttributes": ["status_code", "verb"]},
+        "queue_latency": {"disabledAttributes": ["worker_type"]},
+    }
+
+    # Act
+    references = get_disabled_series_references(modifiers)
+
+    # Assert
+    assert references == {
+        "dashboard basic": {
+            "argo_workflows_gauge",
+            "argo_workflows_k8s_request_total{status_code,verb}",
+            "argo_workflows_k8s_request_total{status_code}",
+            "argo_workflows_k8s_request_total{verb}",
+        },
+        "alert ArgoTooManyRequests": {"argo_workflows_k8s_request_total{status_code,verb}"},
+        "alert ArgoTooManyWorkflows": {"argo_workflows_gauge"},
+    }
+
+
+def test_dashboards_and_alert_rules_loaded_once(mocker):
+    """Test that the dashboards and alert rules are only read from disk once."""
+    # Arrange
+    get_expressions.cache_clear()
+    spied_safe_load = mocker.spy(yaml, "safe_load")
+    modifiers = {"gauge": {"disabled": True}}
+
+    # Act
+    first_references = get_disabled_series_references(modifiers)
+    second_references = get_disabled_series_references(modifiers)
+
+    # Assert
+    assert first_references == second_references
+    assert spied_safe_load.call_count == len(
+        list(Path("src/prometheus_alert_rules").glob("*.rule*"))
+    )
+
+
+def _get_controller_environment(harness):
+    container = harness.charm.unit.get_container("argo-controller")
+    return container.get_plan().services["argo-controller"].environment
+
+
+def test_otlp_endpoint_config(pebble_ready_harness):
+    """Test that the OTLP endpoint is set in the controller environment from the config."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.update_config({})
+    assert "OTEL_EXPORTER_OTLP_ENDPOINT" not in _get_controller_environment(harness)
+
+    # Act
+    harness.update_config({"otlp-endpoint": "https://collector.example.com:4317"})
+
+    # Assert
+    environment = _get_controller_environment(harness)
+    assert environment["OTEL_EXPORTER_OTLP_ENDPOINT"] == "https://collector.example.com:4317"
+
+    # Act
+    harness.update_config({"otlp-endpoint": ""})
+
+    # Assert
+    assert "OTEL_EXPORTER_OTLP_ENDPOINT" not in _get_controller_environment(harness)
+
+
+@pytest.mark.parametrize(
+    "delta_temporality, expected_temporality", [(False, None), (True, "Delta")]
+)
+def test_otlp_delta_temporality_config(
+    pebble_ready_harness, delta_temporality, expected_temporality
+):
+    """Test that the otlp-delta-temporality config option is rendered in the metricsConfig."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+
+    # Act
+    harness.update_config({"otlp-delta-temporality": delta_temporality})
+
+    # Assert
+    metrics_config = _render_controller_configmap(harness)["metricsConfig"]
+    assert metrics_config.get("temporality") == expected_temporality
+
+
+MOCK_S3_ENDPOINTS = {
+    "s3-default": "http://minio.kubeflow:9000",
+    "s3-team-a": "https://s3.team-a.example.com",
+}
+
+
+def _get_s3_storage_connection_info(relation):
+    """Mocks the data shared by each s3-credentials application."""
+    return {**MOCK_S3_DATA_BASE, "endpoint": MOCK_S3_ENDPOINTS[relation.app.name]}
+
+
+def test_artifact_repositories(pebble_ready_harness, mocked_lightkube_client, mocker):
+    """Test that namespaces are routed to their dedicated artifact repositories."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+    harness.charm.s3_relations_conflict_detector.get_status = (
+        harness.charm.s3_relations_conflict_detector.component.get_status
+    )
+    mocker.patch.object(
+        harness.charm.s3_relation.component.s3_client,
+        "get_storage_connection_info",
+        side_effect=_get_s3_storage_connection_info,
+    )
+    mocked_lightkube_client.get.side_effect = _get_namespace
+    harness.add_relation("s3-credentials", "s3-default")
+    harness.add_relation("s3-credentials", "s3-team-a")
+    mocked_lightkube_client.apply.reset_mock()
+
+    # Act
+    harness.update_config(
+        {
+            "namespace-artifact-repositories": yaml.dump(
+                {
+                    "team-a": "s3-team-a",
+                    "team-b": {"bucket": "team-b-artifacts"},
+                    "missing": {"bucket": "missing-artifacts"},
+                }
+            )
+        }
+    )
+
+    # Assert
+    assert isinstance(harness.charm.s3_relations_conflict_detector.status, ActiveStatus)
+    assert harness.charm._context_callable()["s3_minio_endpoint"] == "minio.kubeflow:9000"
+    configmaps = [
+        configmap
+        for configmap in _applied_resources(mocked_lightkube_client, ConfigMap)
+        if configmap.metadata.name == "artifact-repositories"
+    ]
+    assert all(
+        configmap.metadata.annotations[DEFAULT_ARTIFACT_REPOSITORY_ANNOTATION] == "argo-controller"
+        for configmap in configmaps
+    )
+    repositories = {
+        configmap.metadata.namespace: yaml.safe_load(configmap.data["argo-controller"])["s3"]
+        for configmap in configmaps
+    }
+    assert {ns: (r["endpoint"], r["bucket"]) for ns, r in repositories.items()} == {
+        "team-a": ("s3.team-a.example.com", "mybucket"),
+        "team-b": ("minio.kubeflow:9000", "team-b-artifacts"),
+    }
+    assert (
+        repositories["team-a"]["accessKeySecret"]["name"] == "argo-controller-artifact-repository"
+    )
+    secrets = [
+        secret.metadata.namespace
+        for secret in _applied_resources(mocked_lightkube_client, Secret)
+        if secret.metadata.name == "argo-controller-artifact-repository"
+    ]
+    assert sorted(secrets) == ["team-a", "team-b"]
+
+
+def _apply_artifact_repository(harness, mocked_lightkube_client):
+    """Applies the artifact repository of team-b, and returns its applied ConfigMap and Secret."""
+    harness.set_leader(True)
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    mocked_lightkube_client.get.side_effect = _get_namespace
+    harness.update_config(
+        {"namespace-artifact-repositories": "team-b: {bucket: team-b-artifacts}"}
+    )
+    # The last applied object of each type and name
+    applied = {
+        (type(resource), resource.metadata.name): resource
+        for resource in _applied_resources(mocked_lightkube_client, (ConfigMap, Secret))
+        if resource.metadata.namespace == "team-b"
+    }
+    return (
+        applied[(ConfigMap, "artifact-repositories")],
+        applied[(Secret, "argo-controller-artifact-repository")],
+    )
+
+
+def test_artifact_repositories_apply_skipped_when_unchanged(
+    pebble_ready_harness, mocked_lightkube_client
+):
+    """Test that unchanged repositories are only applied again if their default is changed."""
+    # Arrange
+    harness = pebble_ready_harness
+    configmap, secret = _apply_artifact_repository(harness, mocked_lightkube_client)
+    component = harness.charm.artifact_repositories.component
+    namespace = Namespace(metadata=ObjectMeta(name="team-b"))
+    _mock_live_resources(mocked_lightkube_client, [configmap, secret, namespace])
+    mocked_lightkube_client.reset_mock()
+
+    # Act
+    component.configure_charm(None)
+
+    # Assert - the applied objects are fetched by name, without listing or getting the namespaces
+    assert [call[0] for call in mocked_lightkube_client.method_calls] == ["get", "get"]
+    assert {call.args[0] for call in mocked_lightkube_client.get.call_args_list} == {
+        ConfigMap,
+        Secret,
+    }
+    assert isinstance(component.get_status(), ActiveStatus)
+
+    # Act - kfp-profile-controller makes its own key the default again
+    configmap.metadata.annotations[DEFAULT_ARTIFACT_REPOSITORY_ANNOTATION] = "default-v1"
+    component.configure_charm(None)
+
+    # Assert
+    reapplied = _applied_resources(mocked_lightkube_client, ConfigMap)
+    assert [c.metadata.annotations[DEFAULT_ARTIFACT_REPOSITORY_ANNOTATION] for c in reapplied] == [
+        "argo-controller"
+    ]
+    assert mocked_lightkube_client.apply.call_args.kwargs["field_manager"] == (
+        "argo-controller-artifact-repositories"
+    )
+
+
+@pytest.mark.parametrize(
+    "released_data, expected_deleted",
+    [
+        pytest.param({"default-v1": "s3: {}"}, [Secret], id="kfp-profile-controller-key-left"),
+        pytest.param(None, [Secret, ConfigMap], id="no-data-left"),
+    ],
+)
+def test_artifact_repositories_released_when_unconfigured(
+    pebble_ready_harness, mocked_lightkube_client, released_data, expected_deleted
+):
+    """Test that only the fields set by the charm are removed when a namespace is unconfigured."""
+    # Arrange
+    harness = pebble_ready_harness
+    configmap, secret = _apply_artifact_repository(harness, mocked_lightkube_client)
+    labels = harness.charm.artifact_repositories.component._krh_labels
+    mocked_lightkube_client.list.side_effect = lambda resource_type, **kwargs: [
+        resource
+        for resource in (configmap, secret)
+        if isinstance(resource, resource_type) and kwargs.get("labels") == labels
+    ]
+    mocked_lightkube_client.apply.return_value = ConfigMap(
+        metadata=ObjectMeta(name="artifact-repositories", namespace="team-b"), data=released_data
+    )
+    mocked_lightkube_client.reset_mock()
+
+    # Act
+    harness.update_config({"namespace-artifact-repositories": ""})
+
+    # Assert - the ConfigMap is applied without the fields of the charm
+    released = [
+        call.kwargs
+        for call in mocked_lightkube_client.apply.call_args_list
+        if call.kwargs["obj"].metadata.namespace == "team-b"
+    ]
+    assert released == [
+        {
+            "obj": ConfigMap(
+                metadata=ObjectMeta(name="artifact-repositories", namespace="team-b")
+            ),
+            "field_manager": "argo-controller-artifact-repositories",
+            "force": True,
+        }
+    ]
+    assert sorted(
+        (call.args[0].__name__, call.args[1], call.kwargs["namespace"])
+        for call in mocked_lightkube_client.delete.call_args_list
+    ) == sorted(
+        (resource_type.__name__, resource.metadata.name, "team-b")
+        for resource_type, resource in ((ConfigMap, configmap), (Secret, secret))
+        if resource_type in expected_deleted
+    )
+
+
+def test_artifact_repositories_missing_relation(pebble_ready_harness):
+    """Test that the charm is blocked when a dedicated application is not related."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+
+    # Act
+    harness.update_config({"namespace-artifact-repositories": "team-a: s3-team-a"})
+
+    # Assert
+    status = harness.charm.artifact_repositories.status
+    assert status == BlockedStatus(
+        "Missing s3-credentials relation to s3-team-a, set in namespace-artifact-repositories"
+    )
+
+
+def test_artifact_repositories_dedicated_relation_only(pebble_ready_harness):
+    """Test that a relation to a dedicated application does not count as the default storage."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+    harness.charm.s3_relations_conflict_detector.get_status = (
+        harness.charm.s3_relations_conflict_detector.component.get_status
+    )
+    harness.update_config({"namespace-artifact-repositories": "team-a: s3-team-a"})
+
+    # Act
+    harness.add_relation("s3-credentials", "s3-team-a")
+    harness.charm.on.install.emit()
+
+    # Assert
+    assert harness.charm.active_storage_component is None
+    assert harness.charm.s3_relations_conflict_detector.status == BlockedStatus(
+        "Missing a default storage relation: relate to object-storage, or to an s3-credentials "
+        "application not set in namespace-artifact-repositories"
+    )
+    assert harness.charm.model.unit.status.message.startswith(
+        "[s3-relations-conflict-detector] Missing a default storage relation"
+    )
+
+
+MOCK_DATABASE_DATA = {
+    "endpoints": "postgresql-k8s-primary.kubeflow:5432,postgresql-k8s-replicas.kubeflow:5432",
+    "username": "relation-7",
+    "password": "password",
+    "database": "argo",
+}
+
+
+def _render_database_secret(harness):
+    """Returns the database credentials Secret rendered for the current charm state."""
+    krh = KubernetesResourceHandler(
+        field_manager="test",
+        template_files=K8S_RESOURCE_FILES,
+        context=harness.charm._context_callable(),
+    )
+    return next(
+        (r for r in krh.render_manifests() if r.metadata.name == "argo-controller-database"),
+        None,
+    )
+
+
+@pytest.mark.parametrize("relation_name", ["postgresql", "mysql"])
+def test_database_relation(pebble_ready_harness, relation_name):
+    """Test that a related database is requested and rendered as the persistence config."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    assert "persistence" not in _render_controller_configmap(harness)
+    assert _render_database_secret(harness) is None
+
+    # Act
+    relation_id = harness.add_relation(relation_name, "database")
+    harness.add_relation_unit(relation_id, "database/0")
+    harness.update_config({"workflow-archive-ttl": "30d", "db-max-open-conns": 50})
+
+    # Assert
+    assert harness.get_relation_data(relation_id, "argo-controller") == {"database": "argo"}
+    assert harness.charm.database_relation.status == WaitingStatus(
+        f"Waiting for {relation_name} relation data"
+    )
+
+    # Act
+    harness.update_relation_data(relation_id, "database", MOCK_DATABASE_DATA)
+
+    # Assert
+    persistence = _render_controller_configmap(harness)["persistence"]
+    assert persistence == {
+        "connectionPool": {"maxIdleConns": 100, "maxOpenConns": 50, "connMaxLifetime": "0s"},
+        "nodeStatusOffLoad": True,
+        "archive": True,
+        "archiveTTL": "30d",
+        relation_name: {
+            "host": "postgresql-k8s-primary.kubeflow",
+            "port": 5432,
+            "database": "argo",
+            "tableName": "argo_workflows",
+            "userNameSecret": {"name": "argo-controller-database", "key": "username"},
+            "passwordSecret": {"name": "argo-controller-database", "key": "password"},
+        },
+    }
+    secret = _render_database_secret(harness)
+    assert secret.data == {
+        "username": b64encode(b"relation-7").decode(),
+        "password": b64encode(b"password").decode(),
+    }
+
+
+@pytest.mark.parametrize(
+    "relation_name, endpoint, expected_host, expected_port",
+    [
+        pytest.param("postgresql", "db-host", "db-host", 5432, id="postgresql-no-port"),
+        pytest.param("mysql", "db-host", "db-host", 3306, id="mysql-no-port"),
+        pytest.param("postgresql", "fd00::1", "fd00::1", 5432, id="ipv6-no-brackets"),
+        pytest.param("postgresql", "[fd00::1]:6432", "fd00::1", 6432, id="ipv6-brackets-port"),
+        pytest.param("mysql", "[fd00::1]", "fd00::1", 3306, id="ipv6-brackets-no-port"),
+    ],
+)
+def test_database_endpoint(
+    pebble_ready_harness, relation_name, endpoint, expected_host, expected_port
+):
+    """Test that endpoints without a port or with an IPv6 address are parsed."""
+    # Arrange
+    harness = pebble_ready_harness
+    relation_id = harness.add_relation(relation_name, "database")
+    harness.add_relation_unit(relation_id, "database/0")
+
+    # Act
+    harness.update_relation_data(
+        relation_id, "database", {**MOCK_DATABASE_DATA, "endpoints": f"{endpoint},other:5432"}
+    )
+
+    # Assert
+    database = harness.charm.database_relation.component.get_data()
+    assert (database["host"], database["port"]) == (expected_host, expected_port)
+    assert isinstance(harness.charm.database_relation.status, ActiveStatus)
+
+
+@pytest.mark.parametrize("endpoint", ["db-host:port", "db-host:0", ":5432", "[fd00::1]5432"])
+def test_database_invalid_endpoint(pebble_ready_harness, endpoint):
+    """Test that the charm is blocked, instead of failing, with an invalid database endpoint."""
+    # Arrange
+    harness = pebble_ready_harness
+    relation_id = harness.add_relation("postgresql", "database")
+    harness.add_relation_unit(relation_id, "database/0")
+
+    # Act
+    harness.update_relation_data(
+        relation_id, "database", {**MOCK_DATABASE_DATA, "endpoints": endpoint}
+    )
+
+    # Assert
+    assert harness.charm.database_relation.status == BlockedStatus(
+        f"Invalid database endpoint {endpoint!r}"
+    )
+
+
+def test_database_secret_deleted_with_relation(
+    pebble_ready_harness, mocked_lightkube_client, mocker
+):
+    """Test that the database credentials Secret is deleted once the relation is removed."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    relation_id = harness.add_relation("postgresql", "database")
+    harness.add_relation_unit(relation_id, "database/0")
+    harness.update_relation_data(relation_id, "database", MOCK_DATABASE_DATA)
+    secret = _render_database_secret(harness)
+    mocker.patch.object(KubernetesResourceHandler, "get_deployed_resources", return_value=[secret])
+
+    # Act
+    harness.remove_relation(relation_id)
+
+    # Assert
+    assert _render_database_secret(harness) is None
+    mocked_lightkube_client.delete.assert_called_with(
+        res=Secret, name="argo-controller-database", namespace="namespace"
+    )
+
+
+def test_database_relation_with_secret(pebble_ready_harness):
+    """Test that database credentials shared as a Juju secret are used."""
+    # Arrange
+    harness = pebble_ready_harness
+    relation_id = harness.add_relation("postgresql", "database")
+    harness.add_relation_unit(relation_id, "database/0")
+    secret_id = harness.add_model_secret(
+        "database", {"username": "secret-user", "password": "secret-password"}
+    )
+    harness.grant_secret(secret_id, "argo-controller")
+    data = {k: v for k, v in MOCK_DATABASE_DATA.items() if k not in ["username", "password"]}
+
+    # Act
+    harness.update_relation_data(relation_id, "database", {**data, "secret-user": secret_id})
+
+    # Assert
+    database = harness.charm.database_relation.component.get_data()
+    assert database["username"] == "secret-user"
+    assert database["password"] == "secret-password"
+
+
+def test_database_relations_conflict(pebble_ready_harness):
+    """Test that the charm is blocked when related to both a PostgreSQL and a MySQL database."""
+    # Arrange
+    harness = pebble_ready_harness
+    harness.set_leader(True)
+
+    # Act
+    harness.add_relation("postgresql", "postgresql-k8s", app_data=MOCK_DATABASE_DATA)
+    harness.add_relation("mysql", "mysql-k8s", app_data=MOCK_DATABASE_DATA)
+
+    # Assert
+    assert isinstance(harness.charm.database_relations_conflict_detector.status, BlockedStatus)
+
+
+@pytest.mark.parametrize(
+    "raw_endpoint, expected_endpoint",
+    [
+        ("http://10.0.0.1", "10.0.0.1"),
+        ("https://s3.example.com", "s3.example.com"),
+        ("http://10.0.0.1:9000", "10.0.0.1:9000"),
+        ("https://s3.example.com:443", "s3.example.com:443"),
+        ("10.0.0.1", "10.0.0.1"),
+        ("10.0.0.1:9000", "10.0.0.1:9000"),
+    ],
+)
+def test_s3_endpoint_scheme_is_stripped(
+    harness,
+    mocked_lightkube_client,
+    mocked_kubernetes_service_patch,
+    mocker,
+    raw_endpoint,
+    expected_endpoint,
+):
+    """Test that URL schemes are stripped from S3 endpoints before passing to Argo.
+
+    Argo's S3 client requires a bare host[:port] endpoint and rejects full URLs
+    such as 'http://10.0.0.1' with "Endpoint url cannot have fully qualified paths".
+    """
+    harness.begin()
+
+    harness.add_relation("s3-credentials", "s3-provider")
+    s3_client = harness.charm.s3_relation.component.s3_client
+    mocker.patch.object(
+        s3_client,
+        "get_storage_connection_info",
+        return_value={**MOCK_S3_DATA_BASE, "endpoint": raw_endpoint},
+    )
+
+    context = harness.charm._context_callable()
+
+    assert context["s3_minio_endpoint"] == expected_endpoint
+    assert context["s3_region"] == MOCK_S3_DATA_BASE["region"]
+
+
+@pytest.mark.parametrize("instance_id", ["shard-a", "1", "yes"])
+def test_instance_id_config(pebble_ready_harness, instance_id):
+    """Test that the instance-id is rendered in a ConfigMap of its own, used by the controller."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+    assert "instanceID" not in _render_controller_configmap(harness)
+
+    # Act
+    harness.update_config({"instance-id": instance_id})
+
+    # Assert
+    krh = KubernetesResourceHandler(
+        field_manager="test",
+        template_files=K8S_RESOURCE_FILES,
+        context=harness.charm._context_callable(),
+    )
+    configmap = next(r for r in krh.render_manifests() if isinstance(r, ConfigMap))
+    assert configmap.metadata.name == f"{ARGO_CONTROLLER_CONFIGMAP}-{instance_id}"
+    # Numeric and boolean-like instance IDs are still rendered as strings
+    assert configmap.data["instanceID"] == instance_id
+    secret = next(r for r in krh.render_manifests() if r.metadata.name.startswith("mlpipeline"))
+    assert secret.metadata.name == f"mlpipeline-minio-artifact-{instance_id}"
+    assert f"name: mlpipeline-minio-artifact-{instance_id}" in configmap.data["artifactRepository"]
+    command = _get_controller_command(harness).split()
+    assert command[:3] == [
+        "workflow-controller",
+        "--configmap",
+        f"{ARGO_CONTROLLER_CONFIGMAP}-{instance_id}",
+    ]
+
+
+def test_shard_assignment_action(pebble_ready_harness, mocked_lightkube_client):
+    """Test that namespaces are assigned to shards, moving few of them when a shard is added."""
+    # Arrange
+    harness = pebble_ready_harness
+    namespaces = [f"team-{i}" for i in range(30)]
+    mocked_lightkube_client.list.return_value = [
+        Namespace(metadata=ObjectMeta(name=namespace)) for namespace in namespaces
+    ]
+
+    # Act
+    output = harness.run_action("shard-assignment", {"instance-ids": "shard-a, shard-b"})
+    two_shards = yaml.safe_load(output.results["assignment"])
+    output = harness.run_action(
+        "shard-assignment",
+        {"instance-ids": "shard-a,shard-b,shard-c", "namespaces": ",".join(namespaces)},
+    )
+    three_shards = yaml.safe_load(output.results["assignment"])
+
+    # Assert
+    assert output.results["label"] == "workflows.argoproj.io/controller-instanceid"
+    assert sorted(two_shards["shard-a"] + two_shards["shard-b"]) == sorted(namespaces)
+    assert two_shards["shard-a"] and two_shards["shard-b"]
+    # Only the namespaces moved to the new shard change shard
+    for shard in ("shard-a", "shard-b"):
+        assert set(three_shards[shard]) <= set(two_shards[shard])
+    assert three_shards["shard-c"]
+
+
+def test_shard_assignment_action_without_instance_ids(pebble_ready_harness):
+    """Test that the action fails without instance IDs."""
+    # Arrange
+    harness = pebble_ready_harness
+
+    # Act, Assert
+    with pytest.raises(ActionFailed):
+        harness.run_action("shard-assignment", {"instance-ids": " , "})
+
+
+@pytest.mark.parametrize(
+    "config, expected_env",
+    [
+        pytest.param({}, None, id="default"),
+        pytest.param(
+            {
+                "executor-progress-patch-tick": "5m",
+                "executor-progress-file-tick": "30s",
+                "executor-wait-status-check-interval": "10s",
+                "executor-resource-state-check-interval": "1m",
+            },
+            [
+                {"name": "ARGO_PROGRESS_PATCH_TICK_DURATION", "value": "5m"},
+                {"name": "ARGO_PROGRESS_FILE_TICK_DURATION", "value": "30s"},
+                {"name": "WAIT_CONTAINER_STATUS_CHECK_INTERVAL", "value": "10s"},
+                {"name": "RESOURCE_STATE_CHECK_INTERVAL", "value": "1m"},
+            ],
+            id="intervals",
+        ),
+        pytest.param(
+            {"executor-progress": False, "executor-progress-patch-tick": "5m"},
+            [
+                {"name": "ARGO_PROGRESS_PATCH_TICK_DURATION", "value": "0"},
+                {"name": "ARGO_PROGRESS_FILE_TICK_DURATION", "value": "0"},
+            ],
+            id="progress-disabled",
+        ),
+    ],
+)
+def test_executor_environment_config(pebble_ready_harness, config, expected_env):
+    """Test that the executor-* config options are rendered in the executor's environment."""
+    # Arrange
+    harness = pebble_ready_harness
+    add_sdi_relation_to_harness(harness, "object-storage", data=MOCK_OBJECT_STORAGE_DATA)
+    harness.charm.object_storage_relation.component.get_data.return_value = [
+        MOCK_OBJECT_STORAGE_DATA
+    ]
+
+    # Act
+    harness.update_config(config)
+
+    # Assert
+    assert _render_controller_configmap(harness)["executor"].get("env") == expected_env
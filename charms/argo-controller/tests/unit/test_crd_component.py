@@ -0,0 +1,68 @@
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+import shutil
+from unittest.mock import MagicMock
+
+import pytest
+from lightkube import codecs
+
+from components.crd_component import CrdResourceHandler, load_crds_artifacts
+from tools.compile_crds import compile_crds
+
+CRDS_YAML = "src/templates/crds.yaml"
+LABELS = {"app.kubernetes.io/name": "argo-controller", "kubernetes-resource-handler-scope": "crds"}
+
+
+@pytest.fixture()
+def crds_yaml(tmp_path):
+    """Returns a copy of crds.yaml in a temporary directory."""
+    crds_yaml = tmp_path / "crds.yaml"
+    shutil.copy(CRDS_YAML, crds_yaml)
+    return crds_yaml
+
+
+def test_load_crds_artifacts_matches_yaml(crds_yaml):
+    """Test that the precompiled artifact loads the same objects as the YAML source."""
+    compile_crds(crds_yaml, crds_yaml.with_suffix(".json"))
+
+    resources = load_crds_artifacts([crds_yaml])
+
+    expected = codecs.load_all_yaml(crds_yaml.read_text())
+    assert [r.to_dict() for r in resources] == [r.to_dict() for r in expected]
+
+
+def test_load_crds_artifacts_without_artifact(crds_yaml):
+    """Test that no resources are loaded if the artifact is missing."""
+    assert load_crds_artifacts([crds_yaml]) is None
+
+
+def test_load_crds_artifacts_outdated_artifact(crds_yaml):
+    """Test that no resources are loaded if the YAML source changed after compiling."""
+    compile_crds(crds_yaml, crds_yaml.with_suffix(".json"))
+    crds_yaml.write_text(crds_yaml.read_text() + "\n")
+
+    assert load_crds_artifacts([crds_yaml]) is None
+
+
+def test_crds_applied_from_artifact_carry_labels(crds_yaml):
+    """Test that the CRDs loaded from the precompiled artifact are applied with the labels."""
+    compile_crds(crds_yaml, crds_yaml.with_suffix(".json"))
+    lightkube_client = MagicMock()
+    krh = CrdResourceHandler(
+        field_manager="lightkube",
+        template_files=[crds_yaml],
+        context={},
+        lightkube_client=lightkube_client,
+        labels=LABELS,
+    )
+
+    resources = krh.render_manifests()
+
+    assert all(LABELS.items() <= crd.metadata.labels.items() for crd in resources)
+
+    krh.apply()
+
+    applied = [call.kwargs["obj"] for call in lightkube_client.apply.call_args_list]
+    assert len(applied) == len(resources)
+    assert all(LABELS.items() <= crd.metadata.labels.items() for crd in applied)
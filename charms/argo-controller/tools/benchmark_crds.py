@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Benchmarks loading the CRDs from the precompiled artifact against rendering the YAML.
+
+Reports the time each approach takes to produce the lightkube objects that are applied, which is
+the time saved on every hook that loads the CRDs.  Also reports the size of the CRDs applied with
+each value of the minimal-crds and metacontroller-crds config options, which drives the apply
+time and the memory used by the API server and etcd.
+
+Usage:
+    tox -e benchmark-crds
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import timeit
+from pathlib import Path
+
+from charmed_kubeflow_chisme.kubernetes import KubernetesResourceHandler
+
+from components.crd_component import CrdResourceHandler, load_crds_artifacts
+from tools.compile_crds import compile_crds
+
+CRDS_YAML = Path("src/templates/crds.yaml")
+CRDS_CONFIGS = {
+    "full": {},
+    "minimal": {"minimal_crds": True},
+    "full, no metacontroller": {"metacontroller_crds": False},
+    "minimal, no metacontroller": {"minimal_crds": True, "metacontroller_crds": False},
+}
+
+
+def main():
+    """Runs the benchmark and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20, help="number of timed runs per approach")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        crds_yaml = Path(tmp_dir) / CRDS_YAML.name
+        shutil.copy(CRDS_YAML, crds_yaml)
+        compile_crds(crds_yaml, crds_yaml.with_suffix(".json"))
+
+        def render_yaml():
+            krh = KubernetesResourceHandler(
+                field_manager="lightkube", template_files=[crds_yaml], context={}
+            )
+            return krh.render_manifests(create_resources_for_crds=False)
+
+        def load_artifact():
+            return load_crds_artifacts([crds_yaml])
+
+        assert [r.to_dict() for r in render_yaml()] == [r.to_dict() for r in load_artifact()]
+        yaml_seconds = min(timeit.repeat(render_yaml, number=1, repeat=args.runs))
+        artifact_seconds = min(timeit.repeat(load_artifact, number=1, repeat=args.runs))
+
+        crds_sizes = {}
+        for name, context in CRDS_CONFIGS.items():
+            krh = CrdResourceHandler(
+                field_manager="lightkube", template_files=[crds_yaml], context=context
+            )
+            crds = krh.render_manifests()
+            crds_sizes[name] = (len(crds), sum(len(json.dumps(crd.to_dict())) for crd in crds))
+
+    print(f"YAML render:       {yaml_seconds * 1000:8.1f} ms")
+    print(f"Precompiled JSON:  {artifact_seconds * 1000:8.1f} ms")
+    print(f"Saved per hook:    {(yaml_seconds - artifact_seconds) * 1000:8.1f} ms")
+    print()
+    for name, (count, size) in crds_sizes.items():
+        print(f"CRDs ({name}):{' ' * (27 - len(name))}{count:3} objects, {size / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Compiles CRD manifests into a JSON artifact that loads faster than the YAML source.
+
+This is executed at pack time (see charmcraft.yaml).  The YAML manifests remain the source of
+truth: the artifact records the sha256 of the YAML it was compiled from, and the charm falls back
+to the YAML if the two do not match.
+
+Usage:
+    python3 tools/compile_crds.py src/templates/crds.yaml src/templates/crds.json
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+import yaml
+
+
+def compile_crds(source: Path, destination: Path):
+    """Writes the objects parsed from the YAML file source as a JSON artifact to destination."""
+    source_bytes = source.read_bytes()
+    objects = [obj for obj in yaml.safe_load_all(source_bytes) if obj]
+    artifact = {
+        "source-sha256": hashlib.sha256(source_bytes).hexdigest(),
+        "objects": objects,
+    }
+    destination.write_text(json.dumps(artifact, separators=(",", ":")))
+
+
+def main():
+    """Parses the command line arguments and compiles the artifact."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", type=Path, help="YAML file with the CRD manifests")
+    parser.add_argument("destination", type=Path, help="path of the JSON artifact to write")
+    args = parser.parse_args()
+    compile_crds(args.source, args.destination)
+
+
+if __name__ == "__main__":
+    main()